@@ -9,9 +9,11 @@ from cryptography.hazmat.primitives.padding import PKCS7
 from cryptography.hazmat.backends import default_backend
 from lbrynet.p2p.BlobInfo import BlobInfo
 from lbrynet.blob.blob_file import MAX_BLOB_SIZE
+from lbrynet.cryptoutils import get_lbry_hash_obj
 
 log = logging.getLogger(__name__)
 backend = default_backend()
+AES_BLOCK_BYTES = AES.block_size // 8
 
 
 class CryptBlobInfo(BlobInfo):
@@ -99,6 +101,60 @@ class StreamBlobDecryptor:
         return d
 
 
+def get_blob_plaintext_length(read_handle, key, iv, blob_length):
+    """
+    Get the decrypted length of a blob by decrypting only its last cipher block
+
+    read_handle - seekable file like object of the encrypted blob
+    blob_length - length in bytes of the encrypted blob
+    """
+    if blob_length < AES_BLOCK_BYTES or blob_length % AES_BLOCK_BYTES:
+        raise ValueError("invalid encrypted blob length: %i" % blob_length)
+    if blob_length > AES_BLOCK_BYTES:
+        read_handle.seek(blob_length - 2 * AES_BLOCK_BYTES)
+        iv = read_handle.read(AES_BLOCK_BYTES)
+    else:
+        read_handle.seek(0)
+    decryptor = Cipher(AES(key), modes.CBC(iv), backend=backend).decryptor()
+    last_block = decryptor.update(read_handle.read(AES_BLOCK_BYTES))
+    return blob_length - _get_padding_length(last_block)
+
+
+def decrypt_blob_range(read_handle, key, iv, blob_length, start, end, chunk_size=2**16):
+    """
+    Generator of the decrypted bytes [start, end) of a blob, decrypting only the cipher blocks
+    that are needed. In CBC mode the block before the first needed block is its initialization vector,
+    so decryption can start anywhere in the blob.
+
+    read_handle - seekable file like object of the encrypted blob
+    blob_length - length in bytes of the encrypted blob
+    chunk_size - bytes to read and decrypt at a time, must be a multiple of the AES block size
+    """
+    position = (start // AES_BLOCK_BYTES) * AES_BLOCK_BYTES
+    if position:
+        read_handle.seek(position - AES_BLOCK_BYTES)
+        iv = read_handle.read(AES_BLOCK_BYTES)
+    else:
+        read_handle.seek(0)
+    decryptor = Cipher(AES(key), modes.CBC(iv), backend=backend).decryptor()
+    while position < min(end, blob_length):
+        data = read_handle.read(min(chunk_size, blob_length - position))
+        if not data:
+            raise IOError("blob is shorter than its length of %i bytes" % blob_length)
+        decrypted = decryptor.update(data)
+        if position + len(data) >= blob_length:
+            decrypted = decrypted[:-_get_padding_length(decrypted)]
+        yield decrypted[max(start - position, 0):end - position]
+        position += len(data)
+
+
+def _get_padding_length(decrypted):
+    padding_length = decrypted[-1]
+    if not 0 < padding_length <= AES_BLOCK_BYTES:
+        raise ValueError("blob has incorrect padding")
+    return padding_length
+
+
 class CryptStreamBlobMaker:
     def __init__(self, key, iv, blob_num, blob):
         """
@@ -157,6 +213,22 @@ class CryptStreamBlobMaker:
         defer.returnValue(blob)
 
 
+def encrypt_blob(key, iv, data):
+    """
+    Encrypt the plaintext of a whole blob the same way CryptStreamBlobMaker does, this doesn't touch
+    the reactor so it can be run in a worker thread
+
+    Returns:
+    tuple (blob_hash, encrypted_data)
+    """
+    padder = PKCS7(AES.block_size).padder()
+    encryptor = Cipher(AES(key), modes.CBC(iv), backend=backend).encryptor()
+    encrypted_data = encryptor.update(padder.update(data) + padder.finalize()) + encryptor.finalize()
+    hashsum = get_lbry_hash_obj()
+    hashsum.update(encrypted_data)
+    return hashsum.hexdigest(), encrypted_data
+
+
 def greatest_multiple(a, b):
     """return the largest value `c`, that is a multiple of `b` and is <= `a`"""
     return (a // b) * b
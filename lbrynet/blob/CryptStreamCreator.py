@@ -2,11 +2,17 @@
 Utility for creating Crypt Streams, which are encrypted blobs and associated metadata.
 """
 import os
+import asyncio
 import logging
+from binascii import hexlify
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from cryptography.hazmat.primitives.ciphers.algorithms import AES
 from twisted.internet import defer
-from lbrynet.blob.CryptBlob import CryptStreamBlobMaker
+from lbrynet.extras.compat import d2f
+from lbrynet.blob.blob_file import MAX_BLOB_SIZE
+from lbrynet.blob.CryptBlob import CryptStreamBlobMaker, CryptBlobInfo, encrypt_blob
 
 
 log = logging.getLogger(__name__)
@@ -54,6 +60,9 @@ class CryptStreamCreator:
         self.blob_count = -1
         self.current_blob = None
         self.finished_deferreds = []
+        self.total_bytes = None
+        self.bytes_written = 0
+        self.blobs_written = 0
 
     def registerProducer(self, producer, streaming):
         from twisted.internet import reactor
@@ -139,6 +148,54 @@ class CryptStreamCreator:
             if done is True:
                 self._close_current_blob()
 
+    async def write_from_file(self, read_handle, workers=None):
+        """
+        Read a file in blob sized chunks and encrypt and hash the blobs in a thread pool
+
+        Every blob has its own initialization vector, so blobs don't depend on each other and can be
+        encrypted in parallel. The blob files are written and finished in order.
+        """
+        loop = asyncio.get_event_loop()
+        workers = workers or os.cpu_count() or 1
+        executor = ThreadPoolExecutor(max_workers=workers)
+        self.total_bytes = get_file_size(read_handle)
+        pending = deque()
+        try:
+            while True:
+                data = await loop.run_in_executor(executor, read_chunk, read_handle, MAX_BLOB_SIZE - 1)
+                if not data:
+                    break
+                self.blob_count += 1
+                iv = next(self.iv_generator)
+                encrypted = loop.run_in_executor(executor, encrypt_blob, self.key, iv, data)
+                pending.append((self.blob_count, iv, len(data), encrypted))
+                # bound the number of encrypted blobs held in memory
+                while len(pending) > workers:
+                    await self._write_encrypted_blob(executor, *pending.popleft())
+            while pending:
+                await self._write_encrypted_blob(executor, *pending.popleft())
+        finally:
+            executor.shutdown(wait=False)
+
+    async def _write_encrypted_blob(self, executor, blob_num, iv, plaintext_length, encrypted):
+        blob_hash, encrypted_data = await encrypted
+        await asyncio.get_event_loop().run_in_executor(
+            executor, write_file, os.path.join(self.blob_manager.blob_dir, blob_hash), encrypted_data
+        )
+        blob_info = CryptBlobInfo(blob_hash, blob_num, len(encrypted_data), hexlify(iv))
+        self._blob_finished(blob_info)
+        await d2f(self.blob_manager.creator_finished(blob_info, blob_num == 0))
+        self.bytes_written += plaintext_length
+        self.blobs_written += 1
+
+    def get_progress(self):
+        return {
+            'stream_name': self.name,
+            'total_bytes': self.total_bytes,
+            'written_bytes': self.bytes_written,
+            'blobs_written': self.blobs_written,
+        }
+
     def _get_blob_maker(self, iv, blob_creator):
         return CryptStreamBlobMaker(self.key, iv, self.blob_count, blob_creator)
 
@@ -147,3 +204,26 @@ class CryptStreamCreator:
 
     def _blob_finished(self, blob_info):
         raise NotImplementedError()
+
+
+def get_file_size(read_handle):
+    try:
+        return os.fstat(read_handle.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def read_chunk(read_handle, size):
+    """Read up to size bytes, only returning less at the end of the file"""
+    chunk = b''
+    while len(chunk) < size:
+        data = read_handle.read(size - len(chunk))
+        if not data:
+            break
+        chunk += data
+    return chunk
+
+
+def write_file(path, data):
+    with open(path, 'wb') as blob_file:
+        blob_file.write(data)
@@ -7,7 +7,6 @@ import logging
 from binascii import hexlify
 
 from twisted.internet import defer
-from twisted.protocols.basic import FileSender
 
 from lbrynet.extras.compat import f2d
 from lbrynet.p2p.StreamDescriptor import BlobStreamDescriptorWriter, EncryptedFileStreamType
@@ -53,12 +52,6 @@ class EncryptedFileStreamCreator(CryptStreamCreator):
         return defer.succeed(self.stream_hash)
 
 
-# TODO: this should be run its own thread. Encrypting a large file can
-#       be very cpu intensive and there is no need to run that on the
-#       main reactor thread. The FileSender mechanism that is used is
-#       great when sending over the network, but this is all local so
-#       we can simply read the file from the disk without needing to
-#       involve reactor.
 @defer.inlineCallbacks
 def create_lbry_file(blob_manager, storage, payment_rate_manager, lbry_file_manager, file_name, file_handle,
                      key=None, iv_generator=None):
@@ -69,8 +62,8 @@ def create_lbry_file(blob_manager, storage, payment_rate_manager, lbry_file_mana
     in the original file.
 
     The stream parameters that aren't specified are generated, the file is read and broken
-    into chunks and encrypted, and then a stream descriptor file with the stream parameters
-    and other metadata is written to disk.
+    into chunks which are encrypted in a thread pool, and then a stream descriptor file with the
+    stream parameters and other metadata is written to disk.
 
     @param session: An Session object.
     @type session: Session
@@ -82,7 +75,7 @@ def create_lbry_file(blob_manager, storage, payment_rate_manager, lbry_file_mana
     @type file_name: string
 
     @param file_handle: The file-like object to read
-    @type file_handle: any file-like object which can be read by twisted.protocols.basic.FileSender
+    @type file_handle: any file-like object with a read(size) method
 
     @param key: the raw AES key which will be used to encrypt the blobs. If None, a random key will
         be generated.
@@ -104,14 +97,13 @@ def create_lbry_file(blob_manager, storage, payment_rate_manager, lbry_file_mana
     )
 
     yield lbry_file_creator.setup()
-    # TODO: Using FileSender isn't necessary, we can just read
-    #       straight from the disk. The stream creation process
-    #       should be in its own thread anyway so we don't need to
-    #       worry about interacting with the twisted reactor
-    file_sender = FileSender()
-    yield file_sender.beginFileTransfer(file_handle, lbry_file_creator)
-
-    log.debug("the file sender has triggered its deferred. stopping the stream writer")
+    lbry_file_manager.stream_creators.append(lbry_file_creator)
+    try:
+        yield f2d(lbry_file_creator.write_from_file(file_handle))
+    finally:
+        lbry_file_manager.stream_creators.remove(lbry_file_creator)
+
+    log.debug("the file has been encrypted. stopping the stream writer")
     yield lbry_file_creator.stop()
 
     log.debug("making the sd blob")
@@ -55,10 +55,13 @@ class ManagedEncryptedFileDownloader(EncryptedFileSaver):
         self.channel_claim_id = None
         self.channel_name = None
         self.metadata = None
+        # (blob hashes, total bytes) once the lengths of all of the stream blobs are known
+        self._stream_blob_info = None
         self.mirror = None
         if download_mirrors or conf.settings['download_mirrors']:
             self.mirror = HTTPBlobDownloader(
-                self.blob_manager, servers=download_mirrors or conf.settings['download_mirrors']
+                self.blob_manager, servers=download_mirrors or conf.settings['download_mirrors'],
+                scheduler=self.fetch_scheduler
             )
 
     def set_claim_info(self, claim_info):
@@ -70,6 +73,7 @@ class ManagedEncryptedFileDownloader(EncryptedFileSaver):
         self.claim_name = claim_info['name']
         self.channel_name = claim_info['channel_name']
         self.metadata = claim_info['value']['stream']['metadata']
+        self.lbry_file_manager.lbry_files.update(self)
 
     async def get_claim_info(self, include_supports=True):
         claim_info = await self.storage.get_content_claim(self.stream_hash, include_supports)
@@ -105,9 +109,22 @@ class ManagedEncryptedFileDownloader(EncryptedFileSaver):
             status = yield self._save_status()
             defer.returnValue(status)
 
-    async def status(self):
+    async def _get_stream_blob_info(self):
+        if self._stream_blob_info is not None:
+            return self._stream_blob_info
         blobs = await self.storage.get_blobs_for_stream(self.stream_hash)
         blob_hashes = [b.blob_hash for b in blobs if b.blob_hash is not None]
+        blob_info = blob_hashes, sum(b.length for b in blobs)
+        if blob_hashes and all(b.length for b in blobs if b.blob_hash is not None):
+            self._stream_blob_info = blob_info
+        return blob_info
+
+    async def get_total_bytes(self):
+        _, total_bytes = await self._get_stream_blob_info()
+        return total_bytes
+
+    async def status(self):
+        blob_hashes, _ = await self._get_stream_blob_info()
         completed_blobs = self.blob_manager.completed_blobs(blob_hashes)
         num_blobs_completed = len(completed_blobs)
         num_blobs_known = len(blob_hashes)
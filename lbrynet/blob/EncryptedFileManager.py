@@ -2,7 +2,9 @@
 Keep track of which LBRY Files are downloading and store their LBRY File specific metadata
 """
 import os
+import asyncio
 import logging
+from itertools import count
 from binascii import hexlify, unhexlify
 
 from twisted.internet import defer, task, reactor
@@ -20,6 +22,167 @@ from lbrynet.utils import safe_start_looping_call, safe_stop_looping_call
 log = logging.getLogger(__name__)
 
 
+class LbryFileIndex:
+    """
+    The managed lbry files in the order they were added, indexed by the attributes they can be searched by
+
+    Files have to be re-indexed with update() when their claim info changes
+    """
+    INDEXED_FIELDS = (
+        'sd_hash', 'file_name', 'stream_hash', 'rowid', 'claim_id', 'outpoint', 'txid', 'nout',
+        'channel_claim_id', 'claim_name', 'channel_name'
+    )
+
+    def __init__(self, lbry_files=()):
+        # { <lbry_file>: (<position>, {<field>: <indexed value>}) }
+        self._files = {}
+        # { <field>: { <value>: { <lbry_file>: None } } }
+        self._index = {field: {} for field in self.INDEXED_FIELDS}
+        self._positions = count()
+        # set when a replaced file has put _files out of order
+        self._unordered = False
+        for lbry_file in lbry_files:
+            self.append(lbry_file)
+
+    def __iter__(self):
+        return iter(self._ordered_files())
+
+    def __len__(self):
+        return len(self._files)
+
+    def __contains__(self, lbry_file):
+        return lbry_file in self._files
+
+    def append(self, lbry_file):
+        if lbry_file not in self._files:
+            self._files[lbry_file] = (next(self._positions), self._add_to_index(lbry_file))
+
+    def remove(self, lbry_file):
+        if lbry_file not in self._files:
+            raise ValueError("Could not find that LBRY file")
+        _, indexed = self._files.pop(lbry_file)
+        self._remove_from_index(lbry_file, indexed)
+
+    def replace(self, lbry_file, new_lbry_file):
+        """
+        Put new_lbry_file in the place of lbry_file, keeping its position
+        """
+        if lbry_file not in self._files:
+            raise ValueError("Could not find that LBRY file")
+        position, indexed = self._files.pop(lbry_file)
+        self._remove_from_index(lbry_file, indexed)
+        self._files[new_lbry_file] = (position, self._add_to_index(new_lbry_file))
+        self._unordered = True
+
+    def _ordered_files(self):
+        if self._unordered:
+            self._files = dict(sorted(self._files.items(), key=lambda item: item[1][0]))
+            self._unordered = False
+        return list(self._files)
+
+    def update(self, lbry_file):
+        if lbry_file in self._files:
+            position, indexed = self._files[lbry_file]
+            self._remove_from_index(lbry_file, indexed)
+            self._files[lbry_file] = (position, self._add_to_index(lbry_file))
+
+    def search(self, **search):
+        """
+        Returns the files where every given field equals the given value, in the order they were added
+        """
+        if not search:
+            return self._ordered_files()
+        candidates = None
+        for field, value in search.items():
+            matches = self._index[field].get(value, {})
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+        found = [
+            lbry_file for lbry_file in candidates
+            if all(getattr(lbry_file, field, None) == value for field, value in search.items())
+        ]
+        return sorted(found, key=lambda lbry_file: self._files[lbry_file][0])
+
+    def _add_to_index(self, lbry_file):
+        indexed = {}
+        for field in self.INDEXED_FIELDS:
+            value = getattr(lbry_file, field, None)
+            if value is not None:
+                self._index[field].setdefault(value, {})[lbry_file] = None
+                indexed[field] = value
+        return indexed
+
+    def _remove_from_index(self, lbry_file, indexed):
+        for field, value in indexed.items():
+            files = self._index[field][value]
+            del files[lbry_file]
+            if not files:
+                del self._index[field][value]
+
+
+class LbryFileRecord:
+    """
+    The saved row of a stopped or finished managed file
+
+    These are kept in place of ManagedEncryptedFileDownloaders so starting up doesn't scale with the
+    size of the library, EncryptedFileManager.load_lbry_file turns one into a downloader when the
+    file is started, queried in detail or reflected
+    """
+    __slots__ = (
+        'rowid', 'stream_hash', 'sd_hash', 'key', 'raw_stream_name', 'raw_file_name', 'download_directory',
+        'raw_suggested_file_name', 'status', 'claim_id', 'outpoint', 'txid', 'nout', 'channel_claim_id',
+        'claim_name', 'channel_name', 'downloader'
+    )
+    stopped = True
+    points_paid = 0.0
+    metadata = None
+
+    def __init__(self, file_info):
+        self.rowid = file_info['row_id']
+        self.stream_hash = file_info['stream_hash']
+        self.sd_hash = file_info['sd_hash']
+        self.key = file_info['key']
+        self.raw_stream_name = file_info['stream_name']
+        self.raw_file_name = file_info['file_name']
+        self.download_directory = file_info['download_directory']
+        self.raw_suggested_file_name = file_info['suggested_file_name']
+        self.status = file_info['status']
+        self.claim_id = None
+        self.outpoint = None
+        self.txid = None
+        self.nout = None
+        self.channel_claim_id = None
+        self.claim_name = None
+        self.channel_name = None
+        # the ManagedEncryptedFileDownloader that replaced this record once it was loaded
+        self.downloader = None
+
+    @property
+    def file_name(self):
+        return os.path.basename(unhexlify(self.raw_file_name).decode())
+
+    @property
+    def stream_name(self):
+        return unhexlify(self.raw_stream_name).decode()
+
+    @property
+    def suggested_file_name(self):
+        return unhexlify(self.raw_suggested_file_name).decode()
+
+    @property
+    def completed(self):
+        return self.status == ManagedEncryptedFileDownloader.STATUS_FINISHED
+
+    def set_claim_info(self, claim_info):
+        self.claim_id = claim_info['claim_id']
+        self.txid = claim_info['txid']
+        self.nout = claim_info['nout']
+        self.channel_claim_id = claim_info['channel_claim_id']
+        self.outpoint = "%s:%i" % (self.txid, self.nout)
+        self.claim_name = claim_info['name']
+        self.channel_name = claim_info['channel_name']
+
+
 class EncryptedFileManager:
     """
     Keeps track of currently opened LBRY Files, their options, and
@@ -27,6 +190,8 @@ class EncryptedFileManager:
     """
     # when reflecting files, reflect up to this many files at a time
     CONCURRENT_REFLECTS = 5
+    # claim info of lazily loaded files is read in batches of this many files after starting up
+    CLAIM_INFO_BATCH_SIZE = 500
 
     def __init__(self, peer_finder, rate_limiter, blob_manager, wallet, payment_rate_manager, storage, sd_identifier):
         self.auto_re_reflect = conf.settings['reflect_uploads'] and conf.settings['auto_re_reflect_interval'] > 0
@@ -39,7 +204,11 @@ class EncryptedFileManager:
         self.storage = storage
         # TODO: why is sd_identifier part of the file manager?
         self.sd_identifier = sd_identifier
-        self.lbry_files = []
+        self.lazy_load = conf.settings['lazy_load_files']
+        self.lbry_files = LbryFileIndex()
+        self._claim_info_task = None
+        # EncryptedFileStreamCreators of the files being published
+        self.stream_creators = []
         self.lbry_file_reflector = task.LoopingCall(self.reflect_lbry_files)
 
     def setup(self):
@@ -56,11 +225,15 @@ class EncryptedFileManager:
         log.debug("Changing status of %s to %s", lbry_file.stream_hash, status)
         return f2d(self.storage.change_file_status(lbry_file.rowid, status))
 
+    async def _get_lbry_file_status_report(self, lbry_file):
+        lbry_file = await self.load_lbry_file(lbry_file)
+        return await lbry_file.status()
+
     def get_lbry_file_status_reports(self):
         ds = []
 
         for lbry_file in self.lbry_files:
-            ds.append(lbry_file.status())
+            ds.append(f2d(self._get_lbry_file_status_report(lbry_file)))
 
         dl = defer.DeferredList(ds)
 
@@ -116,6 +289,17 @@ class EncryptedFileManager:
 
     async def _start_lbry_files(self):
         files = await self.storage.get_all_lbry_files()
+        if self.lazy_load:
+            records = [LbryFileRecord(file_info) for file_info in files if file_info['status'] !=
+                       ManagedEncryptedFileDownloader.STATUS_RUNNING]
+            files = [file_info for file_info in files if file_info['status'] ==
+                     ManagedEncryptedFileDownloader.STATUS_RUNNING]
+            for record in records:
+                self.lbry_files.append(record)
+                self.storage.content_claim_callbacks[record.stream_hash] = \
+                    lambda record=record: self._update_record_claim_info(record)
+            log.info("Loaded %i stopped and finished files", len(records))
+            self._claim_info_task = asyncio.ensure_future(self._load_record_claim_infos(records))
         claim_infos = await self.storage.get_claims_from_stream_hashes([file['stream_hash'] for file in files])
         prm = self.payment_rate_manager
 
@@ -128,6 +312,53 @@ class EncryptedFileManager:
         if self.auto_re_reflect is True:
             safe_start_looping_call(self.lbry_file_reflector, self.auto_re_reflect_interval / 10)
 
+    async def _load_record_claim_infos(self, records):
+        """
+        Index the claims of the files that were loaded lazily, in the background after starting up
+        """
+        for i in range(0, len(records), self.CLAIM_INFO_BATCH_SIZE):
+            batch = records[i:i + self.CLAIM_INFO_BATCH_SIZE]
+            claim_infos = await self.storage.get_claims_from_stream_hashes(
+                [record.stream_hash for record in batch], include_supports=False
+            )
+            for record in batch:
+                if record.stream_hash in claim_infos and record.downloader is None:
+                    record.set_claim_info(claim_infos[record.stream_hash])
+                    self.lbry_files.update(record)
+        log.info("Loaded the claims of %i stopped and finished files", len(records))
+
+    async def _update_record_claim_info(self, record):
+        if record.downloader is not None:
+            return await record.downloader.get_claim_info()
+        claim_info = await self.storage.get_content_claim(record.stream_hash, include_supports=False)
+        if claim_info:
+            record.set_claim_info(claim_info)
+            self.lbry_files.update(record)
+        return claim_info
+
+    async def load_lbry_file(self, lbry_file):
+        """
+        Returns the ManagedEncryptedFileDownloader of a managed file, replacing its LbryFileRecord
+        with one if the file was loaded lazily
+        """
+        if not isinstance(lbry_file, LbryFileRecord):
+            return lbry_file
+        if lbry_file.downloader is not None:
+            return lbry_file.downloader
+        if lbry_file not in self.lbry_files:
+            raise ValueError("Could not find that LBRY file")
+        downloader = self._get_lbry_file(
+            lbry_file.rowid, lbry_file.stream_hash, self.payment_rate_manager, lbry_file.sd_hash, lbry_file.key,
+            lbry_file.raw_stream_name, lbry_file.raw_file_name, lbry_file.download_directory,
+            lbry_file.raw_suggested_file_name
+        )
+        downloader.restore(lbry_file.status)
+        lbry_file.downloader = downloader
+        self.lbry_files.replace(lbry_file, downloader)
+        self.storage.content_claim_callbacks[downloader.stream_hash] = downloader.get_claim_info
+        await downloader.get_claim_info()
+        return downloader
+
     @defer.inlineCallbacks
     def _stop_lbry_file(self, lbry_file):
         def wait_for_finished(lbry_file, count=2):
@@ -147,7 +378,10 @@ class EncryptedFileManager:
     @defer.inlineCallbacks
     def _stop_lbry_files(self):
         log.info("Stopping %i lbry files", len(self.lbry_files))
-        yield defer.DeferredList([self._stop_lbry_file(lbry_file) for lbry_file in list(self.lbry_files)])
+        yield defer.DeferredList([
+            self._stop_lbry_file(lbry_file) for lbry_file in list(self.lbry_files)
+            if not isinstance(lbry_file, LbryFileRecord)
+        ])
 
     async def add_published_file(self, stream_hash, sd_hash, download_directory, payment_rate_manager, blob_data_rate):
         status = ManagedEncryptedFileDownloader.STATUS_FINISHED
@@ -196,6 +430,7 @@ class EncryptedFileManager:
 
     @defer.inlineCallbacks
     def delete_lbry_file(self, lbry_file, delete_file=False):
+        lbry_file = yield f2d(self.load_lbry_file(lbry_file))
         if lbry_file not in self.lbry_files:
             raise ValueError("Could not find that LBRY file")
 
@@ -227,9 +462,12 @@ class EncryptedFileManager:
 
     def toggle_lbry_file_running(self, lbry_file):
         """Toggle whether a stream reader is currently running"""
-        for l in self.lbry_files:
-            if l == lbry_file:
-                return l.toggle_running()
+        if isinstance(lbry_file, LbryFileRecord):
+            d = f2d(self.load_lbry_file(lbry_file))
+            d.addCallback(lambda downloader: downloader.toggle_running())
+            return d
+        if lbry_file in self.lbry_files:
+            return lbry_file.toggle_running()
         return defer.fail(Failure(ValueError("Could not find that LBRY file")))
 
     @defer.inlineCallbacks
@@ -239,12 +477,16 @@ class EncryptedFileManager:
         sd_hashes_to_reflect = yield f2d(self.storage.get_streams_to_re_reflect())
         for lbry_file in self.lbry_files:
             if lbry_file.sd_hash in sd_hashes_to_reflect:
+                lbry_file = yield f2d(self.load_lbry_file(lbry_file))
                 ds.append(sem.run(reflect_file, lbry_file))
         yield defer.DeferredList(ds)
 
     @defer.inlineCallbacks
     def stop(self):
         safe_stop_looping_call(self.lbry_file_reflector)
+        if self._claim_info_task is not None and not self._claim_info_task.done():
+            self._claim_info_task.cancel()
+        self._claim_info_task = None
         yield self._stop_lbry_files()
         log.info("Stopped encrypted file manager")
         defer.returnValue(True)
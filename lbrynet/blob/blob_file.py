@@ -1,7 +1,6 @@
 import os
 import logging
 from twisted.internet import defer
-from twisted.web.client import FileBodyProducer
 from twisted.python.failure import Failure
 from lbrynet.cryptoutils import get_lbry_hash_obj
 from lbrynet.p2p.Error import DownloadCanceledError, InvalidDataError, InvalidBlobHashError
@@ -81,7 +80,7 @@ class BlobFile:
         if peer not in self.writers:
             log.debug("Opening %s to be written by %s", str(self), str(peer))
             finished_deferred = defer.Deferred()
-            writer = HashBlobWriter(self.get_length, self.writer_finished)
+            writer = HashBlobWriter(self.blob_dir, self.get_length, self.writer_finished)
             self.writers[peer] = (writer, finished_deferred)
             return writer, finished_deferred
         log.warning("Tried to download the same file twice simultaneously from the same peer")
@@ -204,14 +203,10 @@ class BlobFile:
         # each other, can happen since startProducing is a deferred
         return self.blob_write_lock.run(self._save_verified_blob, writer)
 
-    @defer.inlineCallbacks
     def _save_verified_blob(self, writer):
         if self.saved_verified_blob is False:
-            writer.write_handle.seek(0)
-            out_path = os.path.join(self.blob_dir, self.blob_hash)
-            producer = FileBodyProducer(writer.write_handle)
-            yield producer.startProducing(open(out_path, 'wb'))
+            # the writer spooled the blob to a temporary file in blob_dir, rename it into place
+            writer.save(self.file_path)
             self.saved_verified_blob = True
-            defer.returnValue(True)
-        else:
-            raise DownloadCanceledError()
+            return defer.succeed(True)
+        return defer.fail(DownloadCanceledError())
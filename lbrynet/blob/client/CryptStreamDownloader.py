@@ -7,6 +7,7 @@ from lbrynet.p2p.client.BlobRequester import BlobRequester
 from lbrynet.p2p.client.ConnectionManager import ConnectionManager
 from lbrynet.p2p.client.DownloadManager import DownloadManager
 from lbrynet.p2p.client.StreamProgressManager import FullStreamProgressManager
+from lbrynet.p2p.FetchScheduler import FetchScheduler
 from lbrynet.blob.client.CryptBlobHandler import CryptBlobHandler
 
 
@@ -71,6 +72,8 @@ class CryptStreamDownloader:
         self.finished_deferred = None
         self.points_paid = 0.0
         self.blob_requester = None
+        # shared view of the blobs being downloaded from peers and mirrors
+        self.fetch_scheduler = FetchScheduler()
 
     def __str__(self):
         return str(self.stream_name)
@@ -180,7 +183,7 @@ class CryptStreamDownloader:
     def _get_blob_requester(self, download_manager):
         return BlobRequester(self.blob_manager, self.peer_finder,
                              self.payment_rate_manager, self.wallet,
-                             download_manager)
+                             download_manager, self.fetch_scheduler)
 
     def _get_progress_manager(self, download_manager):
         return FullStreamProgressManager(self._finished_downloading,
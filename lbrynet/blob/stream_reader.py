@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from binascii import unhexlify
+
+from lbrynet.blob.blob_file import MAX_BLOB_SIZE
+from lbrynet.blob.CryptBlob import decrypt_blob_range, get_blob_plaintext_length
+
+log = logging.getLogger(__name__)
+
+# every blob but the last one of a stream holds this many bytes of plaintext, see CryptStreamBlobMaker
+BLOB_PLAINTEXT_SIZE = MAX_BLOB_SIZE - 1
+
+
+class BlobNotAvailableError(Exception):
+    pass
+
+
+class EncryptedStreamReader:
+    """
+    Reads decrypted byte ranges of a stream straight from its blobs, without saving the file
+
+    Blobs are decrypted as they are read, a read waits for each blob it needs to be verified so a
+    stream that is still downloading can be read from as soon as its head blob is available
+    """
+
+    def __init__(self, blob_manager, stream_key, blob_infos, poll_interval=0.1, blob_timeout=60):
+        """
+        stream_key - hex encoded stream decryption key
+        blob_infos - the CryptBlobInfos of the stream, ordered by blob number
+        """
+        self.blob_manager = blob_manager
+        self.key = unhexlify(stream_key)
+        self.blob_infos = [blob_info for blob_info in blob_infos if blob_info.blob_hash]
+        self.poll_interval = poll_interval
+        self.blob_timeout = blob_timeout
+        self._size = None
+
+    def _get_blob(self, blob_num):
+        blob_info = self.blob_infos[blob_num]
+        return self.blob_manager.get_blob(blob_info.blob_hash, blob_info.length or None)
+
+    async def _wait_for_blob(self, blob_num):
+        blob = self._get_blob(blob_num)
+        waited = 0
+        while not blob.get_is_verified():
+            if waited >= self.blob_timeout:
+                raise BlobNotAvailableError("timed out waiting for blob %s" % blob.blob_hash)
+            await asyncio.sleep(self.poll_interval)
+            waited += self.poll_interval
+        return blob
+
+    def get_size(self):
+        """
+        Returns the decrypted size of the stream, or None if its last blob is not available yet
+        """
+        if self._size is None:
+            if not self.blob_infos:
+                self._size = 0
+            else:
+                blob = self._get_blob(len(self.blob_infos) - 1)
+                if blob.get_is_verified():
+                    self._size = self._get_offset(len(self.blob_infos) - 1) + self._read_plaintext_length(blob)
+        return self._size
+
+    async def wait_for_size(self):
+        if self.get_size() is None:
+            await self._wait_for_blob(len(self.blob_infos) - 1)
+        return self.get_size()
+
+    async def wait_for_head_blob(self):
+        if self.blob_infos:
+            await self._wait_for_blob(0)
+
+    def _read_plaintext_length(self, blob):
+        blob_info = self.blob_infos[-1]
+        read_handle = blob.open_for_reading()
+        try:
+            return get_blob_plaintext_length(read_handle, self.key, unhexlify(blob_info.iv), blob.get_length())
+        finally:
+            read_handle.close()
+
+    def is_before_last_blob(self, start, end):
+        """
+        Whether the range [start, end) is known to end before the last blob of the stream, so it can
+        be read before the size of the stream is known
+        """
+        return 0 <= start and end is not None and end <= self._get_offset(len(self.blob_infos) - 1)
+
+    @staticmethod
+    def _get_offset(blob_num):
+        return blob_num * BLOB_PLAINTEXT_SIZE
+
+    async def read(self, start=0, end=None):
+        """
+        Async generator of the decrypted bytes [start, end) of the stream, to the end of the stream
+        if end is None
+        """
+        first_blob = min(start // BLOB_PLAINTEXT_SIZE, len(self.blob_infos))
+        for blob_num in range(first_blob, len(self.blob_infos)):
+            offset = self._get_offset(blob_num)
+            if end is not None and offset >= end:
+                break
+            blob = await self._wait_for_blob(blob_num)
+            read_handle = blob.open_for_reading()
+            try:
+                for data in decrypt_blob_range(
+                        read_handle, self.key, unhexlify(self.blob_infos[blob_num].iv), blob.get_length(),
+                        max(start - offset, 0), BLOB_PLAINTEXT_SIZE if end is None else end - offset):
+                    if data:
+                        yield data
+            finally:
+                read_handle.close()
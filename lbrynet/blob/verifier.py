@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lbrynet.cryptoutils import get_lbry_hash_obj
+from lbrynet.blob.blob_file import MAX_BLOB_SIZE
+
+log = logging.getLogger(__name__)
+
+DEFAULT_VERIFY_WORKERS = 4
+VERIFY_READ_SIZE = 1024 * 1024  # large sequential reads, a full size blob is hashed in two reads
+
+
+def hash_blob_file(file_path, read_size=VERIFY_READ_SIZE):
+    """
+    Returns the hex encoded sha384 hash of the contents of a blob file
+    """
+    hashsum = get_lbry_hash_obj()
+    with open(file_path, 'rb', buffering=0) as blob_file:
+        while True:
+            data = blob_file.read(read_size)
+            if not data:
+                break
+            hashsum.update(data)
+    return hashsum.hexdigest()
+
+
+class BlobVerifier:
+    """
+    Re-hashes blob files in a thread pool and collects the ones whose contents no longer match their
+    names, hashing releases the GIL so the workers run in parallel with each other and the event loop
+    """
+
+    def __init__(self, blob_dir, workers=DEFAULT_VERIFY_WORKERS, progress_interval=10, get_time=time.time):
+        self.blob_dir = blob_dir
+        self.workers = max(1, workers)
+        self.progress_interval = progress_interval
+        self.get_time = get_time
+        self.total_blobs = 0
+        self.checked_blobs = 0
+        self.checked_bytes = 0
+        self.bad_blob_hashes = []
+        self.started_at = None
+        self.finished_at = None
+        self._last_progress_log = None
+
+    @property
+    def running(self):
+        return self.started_at is not None and self.finished_at is None
+
+    def _verify_blob(self, blob_hash):
+        """
+        Runs in a worker thread, returns (blob_hash, size, is_valid) or None if the file is gone
+        """
+        file_path = os.path.join(self.blob_dir, blob_hash)
+        try:
+            size = os.path.getsize(file_path)
+            if size > MAX_BLOB_SIZE:
+                return blob_hash, size, False
+            return blob_hash, size, hash_blob_file(file_path) == blob_hash
+        except FileNotFoundError:
+            return None
+        except OSError as err:
+            log.warning("failed to read blob %s: %s", blob_hash, err)
+            return blob_hash, 0, False
+
+    def _checked(self, result):
+        self.checked_blobs += 1
+        if result is None:
+            return
+        blob_hash, size, is_valid = result
+        self.checked_bytes += size
+        if not is_valid:
+            log.warning("blob %s is corrupt", blob_hash)
+            self.bad_blob_hashes.append(blob_hash)
+        now = self.get_time()
+        if now - self._last_progress_log >= self.progress_interval:
+            self._last_progress_log = now
+            progress = self.get_progress()
+            log.info("verified %i/%i blobs (%.1f MB/s), %i corrupt", progress['checked_blobs'],
+                     progress['total_blobs'], progress['bytes_per_second'] / 1e6, progress['bad_blobs'])
+
+    async def verify(self, blob_hashes, loop=None):
+        """
+        Hash the given blob files, returns the hashes of the ones that are corrupt
+
+        At most twice as many blobs as there are workers are queued at a time, so a large blob
+        directory is streamed through the pool instead of being submitted to it all at once
+        """
+        loop = loop or asyncio.get_event_loop()
+        blob_hashes = list(blob_hashes)
+        self.total_blobs = len(blob_hashes)
+        self.started_at = self._last_progress_log = self.get_time()
+        executor = ThreadPoolExecutor(self.workers)
+        pending = set()
+        try:
+            for blob_hash in blob_hashes:
+                if len(pending) >= self.workers * 2:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        self._checked(future.result())
+                pending.add(loop.run_in_executor(executor, self._verify_blob, blob_hash))
+            for future in asyncio.as_completed(pending):
+                self._checked(await future)
+        finally:
+            executor.shutdown(wait=False)
+            self.finished_at = self.get_time()
+        progress = self.get_progress()
+        log.info("verified %i blobs in %.1f seconds (%.1f MB/s), %i corrupt", progress['checked_blobs'],
+                 progress['elapsed'], progress['bytes_per_second'] / 1e6, progress['bad_blobs'])
+        return list(self.bad_blob_hashes)
+
+    def get_progress(self):
+        if self.started_at is None:
+            elapsed = 0
+        else:
+            elapsed = (self.finished_at or self.get_time()) - self.started_at
+        return {
+            'running': self.running,
+            'total_blobs': self.total_blobs,
+            'checked_blobs': self.checked_blobs,
+            'checked_bytes': self.checked_bytes,
+            'bad_blobs': len(self.bad_blob_hashes),
+            'elapsed': elapsed,
+            'bytes_per_second': 0 if not elapsed else int(self.checked_bytes / elapsed)
+        }
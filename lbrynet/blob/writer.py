@@ -1,15 +1,29 @@
+import os
 import logging
-from io import BytesIO
+import tempfile
 from twisted.python.failure import Failure
 from lbrynet.p2p.Error import DownloadCanceledError, InvalidDataError
 from lbrynet.cryptoutils import get_lbry_hash_obj
 
 log = logging.getLogger(__name__)
 
+TEMP_BLOB_SUFFIX = '.tmp'
+
+
+def is_temp_blob_file(file_name):
+    return file_name.endswith(TEMP_BLOB_SUFFIX)
+
 
 class HashBlobWriter:
-    def __init__(self, length_getter, finished_cb):
-        self.write_handle = BytesIO()
+    """
+    Hashes incoming blob data as it is written and spools it to a temporary file in the
+    blob directory. Once the blob is verified the temporary file is renamed into place by
+    save(), otherwise it is removed when the handle is closed.
+    """
+
+    def __init__(self, blob_dir, length_getter, finished_cb):
+        fd, self.temp_path = tempfile.mkstemp(suffix=TEMP_BLOB_SUFFIX, dir=blob_dir)
+        self.write_handle = os.fdopen(fd, 'wb')
         self.length_getter = length_getter
         self.finished_cb = finished_cb
         self.finished_cb_d = None
@@ -43,10 +57,27 @@ class HashBlobWriter:
             if self.len_so_far == self.length_getter():
                 self.finished_cb_d = self.finished_cb(self)
 
+    def save(self, file_path):
+        """
+        Atomically move the written data to file_path
+        """
+        if self.write_handle is None:
+            raise IOError('I/O operation on closed file')
+        self.write_handle.close()
+        self.write_handle = None
+        os.replace(self.temp_path, file_path)
+        self.temp_path = None
+
     def close_handle(self):
         if self.write_handle is not None:
             self.write_handle.close()
             self.write_handle = None
+        if self.temp_path is not None:
+            try:
+                os.remove(self.temp_path)
+            except OSError as err:
+                log.warning("failed to remove temporary blob file %s: %s", self.temp_path, err)
+            self.temp_path = None
 
     def close(self, reason=None):
         # if we've already called finished_cb because we either finished writing
@@ -219,17 +219,25 @@ ADJUSTABLE_SETTINGS = {
     # automatically renewed after startup (if set to 0, renews
     # will not be made automatically)
     'auto_renew_claim_height_delta': (int, 0),
+    'blob_cache_size': (int, 10000),  # max number of idle blob objects kept loaded by the blob manager
+    'blob_verify_workers': (int, 4),  # number of threads used to re-hash blob files when verifying them
     'cache_time': (int, 150),
     'data_rate': (float, .0001),  # points/megabyte
     'delete_blobs_on_remove': (bool, True),
     'dht_node_port': (int, 4444),
     'download_timeout': (int, 180),
     'download_mirrors': (list, ['blobs.lbry.io']),
+    'verify_blobs_on_startup': (bool, False),  # re-hash all blob files in the background on startup
     'is_generous_host': (bool, True),
+    'lazy_load_files': (bool, True),  # only load downloaders for stopped and finished files when they are used
     'announce_head_blobs_only': (bool, True),
     'concurrent_announcers': (int, DEFAULT_CONCURRENT_ANNOUNCERS),
     'known_dht_nodes': (list, DEFAULT_DHT_NODES, server_list, server_list_reverse),
     'max_connections_per_stream': (int, 5),
+    'peer_connection_idle_timeout': (int, 60),  # seconds an unused connection to a peer is kept open for reuse
+    'max_download_rate': (int, 0),  # bytes per second, 0 for no limit
+    'max_upload_rate': (int, 0),  # bytes per second, 0 for no limit
+    'rate_limit_burst': (float, 1.0),  # seconds worth of traffic let through at once after being idle
     'seek_head_blob_first': (bool, True),
     # TODO: writing json on the cmd line is a pain, come up with a nicer
     # parser for this data structure. maybe 'USD:25'
@@ -250,6 +258,10 @@ ADJUSTABLE_SETTINGS = {
     'sd_download_timeout': (int, 3),
     'share_usage_data': (bool, True),  # whether to share usage stats and diagnostic info with LBRY
     'peer_search_timeout': (int, 60),
+    'peer_cache_size': (int, 10000),  # max number of blobs to remember the peers of
+    'peer_cache_ttl': (int, 600),  # seconds before the known peers for a blob are refreshed from the dht
+    'peer_cache_negative_ttl': (int, 60),  # seconds before a blob with no known peers is searched for again
+    'peer_cache_peer_ttl': (int, 1800),  # seconds a peer is kept after a search for the blob last found it
     'use_auth_http': (bool, False),
     'use_https': (bool, False),
     'use_upnp': (bool, True),
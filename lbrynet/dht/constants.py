@@ -39,12 +39,26 @@ iterativeLookupDelay = rpcTimeout / 2
 refreshTimeout = 3600  # 1 hour
 #: The interval at which nodes replicate (republish/refresh) data they are holding
 replicateInterval = refreshTimeout
+#: Announces reuse the contacts found by lookups for nearby keys for this long (in seconds)
+lookupReuseTime = 300
+#: The number of recent lookups kept for announces to reuse
+lookupCacheSize = 64
+
+# Contacts that are not in the routing table or storing data are forgotten after being idle this long (in seconds)
+contactIdleTimeout = refreshTimeout
 # The time it takes for data to expire in the network; the original publisher of the data
 # will also republish the data at this time if it is still valid
 dataExpireTimeout = 86400  # 24 hours
 
 tokenSecretChangeInterval = 300  # 5 minutes
 
+#: The interval at which the routing table is saved to disk, if the node has a snapshot path (in seconds)
+routingTableSnapshotInterval = 600
+#: Contacts that last replied to us longer ago than this are left out when restoring a snapshot (in seconds)
+routingTableSnapshotMaxAge = 86400 * 7
+#: The number of contacts from a snapshot that are pinged at once when restoring it
+routingTableSnapshotPings = 32
+
 ######## IMPLEMENTATION-SPECIFIC CONSTANTS ###########
 
 #: The interval for the node to check whether any buckets need refreshing
@@ -54,6 +68,14 @@ checkRefreshInterval = refreshTimeout / 5
 #: be spread across several UDP packets.
 udpDatagramMaxSize = 8192  # 8 KB
 
+#: Limits on the fragments of multi-packet datagrams held while waiting for the rest of their packets
+reassemblyMaxBytes = 4 * 1024 * 1024
+reassemblyMaxBytesPerSource = 256 * 1024
+reassemblyMaxMessagesPerSource = 16
+reassemblyMaxPackets = 64
+#: Incomplete multi-packet datagrams are dropped this long after their first packet arrived (in seconds)
+reassemblyTimeout = rpcTimeout * 2
+
 key_bits = 384
 
 rpc_id_length = 20
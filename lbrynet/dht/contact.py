@@ -29,6 +29,7 @@ class _Contact:
             raise ValueError("invalid ip address")
         self._contactManager = contactManager
         self._id = id
+        self._id_int = None if id is None else int.from_bytes(id, 'big')
         self.address = ipAddress
         self.port = udpPort
         self._networkProtocol = networkProtocol
@@ -55,6 +56,11 @@ class _Contact:
     def id(self):
         return self._id
 
+    @property
+    def id_int(self):
+        """The node id as an integer, cached for distance calculations"""
+        return self._id_int
+
     def log_id(self, short=True):
         if not self.id:
             return "not initialized"
@@ -112,6 +118,8 @@ class _Contact:
     def set_id(self, id):
         if not self._id:
             self._id = id
+            self._id_int = int.from_bytes(id, 'big')
+            self._contactManager._contact_id_set(self)
 
     def update_last_replied(self):
         self.lastReplied = int(self.getTime())
@@ -120,9 +128,7 @@ class _Contact:
         self.lastRequested = int(self.getTime())
 
     def update_last_failed(self):
-        failures = self._contactManager._rpc_failures.get((self.address, self.port), [])
-        failures.append(self.getTime())
-        self._contactManager._rpc_failures[(self.address, self.port)] = failures
+        self._contactManager.record_failure((self.address, self.port))
 
     def update_protocol_version(self, version):
         self.protocolVersion = version
@@ -156,6 +162,13 @@ class _Contact:
 
 
 class ContactManager:
+    """
+    Registry of the contacts the node has communicated with, keyed by (node id, address, port)
+
+    Contacts that are not in use (in the routing table or storing data with us) are evicted once they
+    have been idle for contactIdleTimeout seconds, along with the failure history of their addresses
+    """
+
     def __init__(self, get_time=None):
         if not get_time:
             from twisted.internet import reactor
@@ -163,11 +176,13 @@ class ContactManager:
         self._get_time = get_time
         self._contacts = {}
         self._rpc_failures = {}
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._contacts)
 
     def get_contact(self, id, address, port):
-        for contact in self._contacts.values():
-            if contact.id == id and contact.address == address and contact.port == port:
-                return contact
+        return self._contacts.get((id, address, port))
 
     def make_contact(self, id, ipAddress, udpPort, networkProtocol, firstComm=0):
         contact = self.get_contact(id, ipAddress, udpPort)
@@ -177,6 +192,19 @@ class ContactManager:
         self._contacts[(id, ipAddress, udpPort)] = contact
         return contact
 
+    def _contact_id_set(self, contact):
+        # re-key a contact that was made before its node id was known
+        key = (None, contact.address, contact.port)
+        if self._contacts.get(key) is contact:
+            del self._contacts[key]
+        self._contacts.setdefault((contact.id, contact.address, contact.port), contact)
+
+    def record_failure(self, origin_tuple):
+        failures = self._rpc_failures.get(origin_tuple, [])
+        failures.append(self._get_time())
+        # only the most recent failures are ever looked at, see is_ignored and _Contact.contact_is_good
+        self._rpc_failures[origin_tuple] = failures[-(constants.rpcAttempts + 1):]
+
     def is_ignored(self, origin_tuple):
         failed_rpc_count = len(self._prune_failures(origin_tuple))
         return failed_rpc_count > constants.rpcAttempts
@@ -185,5 +213,38 @@ class ContactManager:
         # Prunes recorded failures to the last time window of attempts
         pruning_limit = self._get_time() - constants.rpcAttemptsPruningTimeWindow
         pruned = list(filter(lambda t: t >= pruning_limit, self._rpc_failures.get(origin_tuple, [])))
-        self._rpc_failures[origin_tuple] = pruned
+        if pruned:
+            self._rpc_failures[origin_tuple] = pruned
+        else:
+            self._rpc_failures.pop(origin_tuple, None)
         return pruned
+
+    def evict_idle_contacts(self, contacts_in_use=()):
+        """
+        Forget the contacts not in contacts_in_use that have been idle for longer than contactIdleTimeout,
+        and the failures older than the pruning window of addresses there are no contacts for anymore
+
+        Returns the number of evicted contacts
+        """
+        now = self._get_time()
+        idle_limit = now - constants.contactIdleTimeout
+        contacts_in_use = set(contacts_in_use)
+        evicted = 0
+        for key, contact in list(self._contacts.items()):
+            if contact not in contacts_in_use and max(contact.commTime or 0, contact.lastInteracted) < idle_limit:
+                del self._contacts[key]
+                evicted += 1
+        self.evictions += evicted
+        known_addresses = {(contact.address, contact.port) for contact in self._contacts.values()}
+        pruning_limit = now - constants.rpcAttemptsPruningTimeWindow
+        for origin_tuple, failures in list(self._rpc_failures.items()):
+            if origin_tuple not in known_addresses and (not failures or failures[-1] < pruning_limit):
+                del self._rpc_failures[origin_tuple]
+        return evicted
+
+    def get_stats(self):
+        return {
+            'contacts': len(self._contacts),
+            'failure_histories': len(self._rpc_failures),
+            'evictions': self.evictions
+        }
@@ -1,3 +1,4 @@
+import heapq
 from collections import UserDict
 from lbrynet.dht import constants
 
@@ -8,13 +9,19 @@ class DictDataStore(UserDict):
 
     def __init__(self, getTime=None):
         # Dictionary format:
-        # { <key>: (<contact>, <value>, <lastPublished>, <originallyPublished> <originalPublisherID>) }
+        # { <key>: { <compact_address>: (<contact>, <compact_address>, <lastPublished>, <originallyPublished>,
+        #                                <originalPublisherID>) } }
         super().__init__()
         if not getTime:
             from twisted.internet import reactor
             getTime = reactor.seconds
         self._getTime = getTime
         self.completed_blobs = set()
+        # heap of (<expiration time>, <key>, <compact_address>), so expiring peers only costs
+        # time proportional to the number of expired entries
+        self._expirations = []
+        # { <contact>: {(<key>, <compact_address>)} }
+        self._contact_keys = {}
 
     def filter_bad_and_expired_peers(self, key):
         """
@@ -23,44 +30,53 @@ class DictDataStore(UserDict):
         return filter(
             lambda peer:
             self._getTime() - peer[3] < constants.dataExpireTimeout and peer[0].contact_is_good is not False,
-            self[key]
+            self[key].values()
         )
 
     def filter_expired_peers(self, key):
         """
         Returns only non-expired peers
         """
-        return filter(lambda peer: self._getTime() - peer[3] < constants.dataExpireTimeout, self[key])
+        return filter(lambda peer: self._getTime() - peer[3] < constants.dataExpireTimeout, self[key].values())
 
     def removeExpiredPeers(self):
-        expired_keys = []
-        for key in self.keys():
-            unexpired_peers = list(self.filter_expired_peers(key))
-            if not unexpired_peers:
-                expired_keys.append(key)
-            else:
-                self[key] = unexpired_peers
-        for key in expired_keys:
-            del self[key]
+        now = self._getTime()
+        while self._expirations and self._expirations[0][0] <= now:
+            _, key, compact_address = heapq.heappop(self._expirations)
+            self._removePeer(key, compact_address)
 
     def hasPeersForBlob(self, key):
-        return bool(key in self and len(tuple(self.filter_bad_and_expired_peers(key))))
+        return key in self and any(True for _ in self.filter_bad_and_expired_peers(key))
 
     def addPeerToBlob(self, contact, key, compact_address, lastPublished, originallyPublished, originalPublisherID):
-        if key in self:
-            if compact_address not in map(lambda store_tuple: store_tuple[1], self[key]):
-                self[key].append(
-                    (contact, compact_address, lastPublished, originallyPublished, originalPublisherID)
-                )
-        else:
-            self[key] = [(contact, compact_address, lastPublished, originallyPublished, originalPublisherID)]
+        compact_address = bytes(compact_address)
+        peers = self.data.setdefault(key, {})
+        if compact_address in peers:
+            return
+        peers[compact_address] = (contact, compact_address, lastPublished, originallyPublished, originalPublisherID)
+        heapq.heappush(
+            self._expirations, (originallyPublished + constants.dataExpireTimeout, key, compact_address)
+        )
+        self._contact_keys.setdefault(contact, set()).add((key, compact_address))
+
+    def _removePeer(self, key, compact_address):
+        peers = self.data.get(key)
+        if not peers or compact_address not in peers:
+            return
+        contact = peers.pop(compact_address)[0]
+        if not peers:
+            del self.data[key]
+        stored = self._contact_keys.get(contact)
+        if stored is not None:
+            stored.discard((key, compact_address))
+            if not stored:
+                del self._contact_keys[contact]
 
     def getPeersForBlob(self, key):
         return [] if key not in self else [val[1] for val in self.filter_bad_and_expired_peers(key)]
 
     def getStoringContacts(self):
-        contacts = set()
-        for key in self:
-            for values in self[key]:
-                contacts.add(values[0])
-        return list(contacts)
+        return list(self._contact_keys)
+
+    def getKeysForContact(self, contact):
+        return list({key for key, _ in self._contact_keys.get(contact, ())})
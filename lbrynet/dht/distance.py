@@ -1,3 +1,4 @@
+import heapq
 from lbrynet.dht import constants
 
 
@@ -5,7 +6,8 @@ class Distance:
     """Calculate the XOR result between two string variables.
 
     Frequently we re-use one of the points so as an optimization
-    we pre-calculate the value of that point.
+    we pre-calculate the value of that point. Contacts cache the integer
+    value of their id, so distances to contacts are a single XOR.
     """
 
     def __init__(self, key):
@@ -24,4 +26,14 @@ class Distance:
 
     def to_contact(self, contact):
         """A convenience function for calculating the distance to a contact"""
-        return self(contact.id)
+        return self.val_key_one ^ contact.id_int
+
+    def sort_contacts(self, contacts):
+        """Sort a list of contacts in place, closest first"""
+        contacts.sort(key=self.to_contact)
+
+    def closest_contacts(self, contacts, count):
+        """Returns the `count` closest contacts, closest first, without sorting all of them"""
+        if count >= len(contacts):
+            return sorted(contacts, key=self.to_contact)
+        return heapq.nsmallest(count, contacts, key=self.to_contact)
@@ -1,75 +1,97 @@
 from lbrynet.dht.error import DecodeError
 
+_INT = ord('i')
+_LIST = ord('l')
+_DICT = ord('d')
+_FLOAT = ord('f')
+_NONE = ord('n')
+_END = ord('e')
+
 
 def bencode(data):
     """ Encoder implementation of the Bencode algorithm (Bittorrent). """
+    encoded = []
+    _encode(data, encoded.append)
+    return b''.join(encoded)
+
+
+def _encode(data, append):
+    # the encoded pieces are collected in a list and joined once, rather than
+    # building the output up with repeated concatenation
     if isinstance(data, int):
-        return b'i%de' % data
+        append(b'i%de' % data)
     elif isinstance(data, (bytes, bytearray)):
-        return b'%d:%s' % (len(data), data)
+        append(b'%d:' % len(data))
+        append(data)
     elif isinstance(data, str):
-        return b'%d:%s' % (len(data), data.encode())
+        data = data.encode()
+        append(b'%d:' % len(data))
+        append(data)
     elif isinstance(data, (list, tuple)):
-        encoded_list_items = b''
+        append(b'l')
         for item in data:
-            encoded_list_items += bencode(item)
-        return b'l%se' % encoded_list_items
+            _encode(item, append)
+        append(b'e')
     elif isinstance(data, dict):
-        encoded_dict_items = b''
-        keys = data.keys()
-        for key in sorted(keys):
-            encoded_dict_items += bencode(key)
-            encoded_dict_items += bencode(data[key])
-        return b'd%se' % encoded_dict_items
+        append(b'd')
+        for key in sorted(data.keys()):
+            _encode(key, append)
+            _encode(data[key], append)
+        append(b'e')
     else:
         raise TypeError("Cannot bencode '%s' object" % type(data))
 
 
 def bdecode(data):
     """ Decoder implementation of the Bencode algorithm. """
-    assert type(data) == bytes  # fixme: _maybe_ remove this after porting
+    if not isinstance(data, bytes):
+        data = bytes(data)
     if len(data) == 0:
         raise DecodeError('Cannot decode empty string')
     try:
         return _decode_recursive(data)[0]
-    except ValueError as e:
+    except (ValueError, IndexError) as e:
         raise DecodeError(str(e))
 
 
 def _decode_recursive(data, start_index=0):
-    if data[start_index] == ord('i'):
-        end_pos = data[start_index:].find(b'e') + start_index
+    # every element is located with find(sep, start) and offsets into the original
+    # data, so decoding never copies the remainder of the message
+    token = data[start_index]
+    if token == _INT:
+        end_pos = data.index(b'e', start_index)
         return int(data[start_index + 1:end_pos]), end_pos + 1
-    elif data[start_index] == ord('l'):
+    elif token == _LIST:
         start_index += 1
         decoded_list = []
-        while data[start_index] != ord('e'):
+        while data[start_index] != _END:
             list_data, start_index = _decode_recursive(data, start_index)
             decoded_list.append(list_data)
         return decoded_list, start_index + 1
-    elif data[start_index] == ord('d'):
+    elif token == _DICT:
         start_index += 1
         decoded_dict = {}
-        while data[start_index] != ord('e'):
+        while data[start_index] != _END:
             key, start_index = _decode_recursive(data, start_index)
             value, start_index = _decode_recursive(data, start_index)
             decoded_dict[key] = value
-        return decoded_dict, start_index
-    elif data[start_index] == ord('f'):
+        return decoded_dict, start_index + 1
+    elif token == _FLOAT:
         # This (float data type) is a non-standard extension to the original Bencode algorithm
-        end_pos = data[start_index:].find(b'e') + start_index
+        end_pos = data.index(b'e', start_index)
         return float(data[start_index + 1:end_pos]), end_pos + 1
-    elif data[start_index] == ord('n'):
+    elif token == _NONE:
         # This (None/NULL data type) is a non-standard extension
         # to the original Bencode algorithm
         return None, start_index + 1
     else:
-        split_pos = data[start_index:].find(b':') + start_index
+        split_pos = data.index(b':', start_index)
         try:
             length = int(data[start_index:split_pos])
         except ValueError:
             raise DecodeError()
         start_index = split_pos + 1
         end_pos = start_index + length
-        b = data[start_index:end_pos]
-        return b, end_pos
+        if length < 0 or end_pos > len(data):
+            raise DecodeError("string length exceeds the data")
+        return data[start_index:end_pos], end_pos
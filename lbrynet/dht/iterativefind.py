@@ -63,7 +63,7 @@ class _IterativeFind:
     def is_closer(self, contact):
         if not self.closest_node:
             return True
-        return self.distance.is_closer(contact.id, self.closest_node.id)
+        return self.distance.to_contact(contact) < self.distance.to_contact(self.closest_node)
 
     def getContactTriples(self, result):
         if self.is_find_value_request:
@@ -78,7 +78,7 @@ class _IterativeFind:
 
     def sortByDistance(self, contact_list):
         """Sort the list of contacts in order by distance from key"""
-        contact_list.sort(key=lambda c: self.distance(c.id))
+        self.distance.sort_contacts(contact_list)
 
     def extendShortlist(self, contact, result):
         # The "raw response" tuple contains the response message and the originating address info
@@ -149,8 +149,8 @@ class _IterativeFind:
         if self.is_find_value_request:
             # search stops when it finds a value, let it run
             return False
-        if self.prev_closest_node and self.closest_node and self.distance.is_closer(self.prev_closest_node.id,
-                                                                                    self.closest_node.id):
+        if self.prev_closest_node and self.closest_node and \
+                self.distance.to_contact(self.prev_closest_node) < self.distance.to_contact(self.closest_node):
             # we're getting further away
             return True
         if len(self.active_contacts) >= constants.k:
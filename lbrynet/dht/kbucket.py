@@ -100,12 +100,8 @@ class KBucket:
             return contacts
 
         if sort_distance_to is False:
-            pass
-        else:
-            sort_distance_to = sort_distance_to or self._node_id
-            contacts.sort(key=lambda c: Distance(sort_distance_to)(c.id))
-
-        return contacts[:min(currentLen, count)]
+            return contacts[:min(currentLen, count)]
+        return Distance(sort_distance_to or self._node_id).closest_contacts(contacts, count)
 
     def getBadOrUnknownContacts(self):
         contacts = self.getContacts(sort_distance_to=False)
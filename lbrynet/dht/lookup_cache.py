@@ -0,0 +1,113 @@
+import logging
+from collections import OrderedDict
+
+from twisted.internet import defer
+from lbrynet.dht import constants
+from lbrynet.dht.distance import Distance
+
+log = logging.getLogger(__name__)
+
+
+class LookupCache:
+    """
+    Finds the k closest contacts to keys being announced, reusing recent iterativeFindNode lookups
+
+    A lookup finds the k closest contacts to its key, they all fall in the keyspace subtree of the
+    common prefix of the key and the farthest of them. A key in the closer half of that subtree has
+    (nearly) the same k closest contacts, so it is served from the lookup instead of running its own.
+    Announcing keys in sorted order makes consecutive keys fall under the same lookups.
+
+    Keys that fall in the k-bucket holding our own id, once it has been split and is full, are
+    served from the routing table, which is kept densest in that region
+    """
+
+    def __init__(self, node, max_age=constants.lookupReuseTime, max_size=constants.lookupCacheSize):
+        self._node = node
+        self.max_age = max_age
+        self.max_size = max_size
+        self._lookups = OrderedDict()  # {key as int: (contacts, finished at, covered bits)}
+        self._pending = {}  # {key as int: [deferreds waiting for the lookup]}
+        # the covered bits of the last lookup, to guess whether a pending lookup will cover a key
+        self._covered_bits = None
+        self.lookups = 0
+        self.reused_lookups = 0
+        self.routing_table_hits = 0
+
+    def _covering_contacts(self, key_int):
+        now = self._node.clock.seconds()
+        for lookup_key in reversed(self._lookups):
+            contacts, finished_at, covered_bits = self._lookups[lookup_key]
+            if now - finished_at >= self.max_age:
+                continue
+            if (lookup_key ^ key_int).bit_length() < covered_bits:
+                return contacts
+        return None
+
+    def _is_dense(self, key):
+        routing_table = self._node._routingTable
+        index = routing_table._kbucketIndex(key)
+        bucket = routing_table._buckets[index]
+        return index == routing_table._kbucketIndex(self._node.node_id) and \
+            bucket.rangeMax - bucket.rangeMin < 2 ** constants.key_bits and len(bucket) >= constants.k
+
+    def _add_lookup(self, key_int, contacts):
+        if len(contacts) < constants.k:
+            # not enough contacts to say which part of the keyspace the lookup covers
+            return
+        farthest = max(contact.id_int ^ key_int for contact in contacts)
+        covered_bits = farthest.bit_length() - 1
+        self._covered_bits = covered_bits
+        self._lookups[key_int] = (contacts, self._node.clock.seconds(), covered_bits)
+        self._lookups.move_to_end(key_int)
+        while len(self._lookups) > self.max_size:
+            self._lookups.popitem(last=False)
+
+    @defer.inlineCallbacks
+    def _wait_for_pending_lookup(self, key_int):
+        """
+        If a lookup that will probably cover the key is running, wait for it to finish
+        """
+        if not self._pending or self._covered_bits is None:
+            return
+        nearest = min(self._pending, key=lambda lookup_key: lookup_key ^ key_int)
+        if (nearest ^ key_int).bit_length() < self._covered_bits:
+            d = defer.Deferred()
+            self._pending[nearest].append(d)
+            yield d
+
+    @defer.inlineCallbacks
+    def find_close_contacts(self, key):
+        """
+        Returns a deferred that fires with up to k of the closest contacts to the key
+        """
+        key_int = int.from_bytes(key, 'big')
+        contacts = self._covering_contacts(key_int)
+        if contacts is None:
+            yield self._wait_for_pending_lookup(key_int)
+            contacts = self._covering_contacts(key_int)
+        if contacts is not None:
+            self.reused_lookups += 1
+            return Distance(key).closest_contacts(contacts, constants.k)
+        if self._is_dense(key):
+            self.routing_table_hits += 1
+            return self._node._routingTable.findCloseNodes(key)
+
+        self.lookups += 1
+        waiting = self._pending.setdefault(key_int, [])
+        try:
+            contacts = yield self._node.iterativeFindNode(key)
+            self._add_lookup(key_int, contacts)
+        finally:
+            if self._pending.get(key_int) is waiting:
+                del self._pending[key_int]
+            for d in waiting:
+                d.callback(None)
+        return contacts
+
+    def get_stats(self):
+        return {
+            'lookups': self.lookups,
+            'reused_lookups': self.reused_lookups,
+            'routing_table_hits': self.routing_table_hits,
+            'cached_lookups': len(self._lookups)
+        }
@@ -11,6 +11,8 @@ from lbrynet.dht.error import TimeoutError
 from lbrynet.dht import constants, routingtable, datastore, protocol
 from lbrynet.dht.contact import ContactManager
 from lbrynet.dht.iterativefind import iterativeFind
+from lbrynet.dht.lookup_cache import LookupCache
+from lbrynet.dht.snapshot import RoutingTableSnapshot
 
 log = logging.getLogger(__name__)
 
@@ -79,7 +81,7 @@ class Node(MockKademliaHelper):
                  routingTableClass=None, networkProtocol=None,
                  externalIP=None, peerPort=3333, listenUDP=None,
                  callLater=None, resolve=None, clock=None,
-                 interface='', externalUDPPort=None):
+                 interface='', externalUDPPort=None, snapshot_path=None):
         """
         @param dataStore: The data store to use. This must be class inheriting
                           from the C{DataStore} interface (or providing the
@@ -103,6 +105,8 @@ class Node(MockKademliaHelper):
         @type networkProtocol: entangled.kademlia.protocol.KademliaProtocol
         @param externalIP: the IP at which this node can be contacted
         @param peerPort: the port at which this node announces it has a blob for
+        @param snapshot_path: file to save the routing table to, the contacts in it are used
+                              to rejoin the network when the node is restarted
         """
 
         super().__init__(clock, callLater, resolve, listenUDP)
@@ -112,6 +116,8 @@ class Node(MockKademliaHelper):
         self._change_token_lc = self.get_looping_call(self.change_token)
         self._refresh_node_lc = self.get_looping_call(self._refreshNode)
         self._refresh_contacts_lc = self.get_looping_call(self._refreshContacts)
+        self._snapshot = None if snapshot_path is None else RoutingTableSnapshot(snapshot_path)
+        self._save_snapshot_lc = self.get_looping_call(self.save_routing_table)
 
         # Create k-buckets (for storing contacts)
         if routingTableClass is None:
@@ -126,6 +132,7 @@ class Node(MockKademliaHelper):
         self.peerPort = peerPort
         self.externalUDPPort = externalUDPPort or self.port
         self._dataStore = dataStore or datastore.DictDataStore(self.clock.seconds)
+        self.announce_lookups = LookupCache(self)
         self._join_deferred = None
 
     #def __del__(self):
@@ -143,6 +150,8 @@ class Node(MockKademliaHelper):
         yield self.safe_stop_looping_call(self._refresh_node_lc)
         yield self.safe_stop_looping_call(self._change_token_lc)
         yield self.safe_stop_looping_call(self._refresh_contacts_lc)
+        yield self.safe_stop_looping_call(self._save_snapshot_lc)
+        self.save_routing_table()
         if self._listeningPort is not None:
             yield self._listeningPort.stopListening()
         self._listeningPort = None
@@ -162,7 +171,8 @@ class Node(MockKademliaHelper):
     @defer.inlineCallbacks
     def joinNetwork(self, known_node_addresses=(('jack.lbry.tech', 4455), )):
         """
-        Attempt to join the dht, retry every 30 seconds if unsuccessful
+        Attempt to join the dht, retry every 30 seconds if unsuccessful. The contacts in the routing table
+        snapshot are tried first, the seed nodes are only contacted if fewer than k of them reply
         :param known_node_addresses: [(str, int)] list of hostnames and ports for known dht seed nodes
         """
 
@@ -177,7 +187,10 @@ class Node(MockKademliaHelper):
                 result[(host, port)] = node_address
             defer.returnValue(result)
 
-        if not known_node_resolution:
+        restored = yield self.restore_routing_table()
+        if restored >= constants.k:
+            log.info("Rejoining the DHT network using %i contacts from the routing table snapshot", restored)
+        else:
             known_node_resolution = yield _resolve_seeds()
             # we are one of the seed nodes, don't add ourselves
             if (self.externalIP, self.port) in known_node_resolution.values():
@@ -205,22 +218,24 @@ class Node(MockKademliaHelper):
                             if not contact.id:
                                 bootstrap_contacts.append(contact)
                             break
-            if not bootstrap_contacts:
+            shortlist = []
+            if bootstrap_contacts:
+                ping_result = yield _ping_contacts(bootstrap_contacts)
+                shortlist = list(ping_result.keys())
+                if not shortlist:
+                    log.warning("failed to ping %i bootstrap contacts", len(bootstrap_contacts))
+            elif not self.contacts:
                 log.warning("no bootstrap contacts to ping")
-            ping_result = yield _ping_contacts(bootstrap_contacts)
-            shortlist = list(ping_result.keys())
-            if not shortlist:
-                log.warning("failed to ping %i bootstrap contacts", len(bootstrap_contacts))
-                defer.returnValue(None)
-            else:
-                # find the closest peers to us
-                closest = yield self._iterativeFind(self.node_id, shortlist if not self.contacts else None)
-                yield _ping_contacts(closest)
-                # query random hashes in our bucket key ranges to fill or split them
-                random_ids_in_range = self._routingTable.getRefreshList()
-                while random_ids_in_range:
-                    yield self.iterativeFindNode(random_ids_in_range.pop())
+            if not shortlist and not self.contacts:
                 defer.returnValue(None)
+            # find the closest peers to us, starting from the routing table if it has contacts
+            closest = yield self._iterativeFind(self.node_id, shortlist if not self.contacts else None)
+            yield _ping_contacts(closest)
+            # query random hashes in our bucket key ranges to fill or split them
+            random_ids_in_range = self._routingTable.getRefreshList()
+            while random_ids_in_range:
+                yield self.iterativeFindNode(random_ids_in_range.pop())
+            defer.returnValue(None)
 
         @defer.inlineCallbacks
         def _iterative_join(joined_d=None, last_buckets_with_contacts=None):
@@ -269,6 +284,44 @@ class Node(MockKademliaHelper):
         # Start refreshing k-buckets periodically, if necessary
         self.safe_start_looping_call(self._refresh_node_lc, constants.checkRefreshInterval)
         self.safe_start_looping_call(self._refresh_contacts_lc, 60)
+        if self._snapshot is not None:
+            self.safe_start_looping_call(self._save_snapshot_lc, constants.routingTableSnapshotInterval)
+
+    def save_routing_table(self):
+        """
+        Save the contacts in the routing table that have replied to us to the snapshot, if there are any
+        """
+        if self._snapshot is None:
+            return
+        contacts = [contact for contact in self.contacts
+                    if contact.lastReplied and contact.contact_is_good is not False]
+        if contacts:
+            self._snapshot.save(contacts)
+
+    @defer.inlineCallbacks
+    def restore_routing_table(self):
+        """
+        Ping the contacts saved in the routing table snapshot, the ones that reply are added to the
+        routing table. Returns a deferred that fires with the number of contacts that replied
+        """
+        if self._snapshot is None:
+            defer.returnValue(0)
+        contacts = []
+        for node_id, address, port, _, protocol_version in self._snapshot.load(self.clock.seconds()):
+            if node_id == self.node_id or (address, port) == (self.externalIP, self.externalUDPPort):
+                continue
+            try:
+                contact = self.contact_manager.make_contact(node_id, address, port, self._protocol)
+            except ValueError:
+                continue
+            contact.update_protocol_version(protocol_version)
+            contacts.append(contact)
+        if not contacts:
+            defer.returnValue(0)
+        log.info("Pinging %i contacts from the routing table snapshot", len(contacts))
+        replied = yield self._protocol._ping_queue.ping_contacts(contacts)
+        log.info("Restored %i/%i contacts from the routing table snapshot", len(replied), len(contacts))
+        defer.returnValue(len(replied))
 
     @property
     def contacts(self):
@@ -311,7 +364,7 @@ class Node(MockKademliaHelper):
 
     @defer.inlineCallbacks
     def announceHaveBlob(self, blob_hash):
-        contacts = yield self.iterativeFindNode(blob_hash)
+        contacts = yield self.announce_lookups.find_close_contacts(blob_hash)
 
         if not self.externalIP:
             raise Exception("Cannot determine external IP: %s" % self.externalIP)
@@ -632,6 +685,7 @@ class Node(MockKademliaHelper):
         yield self._refreshRoutingTable()
         self._dataStore.removeExpiredPeers()
         self._refreshStoringPeers()
+        self.contact_manager.evict_idle_contacts(list(self.contacts) + self._dataStore.getStoringContacts())
         defer.returnValue(None)
 
     def _refreshContacts(self):
@@ -3,8 +3,10 @@ import errno
 from binascii import hexlify
 
 from twisted.internet import protocol, defer
+from lbrynet.utils import DeferredDict
 from lbrynet.dht import constants, encoding, msgformat, msgtypes
 from lbrynet.dht.error import BUILTIN_EXCEPTIONS, UnknownRemoteException, TimeoutError, TransportNotConnected
+from lbrynet.dht.reassembly import ReassemblyBuffer
 
 log = logging.getLogger(__name__)
 
@@ -44,6 +46,16 @@ class PingQueue:
             if contact in self._enqueued_contacts:
                 del self._enqueued_contacts[contact]
 
+    def ping_contacts(self, contacts, concurrency=constants.routingTableSnapshotPings):
+        """
+        Ping the contacts right away, at most concurrency of them at a time. Contacts that reply are
+        added to the routing table, returns a deferred that fires with a list of them
+        """
+        sem = defer.DeferredSemaphore(concurrency)
+        d = DeferredDict({contact: sem.run(contact.ping) for contact in contacts}, consumeErrors=True)
+        d.addCallback(list)
+        return d
+
     def _process(self):
         # move contacts that are scheduled to join the queue
         if self._pending_contacts:
@@ -74,8 +86,7 @@ class KademliaProtocol(protocol.DatagramProtocol):
         self._node = node
         self._translator = msgformat.DefaultFormat()
         self._sentMessages = {}
-        self._partialMessages = {}
-        self._partialMessagesProgress = {}
+        self._partialMessages = ReassemblyBuffer(self._node.reactor_callLater)
         self._listening = defer.Deferred(None)
         self._ping_queue = PingQueue(self._node)
         self._protocolVersion = constants.protocolVersion
@@ -213,18 +224,8 @@ class KademliaProtocol(protocol.DatagramProtocol):
             totalPackets = (datagram[1] << 8) | datagram[2]
             msgID = datagram[5:25]
             seqNumber = (datagram[3] << 8) | datagram[4]
-            if msgID not in self._partialMessages:
-                self._partialMessages[msgID] = {}
-            self._partialMessages[msgID][seqNumber] = datagram[26:]
-            if len(self._partialMessages[msgID]) == totalPackets:
-                keys = self._partialMessages[msgID].keys()
-                keys.sort()
-                data = b''
-                for key in keys:
-                    data += self._partialMessages[msgID][key]
-                    datagram = data
-                del self._partialMessages[msgID]
-            else:
+            datagram = self._partialMessages.add(address, msgID, seqNumber, totalPackets, datagram[26:])
+            if datagram is None:
                 return
         try:
             msgPrimitive = encoding.bdecode(datagram)
@@ -342,13 +343,13 @@ class KademliaProtocol(protocol.DatagramProtocol):
             totalPackets = len(data) // self.msgSizeLimit
             if len(data) % self.msgSizeLimit > 0:
                 totalPackets += 1
-            encTotalPackets = chr(totalPackets >> 8) + chr(totalPackets & 0xff)
+            encTotalPackets = totalPackets.to_bytes(2, 'big')
             seqNumber = 0
             startPos = 0
             while seqNumber < totalPackets:
                 packetData = data[startPos:startPos + self.msgSizeLimit]
-                encSeqNumber = chr(seqNumber >> 8) + chr(seqNumber & 0xff)
-                txData = f'\x00{encTotalPackets}{encSeqNumber}{rpcID}\x00{packetData}'
+                encSeqNumber = seqNumber.to_bytes(2, 'big')
+                txData = b''.join((b'\x00', encTotalPackets, encSeqNumber, rpcID, b'\x00', packetData))
                 self._scheduleSendNext(txData, address)
 
                 startPos += self.msgSizeLimit
@@ -460,28 +461,17 @@ class KademliaProtocol(protocol.DatagramProtocol):
 
     def _msgTimeoutInProgress(self, messageID, timeoutCanceller, remoteContact, df, method, args):
         # See if any progress has been made; if not, kill the message
-        if self._hasProgressBeenMade(messageID):
+        if self._partialMessages.has_progressed(messageID):
             # Reset the RPC timeout timer
             timeoutCanceller()
             timeoutCall, cancelTimeout = self._node.reactor_callLater(constants.rpcTimeout, self._msgTimeout, messageID)
             self._sentMessages[messageID] = (remoteContact, df, timeoutCall, cancelTimeout, method, args)
         else:
             # No progress has been made
-            if messageID in self._partialMessagesProgress:
-                del self._partialMessagesProgress[messageID]
-            if messageID in self._partialMessages:
-                del self._partialMessages[messageID]
+            self._partialMessages.discard(messageID)
+            del self._sentMessages[messageID]
             df.errback(TimeoutError(remoteContact.id))
 
-    def _hasProgressBeenMade(self, messageID):
-        return (
-            messageID in self._partialMessagesProgress and
-            (
-                len(self._partialMessagesProgress[messageID]) !=
-                len(self._partialMessages[messageID])
-            )
-        )
-
     def stopProtocol(self):
         """ Called when the transport is disconnected.
 
@@ -489,5 +479,6 @@ class KademliaProtocol(protocol.DatagramProtocol):
         """
         log.info('Stopping DHT')
         self._ping_queue.stop()
+        self._partialMessages.clear()
         self._node.call_later_manager.stop()
         log.info('DHT stopped')
@@ -0,0 +1,145 @@
+import logging
+
+from lbrynet.dht import constants
+
+log = logging.getLogger(__name__)
+
+
+class _PartialMessage:
+    __slots__ = ('address', 'fragments', 'received', 'size', 'checked', 'cancel_timeout')
+
+    def __init__(self, address, total_packets):
+        self.address = address
+        self.fragments = [None] * total_packets
+        self.received = 0
+        self.size = 0
+        # the number of received fragments the last time progress was checked
+        self.checked = 0
+        self.cancel_timeout = None
+
+
+class ReassemblyBuffer:
+    """
+    Holds the fragments of multi-packet datagrams until every packet of a message has arrived
+
+    The bytes held for all messages and the bytes and messages held for each source address are
+    capped, a fragment that would go over its source's share is dropped and the oldest messages are
+    dropped to make room under the total cap. A message is dropped once timeout seconds pass without a
+    new fragment of it arriving.
+    """
+
+    def __init__(self, call_later, max_bytes=constants.reassemblyMaxBytes,
+                 max_bytes_per_source=constants.reassemblyMaxBytesPerSource,
+                 max_messages_per_source=constants.reassemblyMaxMessagesPerSource,
+                 max_packets=constants.reassemblyMaxPackets, timeout=constants.reassemblyTimeout):
+        """
+        call_later - schedules a call and returns a (delayed call, canceller) tuple,
+                     like CallLaterManager.call_later
+        """
+        self._call_later = call_later
+        self.max_bytes = max_bytes
+        self.max_bytes_per_source = max_bytes_per_source
+        self.max_messages_per_source = max_messages_per_source
+        self.max_packets = max_packets
+        self.timeout = timeout
+        self._messages = {}  # {msg_id: _PartialMessage}, oldest first
+        self._sources = {}  # {address: [bytes held, messages held] for messages from the address}
+        self.total_bytes = 0
+        self.dropped_fragments = 0
+        self.expired_messages = 0
+
+    def __contains__(self, msg_id):
+        return msg_id in self._messages
+
+    def __len__(self):
+        return len(self._messages)
+
+    def add(self, address, msg_id, seq_number, total_packets, fragment):
+        """
+        Add a received fragment, returns the reassembled message once all of its fragments are in,
+        otherwise None
+        """
+        if not 0 <= seq_number < total_packets <= self.max_packets:
+            self.dropped_fragments += 1
+            return None
+        message = self._messages.get(msg_id)
+        if message is None:
+            message = _PartialMessage(address, total_packets)
+        elif message.address != address or len(message.fragments) != total_packets:
+            # a fragment that doesn't belong with the ones we have, don't let it corrupt the message
+            self.dropped_fragments += 1
+            return None
+        if message.fragments[seq_number] is not None:
+            return None
+        source = self._sources.get(address, [0, 0])
+        if source[0] + len(fragment) > self.max_bytes_per_source or len(fragment) > self.max_bytes or \
+                (msg_id not in self._messages and source[1] >= self.max_messages_per_source):
+            self.dropped_fragments += 1
+            return None
+        if msg_id not in self._messages:
+            self._messages[msg_id] = message
+            self._sources.setdefault(address, [0, 0])[1] += 1
+        while self.total_bytes + len(fragment) > self.max_bytes:
+            self.discard(next(iter(self._messages)))
+        if msg_id not in self._messages:
+            # the message was the oldest one and has been dropped to make room
+            self.dropped_fragments += 1
+            return None
+
+        message.fragments[seq_number] = fragment
+        message.received += 1
+        message.size += len(fragment)
+        self._sources[address][0] += len(fragment)
+        self.total_bytes += len(fragment)
+        if message.received < len(message.fragments):
+            # the message is still arriving, give it another timeout to finish
+            if message.cancel_timeout is not None:
+                message.cancel_timeout()
+            _, message.cancel_timeout = self._call_later(self.timeout, self._expire, msg_id)
+            return None
+        self.discard(msg_id)
+        return b''.join(message.fragments)
+
+    def has_progressed(self, msg_id):
+        """
+        Whether fragments of the message have arrived since the last time this was checked
+        """
+        message = self._messages.get(msg_id)
+        if message is None or message.received == message.checked:
+            return False
+        message.checked = message.received
+        return True
+
+    def discard(self, msg_id):
+        message = self._messages.pop(msg_id, None)
+        if message is None:
+            return
+        if message.cancel_timeout is not None:
+            message.cancel_timeout()
+        self.total_bytes -= message.size
+        source = self._sources[message.address]
+        source[0] -= message.size
+        source[1] -= 1
+        if not source[1]:
+            del self._sources[message.address]
+
+    def _expire(self, msg_id):
+        message = self._messages.get(msg_id)
+        if message is not None:
+            message.cancel_timeout = None
+            log.debug("dropping incomplete message from %s:%i, got %i/%i packets", message.address[0],
+                      message.address[1], message.received, len(message.fragments))
+            self.expired_messages += 1
+            self.discard(msg_id)
+
+    def clear(self):
+        for msg_id in list(self._messages):
+            self.discard(msg_id)
+
+    def get_stats(self):
+        return {
+            'messages': len(self._messages),
+            'bytes': self.total_bytes,
+            'dropped_fragments': self.dropped_fragments,
+            'expired_messages': self.expired_messages
+        }
@@ -59,11 +59,9 @@ class TreeRoutingTable:
         #  https://stackoverflow.com/questions/32129978/highly-unbalanced-kademlia-routing-table/32187456#32187456
         if self._buckets[bucketIndex].keyInRange(self._parentNodeID):
             return True
-        contacts = self.get_contacts()
         distance = Distance(self._parentNodeID)
-        contacts.sort(key=lambda c: distance(c.id))
-        kth_contact = contacts[-1] if len(contacts) < constants.k else contacts[constants.k-1]
-        return distance(toAdd) < distance(kth_contact.id)
+        kth_contact = distance.closest_contacts(self.get_contacts(), constants.k)[-1]
+        return distance(toAdd) < distance.to_contact(kth_contact)
 
     def addContact(self, contact):
         """ Add the given contact to the correct k-bucket; if it already
@@ -173,10 +171,8 @@ class TreeRoutingTable:
             exclude.remove(key)
         count = count or constants.k
         distance = Distance(key)
-        contacts = self.get_contacts()
-        contacts = [c for c in contacts if c.id not in exclude]
-        contacts.sort(key=lambda c: distance(c.id))
-        return contacts[:min(count, len(contacts))]
+        contacts = [c for c in self.get_contacts() if c.id not in exclude]
+        return distance.closest_contacts(contacts, count)
 
     def getContact(self, contactID):
         """ Returns the (known) contact with the specified node ID
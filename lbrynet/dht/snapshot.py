@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+from binascii import hexlify, unhexlify
+
+from lbrynet.dht import constants
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+class RoutingTableSnapshot:
+    """
+    Saves the contacts of the routing table that have replied to us to a json file, so that a restarted
+    node can ping them to rebuild its routing table instead of bootstrapping from the seed nodes
+    """
+
+    def __init__(self, path, max_age=constants.routingTableSnapshotMaxAge):
+        self.path = path
+        self.max_age = max_age
+
+    def save(self, contacts):
+        """
+        Write the contacts to the snapshot, the previous snapshot is replaced only once the new one
+        is completely written
+        """
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'contacts': [
+                [hexlify(contact.id).decode(), contact.address, contact.port, contact.lastReplied,
+                 contact.protocolVersion]
+                for contact in contacts if contact.id
+            ]
+        }
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as snapshot_file:
+                json.dump(snapshot, snapshot_file)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            log.warning("failed to save the routing table snapshot to %s: %s", self.path, err)
+            return 0
+        log.debug("saved %i contacts to the routing table snapshot", len(snapshot['contacts']))
+        return len(snapshot['contacts'])
+
+    def load(self, now):
+        """
+        Returns (node_id, address, port, last_replied, protocol_version) tuples for the contacts in the
+        snapshot that replied to us within max_age seconds of now, most recently replied first
+        """
+        if not os.path.isfile(self.path):
+            return []
+        try:
+            with open(self.path, 'r') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError) as err:
+            log.warning("failed to read the routing table snapshot %s: %s", self.path, err)
+            return []
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            log.warning("ignoring routing table snapshot %s with an unknown format", self.path)
+            return []
+        contacts = []
+        for entry in snapshot.get('contacts', []):
+            try:
+                node_id, address, port, last_replied, protocol_version = entry
+                node_id = unhexlify(node_id)
+                port, last_replied, protocol_version = int(port), int(last_replied), int(protocol_version)
+            except (TypeError, ValueError):
+                continue
+            if now - last_replied <= self.max_age:
+                contacts.append((node_id, address, port, last_replied, protocol_version))
+        contacts.sort(key=lambda contact: contact[3], reverse=True)
+        return contacts
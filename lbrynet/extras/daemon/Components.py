@@ -88,7 +88,7 @@ class DatabaseComponent(Component):
 
     @staticmethod
     def get_current_db_revision():
-        return 9
+        return 10
 
     @staticmethod
     def get_revision_filename():
@@ -317,29 +317,44 @@ class BlobComponent(Component):
     def __init__(self, component_manager):
         super().__init__(component_manager)
         self.blob_manager = None
+        self._verify_task = None
 
     @property
     def component(self):
         return self.blob_manager
 
-    def start(self):
+    async def start(self):
         storage = self.component_manager.get_component(DATABASE_COMPONENT)
         datastore = None
         if DHT_COMPONENT not in self.component_manager.skip_components:
             dht_node = self.component_manager.get_component(DHT_COMPONENT)
             if dht_node:
                 datastore = dht_node._dataStore
-        self.blob_manager = DiskBlobManager(os.path.join(conf.settings.data_dir, "blobfiles"), storage, datastore)
-        return self.blob_manager.setup()
+        self.blob_manager = DiskBlobManager(
+            os.path.join(conf.settings.data_dir, "blobfiles"), storage, datastore, conf.settings['blob_cache_size']
+        )
+        await self.blob_manager.setup()
+        if conf.settings['verify_blobs_on_startup']:
+            self._verify_task = asyncio.ensure_future(
+                self.blob_manager.verify_blobs(workers=conf.settings['blob_verify_workers'])
+            )
 
-    def stop(self):
-        return self.blob_manager.stop()
+    async def stop(self):
+        if self._verify_task is not None and not self._verify_task.done():
+            self._verify_task.cancel()
+        self._verify_task = None
+        await self.blob_manager.stop()
 
     async def get_status(self):
         count = 0
+        cache_stats = {}
+        verification = {}
         if self.blob_manager:
             count = await self.blob_manager.storage.count_finished_blobs()
-        return {'finished_blobs': count}
+            cache_stats = self.blob_manager.blobs.get_stats()
+            if self.blob_manager.verifier is not None:
+                verification = self.blob_manager.verifier.get_progress()
+        return {'finished_blobs': count, 'blob_cache': cache_stats, 'verification': verification}
 
 
 class DHTComponent(Component):
@@ -360,7 +375,8 @@ class DHTComponent(Component):
     async def get_status(self):
         return {
             'node_id': binascii.hexlify(conf.settings.get_node_id()),
-            'peers_in_routing_table': 0 if not self.dht_node else len(self.dht_node.contacts)
+            'peers_in_routing_table': 0 if not self.dht_node else len(self.dht_node.contacts),
+            'peer_cache': self.component_manager.peer_finder.get_stats()
         }
 
     async def start(self):
@@ -382,7 +398,8 @@ class DHTComponent(Component):
             udpPort=conf.settings['dht_node_port'],
             externalUDPPort=self.external_udp_port,
             externalIP=external_ip,
-            peerPort=self.external_peer_port
+            peerPort=self.external_peer_port,
+            snapshot_path=os.path.join(conf.settings.data_dir, "dht_routing_table.json")
         )
 
         await d2f(self.dht_node.start(conf.settings['known_dht_nodes'], block_on_join=False))
@@ -394,7 +411,7 @@ class DHTComponent(Component):
 
 class HashAnnouncerComponent(Component):
     component_name = HASH_ANNOUNCER_COMPONENT
-    depends_on = [DHT_COMPONENT, DATABASE_COMPONENT]
+    depends_on = [DHT_COMPONENT, DATABASE_COMPONENT, BLOB_COMPONENT]
 
     def __init__(self, component_manager):
         super().__init__(component_manager)
@@ -407,15 +424,20 @@ class HashAnnouncerComponent(Component):
     async def start(self):
         storage = self.component_manager.get_component(DATABASE_COMPONENT)
         dht_node = self.component_manager.get_component(DHT_COMPONENT)
-        self.hash_announcer = DHTHashAnnouncer(dht_node, storage)
+        blob_manager = self.component_manager.get_component(BLOB_COMPONENT)
+        self.hash_announcer = DHTHashAnnouncer(dht_node, storage, blob_manager=blob_manager)
         self.hash_announcer.start()
 
     def stop(self):
         self.hash_announcer.stop()
 
     async def get_status(self):
+        if not self.hash_announcer:
+            return {'announce_queue_size': 0, 'announce_lookups': {}, 'announcers': {}}
         return {
-            'announce_queue_size': 0 if not self.hash_announcer else len(self.hash_announcer.hash_queue)
+            'announce_queue_size': len(self.hash_announcer.hash_queue),
+            'announce_lookups': self.hash_announcer.dht_node.announce_lookups.get_stats(),
+            'announcers': self.hash_announcer.get_stats()
         }
 
 
@@ -430,7 +452,13 @@ class RateLimiterComponent(Component):
     def component(self):
         return self.rate_limiter
 
+    async def get_status(self):
+        return self.rate_limiter.get_stats()
+
     async def start(self):
+        self.rate_limiter.burst = conf.settings['rate_limit_burst']
+        self.rate_limiter.set_dl_limit(conf.settings['max_download_rate'] or None)
+        self.rate_limiter.set_ul_limit(conf.settings['max_upload_rate'] or None)
         self.rate_limiter.start()
 
     async def stop(self):
@@ -472,7 +500,8 @@ class FileManagerComponent(Component):
         if not self.file_manager:
             return
         return {
-            'managed_files': len(self.file_manager.lbry_files)
+            'managed_files': len(self.file_manager.lbry_files),
+            'streams_being_created': [creator.get_progress() for creator in self.file_manager.stream_creators]
         }
 
     def start(self):
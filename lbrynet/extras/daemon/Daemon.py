@@ -4,7 +4,6 @@ import urllib
 import textwrap
 
 from typing import Callable, Optional, List
-from operator import itemgetter
 from binascii import hexlify, unhexlify
 from copy import deepcopy
 from twisted.internet.task import LoopingCall
@@ -14,6 +13,7 @@ from torba.client.baseaccount import SingleKey, HierarchicalDeterministic
 from lbrynet import __version__
 from lbrynet.dht.error import TimeoutError
 from lbrynet.blob.blob_file import is_valid_blobhash
+from lbrynet.blob.stream_reader import EncryptedStreamReader, BlobNotAvailableError
 from lbrynet.extras import system_info
 from lbrynet.extras.reflector import reupload
 from lbrynet.extras.daemon.Components import d2f
@@ -176,6 +176,14 @@ class _FileID(IterableContainer):
 
 FileID = _FileID()
 
+# fields of the file_list results that are plain attributes of the lbry file, these can be
+# sorted on without reading the files and their blobs
+LBRY_FILE_ATTRIBUTES = {
+    'completed', 'file_name', 'download_directory', 'points_paid', 'stopped', 'stream_hash', 'stream_name',
+    'suggested_file_name', 'sd_hash', 'claim_id', 'txid', 'nout', 'outpoint', 'metadata', 'channel_claim_id',
+    'channel_name', 'claim_name'
+}
+
 
 # TODO add login credentials in a conf file
 # TODO alert if your copy of a lbry file is out of date with the name record
@@ -402,6 +410,7 @@ class Daemon(metaclass=JSONRPCServerType):
         self.app.router.add_get('/lbryapi', self.handle_old_jsonrpc)
         self.app.router.add_post('/lbryapi', self.handle_old_jsonrpc)
         self.app.router.add_post('/', self.handle_old_jsonrpc)
+        self.app.router.add_get('/stream/{sd_hash}', self.handle_stream_request)
         self.handler = self.app.make_handler()
         self.server = None
 
@@ -511,6 +520,65 @@ class Daemon(metaclass=JSONRPCServerType):
             content_type='application/json'
         )
 
+    async def handle_stream_request(self, request):
+        """
+        Serve the decrypted contents of a stream, supports range requests
+        """
+        if self.storage is None or self.blob_manager is None:
+            raise web.HTTPServiceUnavailable(text="Streaming is not available until the blob manager is started.")
+        sd_hash = request.match_info['sd_hash']
+        stream_hash = await self.storage.get_stream_hash_for_sd_hash(sd_hash)
+        if not stream_hash:
+            raise web.HTTPNotFound(text=f"Unknown stream: {sd_hash}")
+        _, stream_key, suggested_file_name, _ = await self.storage.get_stream_info(stream_hash)
+        reader = EncryptedStreamReader(
+            self.blob_manager, stream_key, await self.storage.get_blobs_for_stream(stream_hash)
+        )
+        try:
+            http_range = request.http_range
+        except ValueError:
+            raise web.HTTPRequestRangeNotSatisfiable()
+        start, end = http_range.start, http_range.stop
+        if start == 0 and end is None:
+            # same as no range, which can be answered before the size of the stream is known
+            start = None
+        try:
+            await reader.wait_for_head_blob()
+            size = reader.get_size()
+            if size is None and start is not None and not reader.is_before_last_blob(start, end):
+                size = await reader.wait_for_size()
+        except BlobNotAvailableError as err:
+            raise web.HTTPServiceUnavailable(text=str(err))
+
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'Content-Type': guess_media_type(unhexlify(suggested_file_name).decode()),
+        }
+        if start is None:
+            start, end = 0, None
+            if size is not None:
+                headers['Content-Length'] = str(size)
+            response = web.StreamResponse(status=200, headers=headers)
+        else:
+            if size is not None:
+                if start < 0:
+                    start, end = max(size + start, 0), size
+                end = size if end is None else min(end, size)
+            if start >= end:
+                raise web.HTTPRequestRangeNotSatisfiable(headers={'Content-Range': f'bytes */{size}'})
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{"*" if size is None else size}'
+            headers['Content-Length'] = str(end - start)
+            response = web.StreamResponse(status=206, headers=headers)
+        await response.prepare(request)
+        try:
+            async for data in reader.read(start, end):
+                await response.write(data)
+        except BlobNotAvailableError as err:
+            log.warning("Stopped streaming %s: %s", sd_hash, err)
+            return response
+        await response.write_eof()
+        return response
+
     def _verify_method_is_callable(self, function_path):
         if function_path not in self.callable_methods:
             raise UnknownAPIMethodError(function_path)
@@ -816,13 +884,12 @@ class Daemon(metaclass=JSONRPCServerType):
         return self.get_est_cost_from_uri(uri)
 
     async def _get_lbry_file_dict(self, lbry_file):
+        lbry_file = await self.file_manager.load_lbry_file(lbry_file)
         key = hexlify(lbry_file.key) if lbry_file.key else None
         full_path = os.path.join(lbry_file.download_directory, lbry_file.file_name)
         mime_type = guess_media_type(lbry_file.file_name)
         if os.path.isfile(full_path):
-            with open(full_path) as written_file:
-                written_file.seek(0, os.SEEK_END)
-                written_bytes = written_file.tell()
+            written_bytes = os.path.getsize(full_path)
         else:
             written_bytes = 0
 
@@ -861,23 +928,18 @@ class Daemon(metaclass=JSONRPCServerType):
         }
 
     async def _get_lbry_file(self, search_by, val, return_json=False):
-        lbry_file = None
-        if search_by in FileID:
-            for l_f in self.file_manager.lbry_files:
-                if l_f.__dict__.get(search_by) == val:
-                    lbry_file = l_f
-                    break
-        else:
+        if search_by not in FileID:
             raise NoValidSearch(f'{search_by} is not a valid search operation')
+        lbry_files = self.file_manager.lbry_files.search(**{search_by: val})
+        lbry_file = lbry_files[0] if lbry_files else None
+        if lbry_file:
+            lbry_file = await self.file_manager.load_lbry_file(lbry_file)
         if return_json and lbry_file:
             lbry_file = await self._get_lbry_file_dict(lbry_file)
         return lbry_file
 
     async def _get_lbry_files(self, return_json=False, **kwargs):
-        lbry_files = list(self.file_manager.lbry_files)
-        if kwargs:
-            for search_type, value in iter_lbry_file_search_values(kwargs):
-                lbry_files = [l_f for l_f in lbry_files if l_f.__dict__[search_type] == value]
+        lbry_files = self.file_manager.lbry_files.search(**dict(iter_lbry_file_search_values(kwargs)))
         if return_json:
             file_dicts = []
             for lbry_file in lbry_files:
@@ -887,10 +949,12 @@ class Daemon(metaclass=JSONRPCServerType):
         log.debug("Collected %i lbry files", len(lbry_files))
         return lbry_files
 
-    def _sort_lbry_files(self, lbry_files, sort_by):
+    def _sort_lbry_files(self, lbry_files, sort_by, get_fields=None):
         for field, direction in sort_by:
             is_reverse = direction == DIRECTION_DESCENDING
             key_getter = create_key_getter(field) if field else None
+            if key_getter and get_fields:
+                key_getter = lambda lbry_file, get_key=key_getter: get_key(get_fields(lbry_file))
             lbry_files = sorted(lbry_files, key=key_getter, reverse=is_reverse)
         return lbry_files
 
@@ -1025,15 +1089,82 @@ class Daemon(metaclass=JSONRPCServerType):
                 'dht': {
                     'node_id': (str) lbry dht node id - hex encoded,
                     'peers_in_routing_table': (int) the number of peers in the routing table,
+                    'peer_cache': {
+                        'size': (int) number of blobs with known peers,
+                        'max_size': (int) maximum number of blobs to remember the peers of,
+                        'hits': (int) peer lookups served from fresh cached peers,
+                        'stale_hits': (int) peer lookups served from stale peers while they were refreshed,
+                        'negative_hits': (int) peer lookups for blobs recently found to have no peers,
+                        'misses': (int) peer lookups for blobs with no known peers,
+                        'evictions': (int) blobs evicted from the cache,
+                        'expired_peers': (int) cached peers dropped after searches stopped finding them,
+                        'hit_rate': (float) fraction of peer lookups that did not need a dht search,
+                        'stale_entries': (int) number of blobs whose peers are due to be refreshed,
+                        'oldest_entry_age': (int) seconds since the least recently refreshed blob was refreshed,
+                    },
                 },
                 'blob_manager': {
                     'finished_blobs': (int) number of finished blobs in the blob manager,
+                    'blob_cache': {
+                        'size': (int) number of blob objects currently loaded,
+                        'max_size': (int) maximum number of idle blob objects to keep loaded,
+                        'hits': (int) blob lookups served from the cache,
+                        'misses': (int) blob lookups that loaded a new blob object,
+                        'evictions': (int) blob objects evicted from the cache,
+                    },
+                    'verification': {
+                        'running': (bool) blob files are being verified,
+                        'total_blobs': (int) number of blobs to verify,
+                        'checked_blobs': (int) number of blobs verified so far,
+                        'checked_bytes': (int) bytes hashed so far,
+                        'bad_blobs': (int) number of corrupt blobs found,
+                        'elapsed': (float) seconds spent verifying,
+                        'bytes_per_second': (int) verification throughput,
+                    },
                 },
                 'hash_announcer': {
-                    'announce_queue_size': (int) number of blobs currently queued to be announced
+                    'announce_queue_size': (int) number of blobs currently queued to be announced,
+                    'announce_lookups': {
+                        'lookups': (int) node lookups run to announce blobs,
+                        'reused_lookups': (int) blobs announced using the lookup of a nearby blob,
+                        'routing_table_hits': (int) blobs announced using the routing table alone,
+                        'cached_lookups': (int) number of recent lookups kept to be reused,
+                    },
+                    'announcers': {
+                        'concurrency': (int) number of blobs that may be announced at once, adjusted
+                                       to the recent announce success rate,
+                        'running': (int) number of blobs being announced,
+                        'succeeded': (int) blobs announced to at least one peer,
+                        'failed': (int) blobs that weren't stored by any peer,
+                        'success_rate': (float) fraction of announces that succeeded,
+                    },
+                },
+                'rate_limiter': {
+                    <download | upload>: {
+                        'limit': (int) bytes per second, null if there is no limit,
+                        'total_bytes': (int) bytes transferred,
+                        'throttled_protocols': (int) number of connections currently paused,
+                        'peers': {
+                            <host:port>: {
+                                'total_bytes': (int) bytes transferred with the peer,
+                                'bytes_per_second': (int) bytes transferred in the last full second,
+                                'histogram': {
+                                    <bytes per second band>: (int) seconds spent in the band,
+                                }
+                            }
+                        },
+                    }
                 },
                 'file_manager': {
                     'managed_files': (int) count of files in the file manager,
+                    'streams_being_created': (list) progress of the files being published [
+                        {
+                            'stream_name': (str) name of the file,
+                            'total_bytes': (int) size of the file, if known,
+                            'written_bytes': (int) bytes of the file encrypted and written to blobs,
+                            'blobs_written': (int) number of blobs written,
+                        }
+                    ],
                 },
                 'upnp': {
                     'aioupnp_version': (str),
@@ -1841,7 +1972,7 @@ class Daemon(metaclass=JSONRPCServerType):
         return self.get_account_or_default(account_id).receiving.get_or_create_usable_address()
 
     @requires(FILE_MANAGER_COMPONENT)
-    async def jsonrpc_file_list(self, sort=None, **kwargs):
+    async def jsonrpc_file_list(self, sort=None, page=None, page_size=None, **kwargs):
         """
         List files limited by optional filters
 
@@ -1850,6 +1981,7 @@ class Daemon(metaclass=JSONRPCServerType):
                       [--rowid=<rowid>] [--claim_id=<claim_id>] [--outpoint=<outpoint>] [--txid=<txid>] [--nout=<nout>]
                       [--channel_claim_id=<channel_claim_id>] [--channel_name=<channel_name>]
                       [--claim_name=<claim_name>] [--sort=<sort_method>...]
+                      [--page=<page>] [--page_size=<page_size>]
 
         Options:
             --sd_hash=<sd_hash>                    : (str) get file with matching sd hash
@@ -1867,9 +1999,12 @@ class Daemon(metaclass=JSONRPCServerType):
             --sort=<sort_method>                   : (str) sort by any property, like 'file_name'
                                                      or 'metadata.author'; to specify direction
                                                      append ',asc' or ',desc'
+            --page=<page>                          : (int) page to return during paginating
+            --page_size=<page_size>                : (int) number of items on page during pagination
 
         Returns:
-            (list) List of files
+            (list) List of files, or a dictionary of the 'items' on the page with 'page', 'page_size'
+                   and 'total_pages' if paginated
 
             [
                 {
@@ -1901,10 +2036,33 @@ class Daemon(metaclass=JSONRPCServerType):
                 },
             ]
         """
-        result = await self._get_lbry_files(return_json=True, **kwargs)
-        if sort:
-            sort_by = [self._parse_lbry_files_sort(s) for s in sort]
+        lbry_files = await self._get_lbry_files(**kwargs)
+        total_files = len(lbry_files)
+        paginated = None not in (page, page_size)
+        sort_by = [self._parse_lbry_files_sort(s) for s in sort or []]
+        sort_fields = {field.split('.')[0] if field else None for field, _ in sort_by}
+        if sort_fields.issubset(LBRY_FILE_ATTRIBUTES):
+            # sort before building the results so only the files on the requested page are read
+            if 'metadata' in sort_fields:
+                # claim metadata isn't kept for files that haven't been loaded yet
+                lbry_files = [await self.file_manager.load_lbry_file(lbry_file) for lbry_file in lbry_files]
+            lbry_files = self._sort_lbry_files(
+                lbry_files, sort_by, lambda lbry_file: {field: getattr(lbry_file, field) for field in sort_fields}
+            )
+            if paginated:
+                lbry_files = lbry_files[page_size * (page - 1):page_size * page]
+            result = [await self._get_lbry_file_dict(lbry_file) for lbry_file in lbry_files]
+        else:
+            result = [await self._get_lbry_file_dict(lbry_file) for lbry_file in lbry_files]
             result = self._sort_lbry_files(result, sort_by)
+            if paginated:
+                result = result[page_size * (page - 1):page_size * page]
+        if paginated:
+            return {
+                "items": result,
+                "total_pages": int((total_files + (page_size - 1)) / page_size),
+                "page": page, "page_size": page_size
+            }
         return result
 
     @requires(WALLET_COMPONENT)
@@ -3229,8 +3387,9 @@ class Daemon(metaclass=JSONRPCServerType):
             raise Exception('Too many (%i) files found, need one' % len(lbry_files))
         elif not lbry_files:
             raise Exception('No file found')
+        lbry_file = await self.file_manager.load_lbry_file(lbry_files[0])
         return await d2f(reupload.reflect_file(
-            lbry_files[0], reflector_server=kwargs.get('reflector', None)
+            lbry_file, reflector_server=kwargs.get('reflector', None)
         ))
 
     @requires(BLOB_COMPONENT, WALLET_COMPONENT)
@@ -3327,6 +3486,51 @@ class Daemon(metaclass=JSONRPCServerType):
         blob_hashes = await d2f(self.blob_manager.get_all_verified_blobs())
         return await d2f(reupload.reflect_blob_hashes(blob_hashes, self.blob_manager))
 
+    @requires(BLOB_COMPONENT)
+    async def jsonrpc_blob_verify(self, blob_hashes=None, workers=None, requeue=False):
+        """
+        Re-hash saved blobs and compare them to their hashes, corrupt blobs are deleted and marked
+        as pending. Progress is reported by the blob_manager section of `status`.
+
+        Usage:
+            blob_verify [<blob_hashes>...] [--workers=<workers>] [--requeue]
+
+        Options:
+            --blob_hashes=<blob_hashes>  : (list) blobs to verify, defaults to all saved blobs
+            --workers=<workers>          : (int) number of threads to hash blobs with
+            --requeue                    : (bool) start downloading the files with corrupt blobs again
+
+        Returns:
+            (dict) {
+                'checked_blobs': (int) number of blobs verified,
+                'bytes_per_second': (int) verification throughput,
+                'bad_blobs': (list) hashes of the corrupt blobs,
+                'requeued_files': (list) sd hashes of the files started again, if --requeue was given
+            }
+        """
+        workers = workers or conf.settings['blob_verify_workers']
+        bad_blob_hashes = await self.blob_manager.verify_blobs(blob_hashes or None, workers)
+        requeued = []
+        if requeue and bad_blob_hashes and self.file_manager is not None:
+            stream_hashes = set()
+            for blob_hash in bad_blob_hashes:
+                stream_hash = await self.blob_manager.storage.get_stream_of_blob(blob_hash) or \
+                              await self.blob_manager.storage.get_stream_hash_for_sd_hash(blob_hash)
+                if stream_hash:
+                    stream_hashes.add(stream_hash)
+            for stream_hash in stream_hashes:
+                for lbry_file in self.file_manager.lbry_files.search(stream_hash=stream_hash):
+                    if lbry_file.stopped:
+                        await d2f(self.file_manager.toggle_lbry_file_running(lbry_file))
+                        requeued.append(lbry_file.sd_hash)
+        progress = self.blob_manager.verifier.get_progress()
+        return {
+            'checked_blobs': progress['checked_blobs'],
+            'bytes_per_second': progress['bytes_per_second'],
+            'bad_blobs': bad_blob_hashes,
+            'requeued_files': requeued
+        }
+
     @requires(DHT_COMPONENT)
     async def jsonrpc_peer_ping(self, node_id, address=None, port=None):
         """
@@ -3396,9 +3600,8 @@ class Daemon(metaclass=JSONRPCServerType):
         data_store = self.dht_node._dataStore
         hosts = {}
 
-        for k, v in data_store.items():
-            for contact in map(itemgetter(0), v):
-                hosts.setdefault(contact, []).append(hexlify(k).decode())
+        for contact in data_store.getStoringContacts():
+            hosts[contact] = [hexlify(k).decode() for k in data_store.getKeysForContact(contact)]
 
         contact_set = set()
         blob_hashes = set()
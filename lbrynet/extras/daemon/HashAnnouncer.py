@@ -1,5 +1,8 @@
 import binascii
+import heapq
 import logging
+import math
+from collections import deque
 
 from twisted.internet import defer, task
 from lbrynet.extras.compat import f2d
@@ -7,14 +10,70 @@ from lbrynet import utils, conf
 
 log = logging.getLogger(__name__)
 
+OVERDUE_STEP = 3600  # blobs are ranked by the number of hours they are overdue for announcement
+MAX_CONCURRENCY_FACTOR = 4  # the concurrency can grow up to this many times concurrent_announcers
+
+
+class AnnounceConcurrency:
+    """
+    Picks how many announces run at once from the success rate of the recent ones: the limit grows by
+    one after a window of mostly successful stores and is halved after a window of mostly failed ones
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, window=20, increase_above=0.9, decrease_below=0.5):
+        self.minimum = minimum
+        self.maximum = maximum or initial * MAX_CONCURRENCY_FACTOR
+        self.limit = max(minimum, min(initial, self.maximum))
+        self.increase_above = increase_above
+        self.decrease_below = decrease_below
+        self._results = deque(maxlen=window)
+        self.succeeded = 0
+        self.failed = 0
+
+    def record(self, success):
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self._results.append(success)
+        if len(self._results) < self._results.maxlen:
+            return
+        success_rate = sum(self._results) / len(self._results)
+        if success_rate >= self.increase_above:
+            self.limit = min(self.maximum, self.limit + 1)
+        elif success_rate < self.decrease_below:
+            self.limit = max(self.minimum, self.limit // 2)
+        self._results.clear()
+
+    def get_stats(self):
+        total = self.succeeded + self.failed
+        return {
+            'concurrency': self.limit,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'success_rate': 0.0 if not total else self.succeeded / total
+        }
+
 
 class DHTHashAnnouncer:
-    def __init__(self, dht_node, storage, concurrent_announcers=None):
+    """
+    Announces blob hashes from a priority queue. Sd and head blobs go first, then blobs that peers
+    have recently asked us for, then the blobs that have been due for announcement the longest.
+    Blobs of equal priority are announced in keyspace order so the node can reuse the lookups of
+    neighbouring hashes
+    """
+
+    def __init__(self, dht_node, storage, concurrent_announcers=None, blob_manager=None):
         self.dht_node = dht_node
         self.storage = storage
+        self.blob_manager = blob_manager
         self.clock = dht_node.clock
         self.peer_port = dht_node.peerPort
-        self.hash_queue = []
+        self.hash_queue = {}  # {blob_hash: priority, None once the announce is running}
+        self._heap = []  # [(priority, blob_hash)], entries no longer in hash_queue are skipped
+        self._waiting = {}  # {blob_hash: [deferreds for the result of the announce]}
+        self._running = 0
+        self._starting = False
         if concurrent_announcers is None:
             self.concurrent_announcers = conf.settings['concurrent_announcers']
         else:
@@ -23,7 +82,9 @@ class DHTHashAnnouncer:
         if self.concurrent_announcers:
             self._manage_lc = task.LoopingCall(self.manage)
             self._manage_lc.clock = self.clock
-        self.sem = defer.DeferredSemaphore(self.concurrent_announcers or conf.settings['concurrent_announcers'] or 1)
+        self.concurrency = AnnounceConcurrency(
+            self.concurrent_announcers or conf.settings['concurrent_announcers'] or 1
+        )
 
     def start(self):
         if self._manage_lc:
@@ -43,28 +104,90 @@ class DHTHashAnnouncer:
             log.debug("Stored %s to %i peers", blob_hash[:16], len(storing_node_ids))
         else:
             result = (None, [])
-        self.hash_queue.remove(blob_hash)
+        self.hash_queue.pop(blob_hash, None)
         defer.returnValue(result)
 
     def hash_queue_size(self):
         return len(self.hash_queue)
 
+    def get_priority(self, blob_hash, is_head=False, next_announce_time=None):
+        """
+        Returns the sort key of a blob in the announce queue, lower keys are announced first. Demand
+        and lateness are bucketed so that blobs of about the same priority keep their keyspace order
+        """
+        demand = 0.0 if self.blob_manager is None else self.blob_manager.get_blob_demand(blob_hash)
+        overdue = 0 if next_announce_time is None else max(0, self.clock.seconds() - next_announce_time)
+        return (
+            0 if is_head else 1,
+            -int(math.log2(1 + demand)),
+            -int(overdue // OVERDUE_STEP),
+            blob_hash
+        )
+
+    def _schedule(self, blob_hash, is_head=False, next_announce_time=None):
+        d = defer.Deferred()
+        self._waiting.setdefault(blob_hash, []).append(d)
+        priority = self.get_priority(blob_hash, is_head, next_announce_time)
+        if blob_hash in self.hash_queue:
+            queued = self.hash_queue[blob_hash]
+            if queued is None or queued <= priority:
+                # already running or queued at least as high
+                return d
+        self.hash_queue[blob_hash] = priority
+        heapq.heappush(self._heap, (priority, blob_hash))
+        return d
+
+    def _start_announces(self):
+        if self._starting:
+            # an announce finished synchronously, the loop below picks up the freed slot
+            return
+        self._starting = True
+        try:
+            while self._heap and self._running < self.concurrency.limit:
+                priority, blob_hash = heapq.heappop(self._heap)
+                if self.hash_queue.get(blob_hash) != priority:
+                    continue
+                self.hash_queue[blob_hash] = None
+                self._running += 1
+                d = self.do_store(blob_hash)
+                d.addErrback(self._announce_failed, blob_hash)
+                d.addCallback(self._announce_finished, blob_hash)
+        finally:
+            self._starting = False
+
+    def _announce_failed(self, err, blob_hash):
+        log.warning("Failed to announce %s: %s", blob_hash[:16], err.getErrorMessage())
+        self.hash_queue.pop(blob_hash, None)
+        return None, []
+
+    def _announce_finished(self, result, blob_hash):
+        self._running -= 1
+        self.concurrency.record(bool(result[0]))
+        for d in self._waiting.pop(blob_hash, []):
+            d.callback(result)
+        self._start_announces()
+
     def _show_announce_progress(self, size, start):
         queue_size = len(self.hash_queue)
         average_blobs_per_second = float(size - queue_size) / (self.clock.seconds() - start)
-        log.info("Announced %i/%i blobs, %f blobs per second", size - queue_size, size, average_blobs_per_second)
+        log.info("Announced %i/%i blobs, %f blobs per second, %i at a time", size - queue_size, size,
+                 average_blobs_per_second, self.concurrency.limit)
 
     @defer.inlineCallbacks
-    def immediate_announce(self, blob_hashes):
-        self.hash_queue.extend(b for b in blob_hashes if b not in self.hash_queue)
+    def _announce(self, blobs):
+        """
+        blobs - (blob_hash, is_head, next_announce_time) tuples
+        """
+        announcing = {}
+        for blob_hash, is_head, next_announce_time in blobs:
+            announcing[blob_hash] = self._schedule(blob_hash, is_head, next_announce_time)
+        self._start_announces()
         log.info("Announcing %i blobs", len(self.hash_queue))
         start = self.clock.seconds()
         progress_lc = task.LoopingCall(self._show_announce_progress, len(self.hash_queue), start)
         progress_lc.clock = self.clock
         progress_lc.start(60, now=False)
-        results = yield utils.DeferredDict(
-            {blob_hash: self.sem.run(self.do_store, blob_hash) for blob_hash in blob_hashes}
-        )
+        results = yield utils.DeferredDict(announcing)
         now = self.clock.seconds()
 
         progress_lc.stop()
@@ -74,17 +197,25 @@ class DHTHashAnnouncer:
             log.debug("Failed to announce %i blobs", len(results) - len(announced_to))
         if announced_to:
             log.info('Took %s seconds to announce %i of %i attempted hashes (%f hashes per second)',
-                     now - start, len(announced_to), len(blob_hashes),
-                     int(float(len(blob_hashes)) / float(now - start)))
+                     now - start, len(announced_to), len(announcing),
+                     int(float(len(announcing)) / float(now - start)))
         defer.returnValue(results)
 
+    def immediate_announce(self, blob_hashes):
+        return self._announce((blob_hash, True, None) for blob_hash in blob_hashes)
+
     @defer.inlineCallbacks
     def manage(self):
         if not self.dht_node.contacts:
             log.info("Not ready to start announcing hashes")
             return
-        need_reannouncement = yield f2d(self.storage.get_blobs_to_announce())
+        need_reannouncement = yield f2d(self.storage.get_blobs_to_announce_with_times())
         if need_reannouncement:
-            yield self.immediate_announce(need_reannouncement)
+            yield self._announce(need_reannouncement)
         else:
             log.debug("Nothing to announce")
+
+    def get_stats(self):
+        stats = self.concurrency.get_stats()
+        stats['running'] = self._running
+        return stats
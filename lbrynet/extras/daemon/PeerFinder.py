@@ -1,8 +1,11 @@
 import binascii
 import logging
+import time
+from collections import OrderedDict
 
 from twisted.internet import defer
 from lbrynet import conf
+from lbrynet.extras.compat import f2d
 
 log = logging.getLogger(__name__)
 
@@ -13,6 +16,117 @@ class DummyPeerFinder:
     def find_peers_for_blob(self, blob_hash, timeout=None, filter_self=True):
         return defer.succeed([])
 
+    def get_stats(self):
+        return {}
+
+
+class PeerCache:
+    """
+    A size bounded LRU mapping of blob hash to the set of (host, port) peers known to have the blob
+
+    An entry is fresh for ttl seconds after it was last refreshed, stale entries are still served
+    while they are refreshed. An empty entry means a search found no peers, it is only kept fresh
+    for negative_ttl seconds so blobs nobody has are not searched for over and over. A peer is
+    dropped once no search has found it for peer_ttl seconds
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl, peer_ttl=None, get_time=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.peer_ttl = peer_ttl or ttl * 3
+        self.get_time = get_time
+        self._entries = OrderedDict()  # blob_hash: ({peer: last seen at}, refreshed_at)
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired_peers = 0
+
+    def __contains__(self, blob_hash):
+        return blob_hash in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_peer_times(self, blob_hash):
+        """
+        Returns {peer: last seen at} for the peers of a blob that haven't expired
+        """
+        if blob_hash not in self._entries:
+            return {}
+        seen, refreshed_at = self._entries[blob_hash]
+        expire_before = self.get_time() - self.peer_ttl
+        expired = [peer for peer, seen_at in seen.items() if seen_at < expire_before]
+        for peer in expired:
+            del seen[peer]
+        self.expired_peers += len(expired)
+        return seen
+
+    def get_peers(self, blob_hash):
+        return set(self.get_peer_times(blob_hash))
+
+    def is_fresh(self, blob_hash):
+        if blob_hash not in self._entries:
+            return False
+        refreshed_at = self._entries[blob_hash][1]
+        return self.get_time() - refreshed_at < (self.ttl if self.get_peer_times(blob_hash) else self.negative_ttl)
+
+    def lookup(self, blob_hash):
+        """
+        Get the known peers for a blob and whether they are fresh, counted towards the statistics
+        """
+        if blob_hash not in self._entries:
+            self.misses += 1
+            return set(), False
+        self._entries.move_to_end(blob_hash)
+        peers, fresh = self.get_peers(blob_hash), self.is_fresh(blob_hash)
+        if not fresh:
+            self.stale_hits += 1
+        elif peers:
+            self.hits += 1
+        else:
+            self.negative_hits += 1
+        return peers, fresh
+
+    def add(self, blob_hash, peers, refreshed_at=None):
+        """
+        Merge the peers a search found into the entry for a blob and mark it as refreshed
+
+        peers - the found (host, port) peers, or {peer: last seen at} for peers that were seen earlier
+        """
+        refreshed_at = self.get_time() if refreshed_at is None else refreshed_at
+        seen = self.get_peer_times(blob_hash)
+        if not isinstance(peers, dict):
+            peers = {peer: refreshed_at for peer in peers}
+        for peer, seen_at in peers.items():
+            seen[peer] = max(seen_at, seen.get(peer, seen_at))
+        self._entries[blob_hash] = (seen, refreshed_at)
+        self._entries.move_to_end(blob_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return self.get_peers(blob_hash)
+
+    def get_stats(self):
+        now = self.get_time()
+        ages = [now - refreshed_at for _, refreshed_at in self._entries.values()]
+        lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expired_peers': self.expired_peers,
+            'hit_rate': 0.0 if not lookups else float(self.hits + self.negative_hits) / lookups,
+            'stale_entries': len([blob_hash for blob_hash in self._entries if not self.is_fresh(blob_hash)]),
+            'oldest_entry_age': 0 if not ages else int(max(ages))
+        }
+
 
 class DHTPeerFinder(DummyPeerFinder):
     """This class finds peers which have announced to the DHT that they have certain blobs"""
@@ -24,12 +138,54 @@ class DHTPeerFinder(DummyPeerFinder):
         """
         self.component_manager = component_manager
         self.peer_manager = component_manager.peer_manager
-        self.peers = {}
+        self.peers = PeerCache(
+            conf.settings['peer_cache_size'], conf.settings['peer_cache_ttl'],
+            conf.settings['peer_cache_negative_ttl'], conf.settings['peer_cache_peer_ttl']
+        )
+        self.storage = None
+        self._load_deferred = None
         self._ongoing_searchs = {}
 
+    def _load_peers(self):
+        """
+        Load the peers saved by the last run the first time the database is available, so blobs that
+        were searched for recently are served from the cache straight after a restart
+        """
+        if self._load_deferred is None:
+            if "database" in self.component_manager.skip_components or \
+                    not self.component_manager.all_components_running("database"):
+                return defer.succeed(None)
+            self.storage = self.component_manager.get_component("database")
+            self._load_deferred = f2d(self._load_saved_peers())
+        return self._load_deferred
+
+    async def _load_saved_peers(self):
+        try:
+            saved = await self.storage.get_saved_peers(self.peers.max_size)
+        except Exception as err:
+            log.warning("failed to load saved peers: %s", err)
+            return
+        # oldest first, so the most recently refreshed blobs end up as the most recently used
+        for blob_hash, peers, refreshed_at in reversed(saved):
+            if blob_hash not in self.peers:
+                self.peers.add(blob_hash, peers, refreshed_at)
+        log.info("loaded saved peers for %i blobs", len(saved))
+
+    def _save_peers(self, blob_hash):
+        if self.storage is None:
+            return
+        peers = self.peers.get_peer_times(blob_hash)
+        if peers:
+            d = f2d(self.storage.save_peers(blob_hash, peers, self.peers.get_time()))
+            d.addErrback(lambda err: log.warning("failed to save peers for blob %s: %s", blob_hash, err))
+
+    @defer.inlineCallbacks
     def find_peers_for_blob(self, blob_hash, timeout=None, filter_self=True):
         """
         Find peers for blob in the DHT
+
+        Cached peers are returned right away, if they are stale or there are none a search is started
+        in the background to refresh them
         blob_hash (str): blob hash to look for
         timeout (int): seconds to timeout after
         filter_self (bool): if True, and if a peer for a blob is itself, filter it
@@ -39,33 +195,40 @@ class DHTPeerFinder(DummyPeerFinder):
         list of peers for the blob
         """
         if "dht" in self.component_manager.skip_components:
-            return defer.succeed([])
+            defer.returnValue([])
         if not self.component_manager.all_components_running("dht"):
-            return defer.succeed([])
+            defer.returnValue([])
         dht_node = self.component_manager.get_component("dht")
+        yield self._load_peers()
 
-        self.peers.setdefault(blob_hash, {(dht_node.externalIP, dht_node.peerPort,)})
-        if not blob_hash in self._ongoing_searchs or self._ongoing_searchs[blob_hash].called:
+        known, fresh = self.peers.lookup(blob_hash)
+        if not fresh and (blob_hash not in self._ongoing_searchs or self._ongoing_searchs[blob_hash].called):
             self._ongoing_searchs[blob_hash] = self._execute_peer_search(dht_node, blob_hash, timeout)
 
-        def _filter_self(blob_hash):
-            my_host, my_port = dht_node.externalIP, dht_node.peerPort
-            return {(host, port) for host, port in self.peers[blob_hash] if (host, port) != (my_host, my_port)}
-
-        peers = set(_filter_self(blob_hash) if filter_self else self.peers[blob_hash])
-        return defer.succeed([self.peer_manager.get_peer(*peer) for peer in peers])
+        me = (dht_node.externalIP, dht_node.peerPort)
+        peers = {peer for peer in known if peer != me}
+        if not filter_self:
+            peers.add(me)
+        defer.returnValue([self.peer_manager.get_peer(*peer) for peer in peers])
 
     @defer.inlineCallbacks
     def _execute_peer_search(self, dht_node, blob_hash, timeout):
         bin_hash = binascii.unhexlify(blob_hash)
-        finished_deferred = dht_node.iterativeFindValue(bin_hash, exclude=self.peers[blob_hash])
+        # known peers are not excluded, finding them again is what keeps them from expiring
+        finished_deferred = dht_node.iterativeFindValue(bin_hash, exclude={(dht_node.externalIP, dht_node.peerPort)})
         timeout = timeout or conf.settings['peer_search_timeout']
         if timeout:
             finished_deferred.addTimeout(timeout, dht_node.clock)
         try:
             peer_list = yield finished_deferred
-            self.peers[blob_hash].update({(host, port) for _, host, port in peer_list})
+            self.peers.add(blob_hash, {(host, port) for _, host, port in peer_list})
+            self._save_peers(blob_hash)
         except defer.TimeoutError:
             log.debug("DHT timed out while looking peers for blob %s after %s seconds", blob_hash, timeout)
+            if not self.peers.get_peers(blob_hash):
+                self.peers.add(blob_hash, set())
         finally:
             del self._ongoing_searchs[blob_hash]
+
+    def get_stats(self):
+        return self.peers.get_stats()
@@ -73,5 +73,7 @@ class Publisher:
             await d2f(self.storage.save_content_claim(
                 stream_hash, tx.outputs[0].id
             ))
-            self.lbry_file = [f for f in self.lbry_file_manager.lbry_files if f.stream_hash == stream_hash][0]
+            self.lbry_file = await self.lbry_file_manager.load_lbry_file(
+                self.lbry_file_manager.lbry_files.search(stream_hash=stream_hash)[0]
+            )
         return tx
@@ -0,0 +1,20 @@
+import sqlite3
+import os
+
+
+def do_migration(db_dir):
+    db_path = os.path.join(db_dir, "lbrynet.sqlite")
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+
+    cursor.executescript(
+        """
+        create table if not exists peer_cache (
+            blob_hash char(96) not null primary key,
+            peers text not null,
+            refreshed_at real not null
+        );
+        """
+    )
+    connection.commit()
+    connection.close()
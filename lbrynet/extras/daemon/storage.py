@@ -1,6 +1,8 @@
 import asyncio
+import json
 import logging
 import os
+import time
 import traceback
 import typing
 from binascii import hexlify, unhexlify
@@ -59,6 +61,98 @@ async def looping_call(interval, fun):
         await asyncio.sleep(interval)
 
 
+class BatchedWriteQueue:
+    """
+    Coalesces single row writes from many concurrent callers into one transaction, which is
+    committed `interval` seconds after the first write is queued or as soon as `max_rows`
+    writes are waiting. Consecutive writes of the same statement are run with one executemany,
+    and writes are always applied in the order they were queued.
+    """
+
+    def __init__(self, db, loop, interval=0.005, max_rows=1000):
+        self.db = db
+        self.loop = loop
+        self.interval = interval
+        self.max_rows = max_rows
+        self._pending = []  # [(sql, [params])]
+        self._futures = []
+        self._flush_call = None
+        self._commits = set()
+
+    def __len__(self):
+        return len(self._futures)
+
+    def write(self, sql, params):
+        """
+        Queue a write, returns a future that resolves once it has been committed
+        """
+        future = self.loop.create_future()
+        if self._pending and self._pending[-1][0] == sql:
+            self._pending[-1][1].append(params)
+        else:
+            self._pending.append((sql, [params]))
+        self._futures.append(future)
+        if len(self._futures) >= self.max_rows:
+            self.flush()
+        elif self._flush_call is None:
+            self._flush_call = self.loop.call_later(self.interval, self.flush)
+        return future
+
+    def flush(self):
+        if self._flush_call is not None:
+            if not self._flush_call.cancelled():
+                self._flush_call.cancel()
+            self._flush_call = None
+        if not self._futures:
+            return
+        batch, futures = self._pending, self._futures
+        self._pending, self._futures = [], []
+        commit = self.loop.create_task(self._commit(batch, futures))
+        self._commits.add(commit)
+        commit.add_done_callback(self._commits.discard)
+
+    async def drain(self):
+        """
+        Commit the queued writes and wait for every commit in progress, so that a write made directly
+        to the database afterwards is not overwritten or undone by one that was queued before it
+        """
+        self.flush()
+        if self._commits:
+            await asyncio.wait(list(self._commits))
+
+    async def close(self):
+        await self.drain()
+
+    async def _commit(self, batch, futures):
+        def _write_batch(transaction):
+            for sql, rows in batch:
+                transaction.executemany(sql, rows)
+
+        try:
+            await self.db.run(_write_batch)
+        except Exception as err:
+            log.warning("failed to commit a batch of %i writes (%s), retrying them one at a time", len(futures), err)
+            await self._commit_one_at_a_time(batch, futures)
+        else:
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _commit_one_at_a_time(self, batch, futures):
+        futures = iter(futures)
+        for sql, rows in batch:
+            for params in rows:
+                future = next(futures)
+                try:
+                    await self.db.execute(sql, params)
+                except Exception as err:
+                    if not future.done():
+                        future.set_exception(err)
+                else:
+                    if not future.done():
+                        future.set_result(None)
+
+
 class SQLiteStorage(SQLiteMixin):
 
     CREATE_TABLES_QUERY = """
@@ -130,6 +224,12 @@ class SQLiteStorage(SQLiteMixin):
                 timestamp integer,
                 primary key (sd_hash, reflector_address)
             );
+
+            create table if not exists peer_cache (
+                blob_hash char(96) not null primary key,
+                peers text not null,
+                refreshed_at real not null
+            );
     """
 
     def __init__(self, path, loop=None):
@@ -137,9 +237,11 @@ class SQLiteStorage(SQLiteMixin):
         self.content_claim_callbacks = {}
         self.check_should_announce_lc = None
         self.loop = loop or asyncio.get_event_loop()
+        self.write_queue = None
 
     async def open(self):
         await super().open()
+        self.write_queue = BatchedWriteQueue(self.db, self.loop)
         if 'reflector' not in conf.settings['components_to_skip']:
             self.check_should_announce_lc = looping_call(
                 600, self.verify_will_announce_all_head_and_sd_blobs
@@ -148,8 +250,18 @@ class SQLiteStorage(SQLiteMixin):
     async def close(self):
         if self.check_should_announce_lc is not None:
             self.check_should_announce_lc.close()
+        if self.write_queue is not None:
+            await self.write_queue.close()
         await super().close()
 
+    async def run_after_queued_writes(self, fun):
+        """
+        Like db.run, but waits for the writes queued so far to be committed first
+        """
+        if self.write_queue is not None:
+            await self.write_queue.drain()
+        return await self.db.run(fun)
+
     async def run_and_return_one_or_none(self, query, *args):
         for row in await self.db.execute_fetchall(query, args):
             if len(row) == 1:
@@ -168,10 +280,10 @@ class SQLiteStorage(SQLiteMixin):
     def add_completed_blob(self, blob_hash, length, next_announce_time, should_announce, status="finished"):
         log.debug("Adding a completed blob. blob_hash=%s, length=%i", blob_hash, length)
         values = (blob_hash, length, next_announce_time or 0, int(bool(should_announce)), status, 0, 0)
-        return self.db.execute("insert or replace into blob values (?, ?, ?, ?, ?, ?, ?)", values)
+        return self.write_queue.write("insert or replace into blob values (?, ?, ?, ?, ?, ?, ?)", values)
 
     def set_should_announce(self, blob_hash, next_announce_time, should_announce):
-        return self.db.execute(
+        return self.write_queue.write(
             "update blob set next_announce_time=?, should_announce=? where blob_hash=?",
             (next_announce_time or 0, int(bool(should_announce)), blob_hash)
         )
@@ -182,7 +294,7 @@ class SQLiteStorage(SQLiteMixin):
         )
 
     def add_known_blob(self, blob_hash, length):
-        return self.db.execute(
+        return self.write_queue.write(
             "insert or ignore into blob values (?, ?, ?, ?, ?, ?, ?)", (blob_hash, length, 0, 0, "pending", 0, 0)
         )
 
@@ -213,7 +325,7 @@ class SQLiteStorage(SQLiteMixin):
         )
 
     def update_last_announced_blob(self, blob_hash, last_announced):
-        return self.db.execute(
+        return self.write_queue.write(
             "update blob set next_announce_time=?, last_announced_time=?, single_announce=0 where blob_hash=?",
             (int(last_announced + (dataExpireTimeout / 2)), int(last_announced), blob_hash)
         )
@@ -231,32 +343,57 @@ class SQLiteStorage(SQLiteMixin):
                     transaction.execute(
                         "update blob set single_announce=1 where blob_hash=? and status='finished'", (blob_hash, )
                     )
-        return self.db.run(set_single_announce)
+        return self.run_after_queued_writes(set_single_announce)
+
+    def _select_blobs_to_announce(self, transaction, columns):
+        timestamp = self.loop.time()
+        if conf.settings['announce_head_blobs_only']:
+            r = transaction.execute(
+                "select %s from blob "
+                "where blob_hash is not null and "
+                "(should_announce=1 or single_announce=1) and next_announce_time<? and status='finished'" % columns,
+                (timestamp,)
+            )
+        else:
+            r = transaction.execute(
+                "select %s from blob where blob_hash is not null "
+                "and next_announce_time<? and status='finished'" % columns, (timestamp,)
+            )
+        return r.fetchall()
 
     def get_blobs_to_announce(self):
         def get_and_update(transaction):
-            timestamp = self.loop.time()
-            if conf.settings['announce_head_blobs_only']:
-                r = transaction.execute(
-                    "select blob_hash from blob "
-                    "where blob_hash is not null and "
-                    "(should_announce=1 or single_announce=1) and next_announce_time<? and status='finished'",
-                    (timestamp,)
-                )
-            else:
-                r = transaction.execute(
-                    "select blob_hash from blob where blob_hash is not null "
-                    "and next_announce_time<? and status='finished'", (timestamp,)
+            return [b[0] for b in self._select_blobs_to_announce(transaction, "blob_hash")]
+        return self.db.run(get_and_update)
+
+    def get_blobs_to_announce_with_times(self):
+        """
+        Like get_blobs_to_announce, returns (blob_hash, is_head, next_announce_time) tuples where is_head
+        is true for sd and head blobs and blobs that were requested to be announced
+        """
+        def get_and_update(transaction):
+            return [
+                (blob_hash, bool(should_announce or single_announce), next_announce_time)
+                for (blob_hash, should_announce, single_announce, next_announce_time)
+                in self._select_blobs_to_announce(
+                    transaction, "blob_hash, should_announce, single_announce, next_announce_time"
                 )
-            blobs = [b[0] for b in r.fetchall()]
-            return blobs
+            ]
         return self.db.run(get_and_update)
 
     def delete_blobs_from_db(self, blob_hashes):
         def delete_blobs(transaction):
             for blob_hash in blob_hashes:
                 transaction.execute("delete from blob where blob_hash=?;", (blob_hash,))
-        return self.db.run(delete_blobs)
+        return self.run_after_queued_writes(delete_blobs)
+
+    def set_blobs_pending(self, blob_hashes):
+        def set_pending(transaction):
+            transaction.executemany(
+                "update blob set status='pending', should_announce=0 where blob_hash=?",
+                [(blob_hash,) for blob_hash in blob_hashes]
+            )
+        return self.run_after_queued_writes(set_pending)
 
     def get_all_blob_hashes(self):
         return self.run_and_return_list("select blob_hash from blob")
@@ -264,17 +401,20 @@ class SQLiteStorage(SQLiteMixin):
     # # # # # # # # # stream blob functions # # # # # # # # #
 
     def add_blobs_to_stream(self, stream_hash, blob_infos):
-        def _add_stream_blobs(transaction):
-            for blob_info in blob_infos:
-                transaction.execute("insert into stream_blob values (?, ?, ?, ?)",
-                                    (stream_hash, blob_info.get('blob_hash', None),
-                                     blob_info['blob_num'], blob_info['iv']))
-        return self.db.run(_add_stream_blobs)
+        def _add_blobs_to_stream(transaction):
+            transaction.executemany(
+                "insert into stream_blob values (?, ?, ?, ?)", [
+                    (stream_hash, blob_info.get('blob_hash', None), blob_info['blob_num'], blob_info['iv'])
+                    for blob_info in blob_infos
+                ]
+            )
+        return self.run_after_queued_writes(_add_blobs_to_stream)
 
     async def add_known_blobs(self, blob_infos):
-        for blob_info in blob_infos:
-            if blob_info.get('blob_hash') and blob_info['length']:
-                await self.add_known_blob(blob_info['blob_hash'], blob_info['length'])
+        await asyncio.gather(*(
+            self.add_known_blob(blob_info['blob_hash'], blob_info['length'])
+            for blob_info in blob_infos if blob_info.get('blob_hash') and blob_info['length']
+        ))
 
     def verify_will_announce_head_and_sd_blobs(self, stream_hash):
         # fix should_announce for imported head and sd blobs
@@ -328,7 +468,7 @@ class SQLiteStorage(SQLiteMixin):
                         blob_info['blob_num'], blob_info['iv']
                     )
                 )
-        return self.db.run(_store_stream)
+        return self.run_after_queued_writes(_store_stream)
 
     async def delete_stream(self, stream_hash):
         sd_hash = await self.get_sd_blob_hash_for_stream(stream_hash)
@@ -344,7 +484,7 @@ class SQLiteStorage(SQLiteMixin):
             for blob_hash in blob_hashes:
                 transaction.execute("delete from blob where blob_hash=?;", (blob_hash, ))
 
-        await self.db.run(_delete_stream)
+        await self.run_after_queued_writes(_delete_stream)
 
     def get_all_streams(self):
         return self.run_and_return_list("select stream_hash from stream")
@@ -800,6 +940,38 @@ class SQLiteStorage(SQLiteMixin):
             self.loop.time() - conf.settings['auto_re_reflect_interval']
         )
 
+    # # # # # # # # # peer cache functions # # # # # # # # #
+
+    def save_peers(self, blob_hash, peers, refreshed_at):
+        """
+        peers - {(host, port): last seen at}
+        """
+        return self.write_queue.write(
+            "insert or replace into peer_cache values (?, ?, ?)",
+            (blob_hash, json.dumps(sorted([host, port, seen_at] for (host, port), seen_at in peers.items())),
+             refreshed_at)
+        )
+
+    async def get_saved_peers(self, limit):
+        """
+        Returns up to `limit` (blob_hash, {(host, port): last seen at}, refreshed_at) tuples, most recently
+        refreshed first.
+        Peers saved longer ago than announcements live in the dht are deleted rather than returned
+        """
+        def _get_saved_peers(transaction):
+            transaction.execute(
+                "delete from peer_cache where refreshed_at<?", (time.time() - dataExpireTimeout, )
+            )
+            return transaction.execute(
+                "select blob_hash, peers, refreshed_at from peer_cache order by refreshed_at desc limit ?", (limit, )
+            ).fetchall()
+        rows = await self.db.run(_get_saved_peers)
+        return [
+            (blob_hash, {(peer[0], peer[1]): peer[2] if len(peer) > 2 else refreshed_at for peer in json.loads(peers)},
+             refreshed_at)
+            for blob_hash, peers, refreshed_at in rows
+        ]
+
 
 # Helper functions
 def _format_claim_response(outpoint, claim_id, name, amount, height, serialized, channel_id, address, claim_sequence):
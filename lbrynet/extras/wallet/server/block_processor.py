@@ -1,5 +1,7 @@
+import os
 import hashlib
 import struct
+from concurrent.futures import ProcessPoolExecutor
 
 import msgpack
 from torba.server.hash import hash_to_hex_str
@@ -21,17 +23,86 @@ class LBRYBlockProcessor(BlockProcessor):
 
         self.should_validate_signatures = self.env.boolean('VALIDATE_CLAIM_SIGNATURES', False)
         self.logger.info("LbryumX Block Processor - Validating signatures: {}".format(self.should_validate_signatures))
+        self.signature_executor = None
+        if self.should_validate_signatures:
+            self.signature_workers = self.env.integer('SIGNATURE_VALIDATION_WORKERS', os.cpu_count() or 1)
+            self.signature_executor = ProcessPoolExecutor(max_workers=self.signature_workers)
+        # (txid, nout) -> (certificate value, valid) for the claims of the blocks being advanced
+        self.validated_signatures = {}
+
+    async def fetch_and_process_blocks(self, caught_up_event):
+        try:
+            await super().fetch_and_process_blocks(caught_up_event)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self.signature_executor:
+            self.signature_executor.shutdown(wait=True)
+            self.signature_executor = None
 
     def advance_blocks(self, blocks):
         # save height, advance blocks as usual, then hook our claim tx processing
         height = self.height + 1
         super().advance_blocks(blocks)
+        if self.signature_executor:
+            self.validated_signatures = self.validate_signatures(blocks)
         pending_undo = []
         for index, block in enumerate(blocks):
             undo = self.advance_claim_txs(block.transactions, height + index)
             pending_undo.append((height+index, undo,))
+        self.validated_signatures = {}
         self.db.write_undo(pending_undo)
 
+    def validate_signatures(self, blocks):
+        """
+        Verify the signatures of all the signed claims in the blocks using the process pool.
+
+        Certificates are looked up the way advance_claim_txs will see them, including the ones
+        claimed or updated earlier in the same blocks. _checksig only uses a result if the
+        certificate value it was verified against is still the current one, otherwise it
+        verifies again in process, so the outcome is the same as validating one claim at a time.
+        """
+        # claim_id -> (txid, nout, value) for claims changed earlier in these blocks
+        batch_claims = {}
+        outpoints, jobs = [], []
+
+        def get_claim(claim_id):
+            if claim_id in batch_claims:
+                return batch_claims[claim_id]
+            claim_info = self.db.get_claim_info(claim_id)
+            return (claim_info.txid, claim_info.nout, claim_info.value) if claim_info else None
+
+        for block in blocks:
+            for tx, txid in block.transactions:
+                if not tx.has_claims:
+                    continue
+                for nout, output in enumerate(tx.outputs):
+                    claim = output.claim
+                    if isinstance(claim, NameClaim):
+                        claim_id = claim_id_hash(txid, nout)
+                    elif isinstance(claim, ClaimUpdate):
+                        claim_id = claim.claim_id
+                        current = get_claim(claim_id)
+                        if not current or not any(txin.prev_hash == current[0] and txin.prev_idx == current[1]
+                                                  for txin in tx.inputs):
+                            continue
+                    else:
+                        continue
+                    batch_claims[claim_id] = (txid, nout, claim.value)
+                    cert_id = self._get_cert_id(claim.name, claim.value)
+                    certificate = get_claim(cert_id) if cert_id else None
+                    if certificate:
+                        address = self.coin.address_from_script(output.pk_script)
+                        outpoints.append((txid, nout, certificate[2]))
+                        jobs.append((claim.value, address, certificate[2]))
+        if not jobs:
+            return {}
+        results = self.signature_executor.map(
+            validate_claim_signature, *zip(*jobs), chunksize=max(1, len(jobs) // (4 * self.signature_workers))
+        )
+        return {(txid, nout): (cert_value, valid) for (txid, nout, cert_value), valid in zip(outpoints, results)}
+
     def advance_claim_txs(self, txs, height):
         # TODO: generate claim undo info!
         undo_info = []
@@ -96,6 +167,7 @@ class LBRYBlockProcessor(BlockProcessor):
 
         undo_claim_info = ClaimInfo(*undo_claim_info) if undo_claim_info else None
         current_claim_info = self.db.get_claim_info(claim_id)
+        self.db.invalidate_claim_reads(claim_id, current_claim_info, undo_claim_info)
         if current_claim_info and undo_claim_info:
             # update, remove current claim
             self.db.remove_claim_id_for_outpoint(current_claim_info.txid, current_claim_info.nout)
@@ -144,24 +216,41 @@ class LBRYBlockProcessor(BlockProcessor):
         address = self.coin.address_from_script(output.pk_script)
         name, value, cert_id = output.claim.name, output.claim.value, None
         assert txid and address
-        cert_id = self._checksig(name, value, address)
+        cert_id = self._checksig(name, value, address, (txid, nout))
         return ClaimInfo(name, value, txid, nout, amount, address, height, cert_id)
 
-    def _checksig(self, name, value, address):
+    @staticmethod
+    def _get_cert_id(name, value):
         try:
             parse_lbry_uri(name.decode())  # skip invalid names
-            cert_id = Claim.FromString(value).publisherSignature.certificateId[::-1] or None
-            if not self.should_validate_signatures:
-                return cert_id
-            if cert_id:
-                cert_claim = self.db.get_claim_info(cert_id)
-                if cert_claim:
-                    certificate = smart_decode(cert_claim.value)
-                    claim_dict = smart_decode(value)
-                    claim_dict.validate_signature(address, certificate)
+            return Claim.FromString(value).publisherSignature.certificateId[::-1] or None
+        except Exception:
+            return None
+
+    def _checksig(self, name, value, address, outpoint=None):
+        cert_id = self._get_cert_id(name, value)
+        if not self.should_validate_signatures:
+            return cert_id
+        if cert_id:
+            cert_claim = self.db.get_claim_info(cert_id)
+            if cert_claim:
+                validated = self.validated_signatures.get(outpoint)
+                if validated and validated[0] == cert_claim.value:
+                    valid = validated[1]
+                else:
+                    valid = validate_claim_signature(value, address, cert_claim.value)
+                if valid:
                     return cert_id
-        except Exception as e:
-            pass
+
+
+def validate_claim_signature(value, address, cert_value):
+    try:
+        certificate = smart_decode(cert_value)
+        claim_dict = smart_decode(value)
+        claim_dict.validate_signature(address, certificate)
+        return True
+    except Exception:
+        return False
 
 def claim_id_hash(txid, n):
     # TODO: This should be in lbryschema
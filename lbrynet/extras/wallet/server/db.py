@@ -2,6 +2,8 @@ import msgpack
 import struct
 
 import time
+import threading
+from collections import OrderedDict
 from torba.server.hash import hash_to_hex_str
 
 from torba.server.db import DB
@@ -9,6 +11,66 @@ from torba.server.db import DB
 from lbrynet.extras.wallet.server.model import ClaimInfo
 
 
+class ClaimReadCache:
+    '''
+    A size bounded LRU of decoded claims, name and signature index entries read from disk
+
+    Entries are tagged with the height they were read at, an entry newer than the current
+    db height was read before a reorg and is dropped instead of returned. Flushes invalidate
+    from the db thread while sessions read on the event loop, every invalidation bumps the
+    generation and a read that started in an earlier generation isn't cached
+    '''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, height):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] > height:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, height, generation):
+        with self._lock:
+            if generation != self.generation:
+                # the value may have been read before the invalidation committed
+                return
+            self._entries[key] = (height, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
 class LBRYDB(DB):
 
     def __init__(self, *args, **kwargs):
@@ -20,6 +82,7 @@ class LBRYDB(DB):
         # stores deletes not yet flushed to disk
         self.pending_abandons = {}
         super().__init__(*args, **kwargs)
+        self.claim_read_cache = ClaimReadCache(self.env.integer('CLAIM_READ_CACHE_SIZE', 100000))
 
     def close(self):
         self.batched_flush_claims()
@@ -63,8 +126,10 @@ class LBRYDB(DB):
             with self.names_db.write_batch() as names_batch:
                 with self.signatures_db.write_batch() as signed_claims_batch:
                     with self.outpoint_to_claim_id_db.write_batch() as outpoint_batch:
-                        self.flush_claims(claims_batch, names_batch, signed_claims_batch,
-                                          outpoint_batch)
+                        flushed_keys = self.flush_claims(claims_batch, names_batch, signed_claims_batch,
+                                                         outpoint_batch)
+        # invalidate once the batches are committed, a read before that still sees the old values
+        self.claim_read_cache.invalidate(flushed_keys)
 
     def flush_claims(self, batch, names_batch, signed_claims_batch, outpoint_batch):
         flush_start = time.time()
@@ -101,18 +166,23 @@ class LBRYDB(DB):
                 write_outpoint(key, claim_id)
             else:
                 delete_outpoint(key)
+        flushed_keys = [('claim', claim_id) for claim_id in self.claim_cache]
+        flushed_keys.extend(('name', name) for name in self.claims_for_name_cache)
+        flushed_keys.extend(('cert', cert_id) for cert_id in self.claims_signed_by_cert_cache)
         self.logger.info('flushed at height {:,d} with {:,d} claims, {:,d} outpoints, {:,d} names '
-                         'and {:,d} certificates added while {:,d} were abandoned in {:.1f}s, committing...'
+                         'and {:,d} certificates added while {:,d} were abandoned in {:.1f}s, committing... '
+                         '(claim read cache: {hits:,d} hits, {misses:,d} misses, {hit_rate:.1%} hit rate)'
                          .format(self.db_height,
                                  len(self.claim_cache), len(self.outpoint_to_claim_id_cache),
                                  len(self.claims_for_name_cache),
                                  len(self.claims_signed_by_cert_cache), len(self.pending_abandons),
-                                 time.time() - flush_start))
+                                 time.time() - flush_start, **self.claim_read_cache.get_stats()))
         self.claim_cache = {}
         self.claims_for_name_cache = {}
         self.claims_signed_by_cert_cache = {}
         self.outpoint_to_claim_id_cache = {}
         self.pending_abandons = {}
+        return flushed_keys
 
     def assert_flushed(self, flush_data):
         super().assert_flushed(flush_data)
@@ -142,21 +212,41 @@ class LBRYDB(DB):
         key = tx_hash + struct.pack('>I', tx_idx)
         return self.outpoint_to_claim_id_cache.get(key) or self.outpoint_to_claim_id_db.get(key)
 
+    def _read_through(self, key, read):
+        generation = self.claim_read_cache.generation
+        found, value = self.claim_read_cache.get(key, self.db_height)
+        if not found:
+            value = read()
+            self.claim_read_cache.set(key, value, self.db_height, generation)
+        return value
+
+    def invalidate_claim_reads(self, claim_id, *claim_infos):
+        keys = [('claim', claim_id)]
+        for claim_info in claim_infos:
+            if claim_info:
+                keys.append(('name', claim_info.name))
+                if claim_info.cert_id:
+                    keys.append(('cert', claim_info.cert_id))
+        self.claim_read_cache.invalidate(keys)
+
     def get_claims_for_name(self, name):
         if name in self.claims_for_name_cache:
             return self.claims_for_name_cache[name]
-        db_claims = self.names_db.get(name)
-        return msgpack.loads(db_claims) if db_claims else {}
+
+        def read():
+            db_claims = self.names_db.get(name)
+            return msgpack.loads(db_claims) if db_claims else {}
+        return self._read_through(('name', name), read)
 
     def put_claim_for_name(self, name, claim_id):
         self.logger.info("[+] Adding claim {} for name {}.".format(hash_to_hex_str(claim_id), name))
-        claims = self.get_claims_for_name(name)
+        claims = dict(self.get_claims_for_name(name))
         claims.setdefault(claim_id, max(claims.values() or [0]) + 1)
         self.claims_for_name_cache[name] = claims
 
     def remove_claim_for_name(self, name, claim_id):
         self.logger.info("[-] Removing claim from name: {} - {}".format(hash_to_hex_str(claim_id), name))
-        claims = self.get_claims_for_name(name)
+        claims = dict(self.get_claims_for_name(name))
         claim_n = claims.pop(claim_id)
         for _claim_id, number in claims.items():
             if number > claim_n:
@@ -166,12 +256,15 @@ class LBRYDB(DB):
     def get_signed_claim_ids_by_cert_id(self, cert_id):
         if cert_id in self.claims_signed_by_cert_cache:
             return self.claims_signed_by_cert_cache[cert_id]
-        db_claims = self.signatures_db.get(cert_id)
-        return msgpack.loads(db_claims, use_list=True) if db_claims else []
+
+        def read():
+            db_claims = self.signatures_db.get(cert_id)
+            return msgpack.loads(db_claims, use_list=True) if db_claims else []
+        return self._read_through(('cert', cert_id), read)
 
     def put_claim_id_signed_by_cert_id(self, cert_id, claim_id):
         self.logger.info("[+] Adding signature: {} - {}".format(hash_to_hex_str(claim_id), hash_to_hex_str(cert_id)))
-        certs = self.get_signed_claim_ids_by_cert_id(cert_id)
+        certs = list(self.get_signed_claim_ids_by_cert_id(cert_id))
         certs.append(claim_id)
         self.claims_signed_by_cert_cache[cert_id] = certs
 
@@ -181,14 +274,20 @@ class LBRYDB(DB):
 
     def remove_claim_from_certificate_claims(self, cert_id, claim_id):
         self.logger.info("[-] Removing signature: {} - {}".format(hash_to_hex_str(claim_id), hash_to_hex_str(cert_id)))
-        certs = self.get_signed_claim_ids_by_cert_id(cert_id)
+        certs = list(self.get_signed_claim_ids_by_cert_id(cert_id))
         if claim_id in certs:
             certs.remove(claim_id)
         self.claims_signed_by_cert_cache[cert_id] = certs
 
     def get_claim_info(self, claim_id):
-        serialized = self.claim_cache.get(claim_id) or self.claims_db.get(claim_id)
-        return ClaimInfo.from_serialized(serialized) if serialized else None
+        serialized = self.claim_cache.get(claim_id)
+        if serialized:
+            return ClaimInfo.from_serialized(serialized)
+
+        def read():
+            db_serialized = self.claims_db.get(claim_id)
+            return ClaimInfo.from_serialized(db_serialized) if db_serialized else None
+        return self._read_through(('claim', claim_id), read)
 
     def put_claim_info(self, claim_id, claim_info):
         self.logger.info("[+] Adding claim info for: {}".format(hash_to_hex_str(claim_id)))
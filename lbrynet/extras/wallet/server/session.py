@@ -1,4 +1,5 @@
 import math
+import asyncio
 from binascii import unhexlify, hexlify
 
 from torba.rpc.jsonrpc import RPCError
@@ -12,9 +13,34 @@ from lbrynet.extras.wallet.server.block_processor import LBRYBlockProcessor
 from lbrynet.extras.wallet.server.db import LBRYDB
 
 
+class ResolveBatch:
+    '''Shares lbrycrd lookups between the URIs resolved by a single request.'''
+
+    def __init__(self, max_concurrent_lookups):
+        self.semaphore = asyncio.Semaphore(max_concurrent_lookups)
+        self.lookups = {}
+
+    def lookup(self, method, *args):
+        key = (method.__name__, args)
+        if key not in self.lookups:
+            self.lookups[key] = asyncio.ensure_future(self._run(method, *args))
+        return self.lookups[key]
+
+    def set_result(self, method, result, *args):
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(result)
+        self.lookups[(method.__name__, args)] = future
+
+    async def _run(self, method, *args):
+        async with self.semaphore:
+            return await method(*args)
+
+
 class LBRYElectrumX(ElectrumX):
     PROTOCOL_MIN = (0, 0)  # temporary, for supporting 0.10 protocol
     max_errors = math.inf  # don't disconnect people for errors! let them happen...
+    MAX_BATCH_URIS = 500
+    MAX_CONCURRENT_LOOKUPS = 20
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -42,6 +68,7 @@ class LBRYElectrumX(ElectrumX):
             'blockchain.claimtrie.getclaimssignedbyid': self.claimtrie_getclaimssignedbyid,
             'blockchain.block.get_server_height': self.get_server_height,
             'blockchain.block.get_block': self.get_block,
+            'blockchain.claimtrie.getcachestats': self.claimtrie_getcachestats,
         }
         # fixme: methods we use but shouldnt be using anymore. To be removed when torba goes out
         handlers.update({
@@ -110,6 +137,9 @@ class LBRYElectrumX(ElectrumX):
     async def get_server_height(self):
         return self.bp.height
 
+    async def claimtrie_getcachestats(self):
+        return self.db.claim_read_cache.get_stats()
+
     async def transaction_get_height(self, tx_hash):
         self.assert_tx_hash(tx_hash)
         transaction_info = await self.daemon.getrawtransaction(tx_hash, True)
@@ -142,6 +172,10 @@ class LBRYElectrumX(ElectrumX):
         channel_claim_ids = set(self.get_claim_ids_signed_by(channel_id))
         return claim_ids_for_name.intersection(channel_claim_ids)
 
+    async def get_signed_claims_with_name_from_daemon(self, channel_id, name):
+        claim_ids = self.get_signed_claims_with_name_for_channel(channel_id, name)
+        return await self.batched_formatted_claims_from_daemon(list(claim_ids))
+
     async def claimtrie_getclaimssignedbynthtoname(self, name, n):
         n = int(n)
         for claim_id, sequence in self.db.get_claims_for_name(name.encode('ISO-8859-1')).items():
@@ -214,10 +248,11 @@ class LBRYElectrumX(ElectrumX):
         name = name or claim['name']
         claim_id = claim['claimId']
         raw_claim_id = unhexlify(claim_id)[::-1]
-        if not self.db.get_claim_info(raw_claim_id):
+        claim_info = self.db.get_claim_info(raw_claim_id)
+        if not claim_info:
             #raise RPCError("Lbrycrd has {} but not lbryumx, please submit a bug report.".format(claim_id))
             return {}
-        address = self.db.get_claim_info(raw_claim_id).address.decode()
+        address = claim_info.address.decode()
         sequence = self.db.get_claims_for_name(name.encode('ISO-8859-1')).get(raw_claim_id)
         if not sequence:
             return {}
@@ -295,6 +330,9 @@ class LBRYElectrumX(ElectrumX):
                     return claim
 
     async def claimtrie_getvalueforuri(self, block_hash, uri, known_certificates=None):
+        return await self.resolve_uri(block_hash, uri, ResolveBatch(self.MAX_CONCURRENT_LOOKUPS))
+
+    async def resolve_uri(self, block_hash, uri, batch: ResolveBatch):
         # TODO: this thing is huge, refactor
         CLAIM_ID = "claim_id"
         WINNING = "winning"
@@ -312,15 +350,17 @@ class LBRYElectrumX(ElectrumX):
 
             # TODO: this is also done on the else, refactor
             if parsed_uri.claim_id:
-                certificate_info = await self.claimtrie_getclaimbyid(parsed_uri.claim_id)
+                certificate_info = await batch.lookup(self.claimtrie_getclaimbyid, parsed_uri.claim_id)
                 if certificate_info and certificate_info['name'] == parsed_uri.name:
                     certificate = {'resolution_type': CLAIM_ID, 'result': certificate_info}
             elif parsed_uri.claim_sequence:
-                certificate_info = await self.claimtrie_getnthclaimforname(parsed_uri.name, parsed_uri.claim_sequence)
+                certificate_info = await batch.lookup(
+                    self.claimtrie_getnthclaimforname, parsed_uri.name, parsed_uri.claim_sequence
+                )
                 if certificate_info:
                     certificate = {'resolution_type': SEQUENCE, 'result': certificate_info}
             else:
-                certificate_info = await self.claimtrie_getvalue(parsed_uri.name, block_hash)
+                certificate_info = await batch.lookup(self.claimtrie_getvalue, parsed_uri.name, block_hash)
                 if certificate_info:
                     certificate = {'resolution_type': WINNING, 'result': certificate_info}
 
@@ -330,14 +370,13 @@ class LBRYElectrumX(ElectrumX):
             if certificate and not parsed_uri.path:
                 result['certificate'] = certificate
                 channel_id = certificate['result']['claim_id']
-                claims_in_channel = await self.claimtrie_getclaimssignedbyid(channel_id)
+                claims_in_channel = await batch.lookup(self.claimtrie_getclaimssignedbyid, channel_id)
                 result['unverified_claims_in_channel'] = {claim['claim_id']: (claim['name'], claim['height'])
                                                           for claim in claims_in_channel if claim}
             elif certificate:
                 result['certificate'] = certificate
                 channel_id = certificate['result']['claim_id']
-                claim_ids_matching_name = self.get_signed_claims_with_name_for_channel(channel_id, parsed_uri.path)
-                claims = await self.batched_formatted_claims_from_daemon(claim_ids_matching_name)
+                claims = await batch.lookup(self.get_signed_claims_with_name_from_daemon, channel_id, parsed_uri.path)
 
                 claims_in_channel = {claim['claim_id']: (claim['name'], claim['height'])
                                      for claim in claims}
@@ -345,15 +384,17 @@ class LBRYElectrumX(ElectrumX):
         else:
             claim = None
             if parsed_uri.claim_id:
-                claim_info = await self.claimtrie_getclaimbyid(parsed_uri.claim_id)
+                claim_info = await batch.lookup(self.claimtrie_getclaimbyid, parsed_uri.claim_id)
                 if claim_info and claim_info['name'] == parsed_uri.name:
                     claim = {'resolution_type': CLAIM_ID, 'result': claim_info}
             elif parsed_uri.claim_sequence:
-                claim_info = await self.claimtrie_getnthclaimforname(parsed_uri.name, parsed_uri.claim_sequence)
+                claim_info = await batch.lookup(
+                    self.claimtrie_getnthclaimforname, parsed_uri.name, parsed_uri.claim_sequence
+                )
                 if claim_info:
                     claim = {'resolution_type': SEQUENCE, 'result': claim_info}
             else:
-                claim_info = await self.claimtrie_getvalue(parsed_uri.name, block_hash)
+                claim_info = await batch.lookup(self.claimtrie_getvalue, parsed_uri.name, block_hash)
                 if claim_info:
                     claim = {'resolution_type': WINNING, 'result': claim_info}
             if (claim and
@@ -363,7 +404,7 @@ class LBRYElectrumX(ElectrumX):
                 raw_certificate_id = self.db.get_claim_info(raw_claim_id).cert_id
                 if raw_certificate_id:
                     certificate_id = hash_to_hex_str(raw_certificate_id)
-                    certificate = await self.claimtrie_getclaimbyid(certificate_id)
+                    certificate = await batch.lookup(self.claimtrie_getclaimbyid, certificate_id)
                     if certificate:
                         certificate = {'resolution_type': CLAIM_ID,
                                        'result': certificate}
@@ -372,17 +413,34 @@ class LBRYElectrumX(ElectrumX):
         return result
 
     async def claimtrie_getvalueforuris(self, block_hash, *uris):
-        MAX_BATCH_URIS = 500
-        if len(uris) > MAX_BATCH_URIS:
-            raise Exception("Exceeds max batch uris of {}".format(MAX_BATCH_URIS))
-
-        return {uri: await self.claimtrie_getvalueforuri(block_hash, uri) for uri in uris}
-
-        # TODO: get it all concurrently when lbrycrd pending changes goes into a stable release
-        #async def getvalue(uri):
-        #    value = await self.claimtrie_getvalueforuri(block_hash, uri)
-        #    return uri, value,
-        #return dict([await asyncio.gather(*tuple(getvalue(uri) for uri in uris))][0])
+        if len(uris) > self.MAX_BATCH_URIS:
+            raise Exception("Exceeds max batch uris of {}".format(self.MAX_BATCH_URIS))
+        uris = tuple(dict.fromkeys(uris))
+        batch = ResolveBatch(self.MAX_CONCURRENT_LOOKUPS)
+
+        claim_ids = set()
+        for uri in uris:
+            try:
+                claim_id = parse_lbry_uri(uri).claim_id
+                if claim_id:
+                    self.assert_claim_id(claim_id)
+                    claim_ids.add(claim_id)
+            except (URIParseError, RPCError):
+                # left for resolve_uri to report
+                continue
+        if claim_ids:
+            await self.prefetch_claims_by_ids(batch, list(claim_ids))
+
+        values = await asyncio.gather(*(self.resolve_uri(block_hash, uri, batch) for uri in uris))
+        return dict(zip(uris, values))
+
+    async def prefetch_claims_by_ids(self, batch: ResolveBatch, claim_ids):
+        async with batch.semaphore:
+            claims = await self.daemon.getclaimsbyids(claim_ids)
+        for claim, claim_id in zip(claims, claim_ids):
+            if not claim or not claim.get('value'):
+                claim = await batch.lookup(self.slow_get_claim_by_id_using_name, claim_id)
+            batch.set_result(self.claimtrie_getclaimbyid, self.format_claim_from_daemon(claim), claim_id)
 
 
 def proof_has_winning_claim(proof):
@@ -1,34 +1,163 @@
 import asyncio
 import logging
 import os
+import time
 from binascii import unhexlify
+from collections import OrderedDict
 from sqlite3 import IntegrityError
 from twisted.internet import defer
 from lbrynet.extras.compat import f2d
 from lbrynet.blob.blob_file import BlobFile
 from lbrynet.blob.creator import BlobFileCreator
+from lbrynet.blob.verifier import BlobVerifier, DEFAULT_VERIFY_WORKERS
+from lbrynet.blob.writer import is_temp_blob_file
 
 log = logging.getLogger(__name__)
 
+DEFAULT_BLOB_CACHE_SIZE = 10000
+DEFAULT_DEMAND_HALF_LIFE = 3600
+DEFAULT_DEMAND_SIZE = 10000
+
+
+class BlobCache:
+    """
+    A size bounded LRU mapping of blob hash to BlobFile
+
+    Blobs with active readers or writers are pinned and are never evicted, so the
+    cache can temporarily hold more than max_size blobs while transfers are in flight
+    """
+
+    def __init__(self, max_size=DEFAULT_BLOB_CACHE_SIZE):
+        self.max_size = max_size
+        self._blobs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, blob_hash):
+        return blob_hash in self._blobs
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def __iter__(self):
+        return iter(self._blobs)
+
+    def __getitem__(self, blob_hash):
+        blob = self._blobs[blob_hash]
+        self._blobs.move_to_end(blob_hash)
+        return blob
+
+    def __setitem__(self, blob_hash, blob):
+        self._blobs[blob_hash] = blob
+        self._blobs.move_to_end(blob_hash)
+        self._evict()
+
+    def __delitem__(self, blob_hash):
+        del self._blobs[blob_hash]
+
+    def get(self, blob_hash, default=None):
+        if blob_hash in self._blobs:
+            return self[blob_hash]
+        return default
+
+    def keys(self):
+        return self._blobs.keys()
+
+    def values(self):
+        return self._blobs.values()
+
+    def items(self):
+        return self._blobs.items()
+
+    def lookup(self, blob_hash):
+        """Like get(), but counted towards the hit/miss statistics"""
+        blob = self.get(blob_hash)
+        if blob is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return blob
+
+    @staticmethod
+    def is_pinned(blob):
+        return blob.readers > 0 or blob.is_downloading()
+
+    def _evict(self):
+        # pinned blobs are in use, so move them to the most recently used end and keep looking
+        to_check = len(self._blobs)
+        while len(self._blobs) > self.max_size and to_check > 0:
+            to_check -= 1
+            blob_hash, blob = next(iter(self._blobs.items()))
+            if self.is_pinned(blob):
+                self._blobs.move_to_end(blob_hash)
+            else:
+                del self._blobs[blob_hash]
+                self.evictions += 1
+
+    def get_stats(self):
+        return {
+            'size': len(self._blobs),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class BlobDemand:
+    """
+    Counts the requests peers make for our blobs, each count halves every half_life seconds so it
+    reflects recent demand. Only the max_size most recently requested blobs are tracked
+    """
+
+    def __init__(self, half_life=DEFAULT_DEMAND_HALF_LIFE, max_size=DEFAULT_DEMAND_SIZE, get_time=time.time):
+        self.half_life = half_life
+        self.max_size = max_size
+        self.get_time = get_time
+        self._demand = OrderedDict()  # {blob_hash: (count, time of the last request)}
+
+    def __len__(self):
+        return len(self._demand)
+
+    def _decayed(self, count, requested_at, now):
+        return count * 0.5 ** ((now - requested_at) / self.half_life)
+
+    def record(self, blob_hash):
+        now = self.get_time()
+        count, requested_at = self._demand.get(blob_hash, (0.0, now))
+        self._demand[blob_hash] = (self._decayed(count, requested_at, now) + 1, now)
+        self._demand.move_to_end(blob_hash)
+        while len(self._demand) > self.max_size:
+            self._demand.popitem(last=False)
+
+    def get(self, blob_hash):
+        if blob_hash not in self._demand:
+            return 0.0
+        count, requested_at = self._demand[blob_hash]
+        return self._decayed(count, requested_at, self.get_time())
+
 
 class DiskBlobManager:
-    def __init__(self, blob_dir, storage, node_datastore=None):
+    def __init__(self, blob_dir, storage, node_datastore=None, blob_cache_size=DEFAULT_BLOB_CACHE_SIZE):
         """
         This class stores blobs on the hard disk
 
         blob_dir - directory where blobs are stored
         storage - SQLiteStorage object
+        blob_cache_size - maximum number of unpinned BlobFile objects to keep loaded
         """
         self.storage = storage
         self.blob_dir = blob_dir
         self._node_datastore = node_datastore
         self.blob_creator_type = BlobFileCreator
-        # TODO: consider using an LRU for blobs as there could potentially
-        #       be thousands of blobs loaded up, many stale
-        self.blobs = {}
+        self.blobs = BlobCache(blob_cache_size)
         self.blob_hashes_to_delete = {}  # {blob_hash: being_deleted (True/False)}
+        self.verifier = None
+        self.demand = BlobDemand()
 
     async def setup(self):
+        self._remove_temp_blob_files()
         if self._node_datastore is not None:
             raw_blob_hashes = await self.storage.get_all_finished_blobs()
             self._node_datastore.completed_blobs.update(raw_blob_hashes)
@@ -42,8 +171,9 @@ class DiskBlobManager:
         """
         if length is not None and not isinstance(length, int):
             raise Exception("invalid length type: {} ({})".format(length, str(type(length))))
-        if blob_hash in self.blobs:
-            return self.blobs[blob_hash]
+        blob = self.blobs.lookup(blob_hash)
+        if blob is not None:
+            return blob
         return self._make_new_blob(blob_hash, length)
 
     def get_blob_creator(self):
@@ -66,6 +196,14 @@ class DiskBlobManager:
     def completed_blobs(self, blobhashes_to_check):
         return self._completed_blobs(blobhashes_to_check)
 
+    def record_blob_request(self, blob_hash):
+        """Note that a peer asked us for a blob, see get_blob_demand()"""
+        self.demand.record(blob_hash)
+
+    def get_blob_demand(self, blob_hash):
+        """Returns the decayed number of recent requests peers made for the blob"""
+        return self.demand.get(blob_hash)
+
     def count_should_announce_blobs(self):
         return f2d(self.storage.count_should_announce_blobs())
 
@@ -118,12 +256,56 @@ class DiskBlobManager:
             if str(err) != "FOREIGN KEY constraint failed":
                 raise err
 
+    async def verify_blobs(self, blob_hashes=None, workers=DEFAULT_VERIFY_WORKERS):
+        """
+        Re-hash blob files and compare them to their names, corrupt blobs are deleted and marked as
+        pending so they are downloaded again the next time their stream is
+
+        blob_hashes - blobs to verify, defaults to all the blobs on disk
+        returns the hashes of the corrupt blobs
+        """
+        if self.verifier is not None and self.verifier.running:
+            raise Exception("blob verification is already running")
+        if blob_hashes is None:
+            blob_hashes = await self._get_all_verified_blob_hashes()
+        self.verifier = BlobVerifier(self.blob_dir, workers)
+        bad_blob_hashes = await self.verifier.verify(blob_hashes)
+        await self._mark_blobs_pending(bad_blob_hashes)
+        return bad_blob_hashes
+
+    async def _mark_blobs_pending(self, blob_hashes):
+        for blob_hash in blob_hashes:
+            if self._node_datastore is not None:
+                self._node_datastore.completed_blobs.discard(unhexlify(blob_hash))
+            blob = self.blobs.get(blob_hash)
+            try:
+                if blob is not None:
+                    blob.delete()
+                    del self.blobs[blob_hash]
+                else:
+                    os.remove(os.path.join(self.blob_dir, blob_hash))
+            except (OSError, ValueError) as err:
+                log.warning("Failed to delete corrupt blob %s: %s", blob_hash, err)
+        if blob_hashes:
+            await self.storage.set_blobs_pending(blob_hashes)
+
     def _completed_blobs(self, blobhashes_to_check):
         """Returns of the blobhashes_to_check, which are valid"""
         blobs = [self.get_blob(b) for b in blobhashes_to_check]
         blob_hashes = [b.blob_hash for b in blobs if b.verified]
         return blob_hashes
 
+    def _remove_temp_blob_files(self):
+        # partially written blobs left behind if we were shut down mid-download
+        if not os.path.isdir(self.blob_dir):
+            return
+        for file_name in os.listdir(self.blob_dir):
+            if is_temp_blob_file(file_name):
+                try:
+                    os.remove(os.path.join(self.blob_dir, file_name))
+                except OSError as err:
+                    log.warning("Failed to remove temporary blob file %s: %s", file_name, err)
+
     async def _get_all_verified_blob_hashes(self):
         blobs = await self.storage.get_all_blob_hashes()
         verified_blobs = []
@@ -0,0 +1,172 @@
+import logging
+from collections import deque
+
+from lbrynet.blob.blob_file import MAX_BLOB_SIZE
+
+log = logging.getLogger(__name__)
+
+THROUGHPUT_SMOOTHING = 0.3  # weight of the newest sample in a source's average throughput
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 10  # completed downloads needed before slow requests are hedged
+
+
+class BlobSource:
+    """
+    The measured throughput of a place blobs are downloaded from and the number of requests it is
+    trusted with at once
+
+    Concurrency grows by one after every download that kept up with the source's average throughput
+    and is halved after a failure
+    """
+
+    def __init__(self, name, concurrency=1, max_concurrency=1):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.throughput = None  # bytes per second
+        self.downloaded = 0
+        self.failed = 0
+
+    def has_capacity(self):
+        return self.active < self.concurrency
+
+    def get_score(self):
+        # sources that haven't been measured yet are tried first
+        if self.throughput is None:
+            return float('inf')
+        return self.throughput / (self.active + 1)
+
+    def record_success(self, num_bytes, seconds):
+        rate = num_bytes / max(seconds, 0.001)
+        self.downloaded += 1
+        if self.throughput is None:
+            self.throughput = rate
+        else:
+            if rate >= self.throughput / 2:
+                self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+            self.throughput = THROUGHPUT_SMOOTHING * rate + (1 - THROUGHPUT_SMOOTHING) * self.throughput
+
+    def record_failure(self):
+        self.failed += 1
+        self.concurrency = max(1, self.concurrency // 2)
+
+    def get_stats(self):
+        return {
+            'name': self.name,
+            'concurrency': self.concurrency,
+            'active': self.active,
+            'throughput': self.throughput,
+            'downloaded': self.downloaded,
+            'failed': self.failed
+        }
+
+
+class FetchScheduler:
+    """
+    The shared view of the blob downloads of a stream across its HTTP mirrors and its peers
+
+    A source only starts on a blob another source is already downloading if its measured throughput
+    says it will finish first, or once the other download has taken longer than HEDGE_PERCENTILE of
+    the completed ones. A slow download is then offered to the hedger, the mirror downloader, to race
+    on another source. BlobFile cancels the writer that loses the race.
+    """
+
+    def __init__(self, clock=None):
+        if not clock:
+            from twisted.internet import reactor
+            self.clock = reactor
+        else:
+            self.clock = clock
+        self.latencies = deque(maxlen=100)
+        self.hedger = None  # callable(blob, slow_source) racing a slow download on another source
+        self.download_listeners = []  # callables run after a download ends, blobs left to it may be started
+        self._sources = {}  # {key: BlobSource}
+        self._downloads = {}  # {blob_hash: {BlobSource: (started, hedge_call)}}
+
+    def get_source(self, key, source_type=BlobSource, **kwargs):
+        """
+        Returns the source for key, a mirror server or a Peer, making it with source_type if it's new
+        """
+        if key not in self._sources:
+            self._sources[key] = source_type(str(key), **kwargs)
+        return self._sources[key]
+
+    def get_hedge_delay(self):
+        """
+        Seconds after which a request is slower than HEDGE_PERCENTILE of the completed ones, or None if
+        there aren't enough completed requests yet
+        """
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(int(len(latencies) * HEDGE_PERCENTILE), len(latencies) - 1)]
+
+    def is_downloading(self, blob):
+        return bool(self._downloads.get(blob.blob_hash))
+
+    def should_download(self, source, blob):
+        """
+        Whether source should start downloading blob, given the other sources already downloading it
+        """
+        if blob.get_is_verified():
+            return False
+        downloads = self._downloads.get(blob.blob_hash, {})
+        if source in downloads:
+            return False
+        now = self.clock.seconds()
+        hedge_delay = self.get_hedge_delay()
+        length = blob.get_length() or MAX_BLOB_SIZE
+        for other, (started, _) in downloads.items():
+            elapsed = now - started
+            if hedge_delay is not None and elapsed >= hedge_delay:
+                continue
+            if source.throughput is None or other.throughput is None:
+                return False
+            if length / source.throughput >= length / other.throughput - elapsed:
+                return False
+        return True
+
+    def download_started(self, source, blob):
+        hedge_delay = self.get_hedge_delay()
+        hedge_call = None
+        if hedge_delay is not None:
+            hedge_call = self.clock.callLater(hedge_delay, self._hedge, blob, source)
+        self._downloads.setdefault(blob.blob_hash, {})[source] = (self.clock.seconds(), hedge_call)
+
+    def download_finished(self, source, blob, num_bytes=None, failed=False):
+        """
+        num_bytes - the size of the blob if source finished downloading it, None if it was cancelled
+        failed - whether the source failed to deliver the blob
+        """
+        downloads = self._downloads.get(blob.blob_hash, {})
+        if source not in downloads:
+            return
+        started, hedge_call = downloads.pop(source)
+        if not downloads:
+            del self._downloads[blob.blob_hash]
+        if hedge_call is not None and hedge_call.active():
+            hedge_call.cancel()
+        if num_bytes is not None:
+            elapsed = self.clock.seconds() - started
+            source.record_success(num_bytes, elapsed)
+            self.latencies.append(elapsed)
+        elif failed:
+            source.record_failure()
+        for listener in self.download_listeners:
+            listener()
+
+    def _hedge(self, blob, slow_source):
+        downloads = self._downloads.get(blob.blob_hash, {})
+        if slow_source in downloads:
+            downloads[slow_source] = (downloads[slow_source][0], None)
+        if self.hedger is not None and not blob.get_is_verified():
+            log.debug("Download of %s from %s is slow", blob.blob_hash, slow_source.name)
+            self.hedger(blob, slow_source)
+
+    def get_stats(self):
+        return {
+            'sources': [source.get_stats() for source in self._sources.values()],
+            'downloading': len(self._downloads),
+            'hedge_delay': self.get_hedge_delay()
+        }
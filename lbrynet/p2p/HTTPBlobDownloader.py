@@ -1,15 +1,31 @@
 import logging
 import treq
-from random import choice
 from twisted.internet import defer, task
 from twisted.internet.error import ConnectingCancelledError
 from twisted.web._newclient import ResponseNeverReceived
 
 from lbrynet.extras.compat import f2d
 from lbrynet.p2p.Error import DownloadCanceledError
+from lbrynet.p2p.FetchScheduler import FetchScheduler, BlobSource
 
 log = logging.getLogger(__name__)
 
+INITIAL_MIRROR_CONCURRENCY = 2
+MAX_MIRROR_CONCURRENCY = 16
+
+
+class MirrorSource(BlobSource):
+    """
+    An HTTP mirror, it is trusted with more requests at once as long as it keeps up with them
+    """
+
+    def __init__(self, server, concurrency=INITIAL_MIRROR_CONCURRENCY, max_concurrency=MAX_MIRROR_CONCURRENCY):
+        super().__init__(server, concurrency, max_concurrency)
+
+    @property
+    def server(self):
+        return self.name
+
 
 class HTTPBlobDownloader:
     '''
@@ -18,9 +34,13 @@ class HTTPBlobDownloader:
     and cause any other type of downloader to progress to the next missing blob. Also, BlobFile is naturally able
     to cancel other writers when a writer finishes first. That's why there is no call to cancel/resume/stop between
     different types of downloaders.
+
+    Blobs are handed to the mirror with the most throughput to spare. The FetchScheduler shared with the peer
+    downloader decides whether a blob another source is downloading is left to it, and a download that takes
+    longer than most completed ones is hedged by racing a mirror, the loser is cancelled by BlobFile.
     '''
     def __init__(self, blob_manager, blob_hashes=None, servers=None, client=None, sd_hashes=None, retry=True,
-                 clock=None):
+                 clock=None, scheduler=None):
         if not clock:
             from twisted.internet import reactor
             self.clock = reactor
@@ -28,6 +48,8 @@ class HTTPBlobDownloader:
             self.clock = clock
         self.blob_manager = blob_manager
         self.servers = servers or []
+        self.scheduler = scheduler or FetchScheduler(self.clock)
+        self.sources = [self.scheduler.get_source(server, MirrorSource) for server in self.servers]
         self.client = client or treq
         self.blob_hashes = blob_hashes or []
         self.missing_blob_hashes = []
@@ -35,7 +57,8 @@ class HTTPBlobDownloader:
         self.sd_hashes = sd_hashes or []
         self.head_blob_hashes = []
         self.max_failures = 3
-        self.semaphore = defer.DeferredSemaphore(2)
+        self._waiting = []  # [(blob, deferred)] waiting for a mirror to have a free slot
+        self.hedged = 0
         self.deferreds = []
         self.writers = []
         self.retry = retry
@@ -52,11 +75,18 @@ class HTTPBlobDownloader:
     @defer.inlineCallbacks
     def start(self):
         if not self.looping_call.running:
+            self.scheduler.hedger = self._hedge
+            if self._dispatch not in self.scheduler.download_listeners:
+                self.scheduler.download_listeners.append(self._dispatch)
             self.lc_deferred = self.looping_call.start(self.short_delay, now=True)
             self.lc_deferred.addErrback(lambda err: err.trap(defer.CancelledError))
             yield self.finished_deferred
 
     def stop(self):
+        if self.scheduler.hedger == self._hedge:
+            self.scheduler.hedger = None
+        if self._dispatch in self.scheduler.download_listeners:
+            self.scheduler.download_listeners.remove(self._dispatch)
         for d in reversed(self.deferreds):
             d.cancel()
         while self.writers:
@@ -117,47 +147,137 @@ class HTTPBlobDownloader:
                 defer.returnValue(self.long_delay)
             defer.returnValue(None)
 
+    def _pick_source(self, exclude=None):
+        available = [source for source in self.sources if source.has_capacity() and source is not exclude]
+        if not available:
+            return None
+        return max(available, key=lambda source: source.get_score())
+
+    def _acquire_source(self, blob):
+        d = defer.Deferred()
+        self._waiting.append((blob, d))
+        self._dispatch()
+        return d
+
+    def _release_source(self, source):
+        source.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        # blobs another source finished don't need a mirror
+        finished = [d for blob, d in self._waiting if not d.called and blob.verified]
+        self._waiting = [(blob, d) for blob, d in self._waiting if not d.called and not blob.verified]
+        for d in finished:
+            d.callback(None)
+        while self._waiting:
+            source = self._pick_source()
+            if source is None:
+                return
+            # blobs another source is downloading are left to it unless this mirror should finish them
+            # sooner, they wait for that download to end or to become slow enough to hedge
+            ready = [
+                i for i, (blob, _) in enumerate(self._waiting) if self.scheduler.should_download(source, blob)
+            ]
+            if not ready:
+                return
+            idle = [i for i in ready if not self.scheduler.is_downloading(self._waiting[i][0])]
+            blob, d = self._waiting.pop((idle or ready)[0])
+            source.active += 1
+            d.callback(source)
+
+    def _hedge(self, blob, slow_source):
+        if blob.verified:
+            return
+        if any(waiting is blob for waiting, _ in self._waiting):
+            # the blob was left to the slow source, now a mirror can take it
+            self._dispatch()
+            return
+        source = self._pick_source(exclude=slow_source)
+        if source is None or not self.scheduler.should_download(source, blob):
+            return
+        log.debug("Hedging slow download of %s from %s on %s", blob.blob_hash, slow_source.name,
+                  source.server)
+        self.hedged += 1
+        source.active += 1
+        d = self._download_from(source, blob)
+        d.addErrback(lambda err: err.trap(defer.TimeoutError, defer.CancelledError))
+        self.deferreds.append(d)
+
     @defer.inlineCallbacks
     def _download_blob(self, blob):
         for _ in range(self.max_failures):
-            writer, finished_deferred = blob.open_for_writing('mirror')
-            self.writers.append(writer)
-            try:
-                downloaded = yield self._write_blob(writer, blob)
-                if downloaded:
-                    yield finished_deferred  # yield for verification errors, so we log them
-                    if blob.verified:
-                        log.info('Mirror completed download for %s', blob.blob_hash)
-                        should_announce = blob.blob_hash in self.sd_hashes or blob.blob_hash in self.head_blob_hashes
-                        yield self.blob_manager.blob_completed(blob, should_announce=should_announce)
-                        self.downloaded_blob_hashes.append(blob.blob_hash)
+            source = yield self._acquire_source(blob)
+            if source is None:
+                break
+            if blob.verified:
+                self._release_source(source)
+                break
+            finished = yield self._download_from(source, blob)
+            if finished:
                 break
-            except (IOError, Exception, defer.CancelledError, ConnectingCancelledError, ResponseNeverReceived) as e:
-                if isinstance(
-                        e, (DownloadCanceledError, defer.CancelledError, ConnectingCancelledError,
-                            ResponseNeverReceived)
-                ) or 'closed file' in str(e):
-                    # some other downloader finished first or it was simply cancelled
-                    log.info("Mirror download cancelled: %s", blob.blob_hash)
-                    break
-                else:
-                    log.exception('Mirror failed downloading')
-            finally:
-                finished_deferred.addBoth(lambda _: None)  # suppress echoed errors
-                if 'mirror' in blob.writers:
-                    writer.close()
-                self.writers.remove(writer)
+
+    @defer.inlineCallbacks
+    def _download_from(self, source, blob):
+        """
+        Download a blob from a mirror the caller has reserved a slot on, returns False if the download
+        failed and should be retried
+        """
+        writer_name = 'mirror:%s' % source.server
+        writer, finished_deferred = blob.open_for_writing(writer_name)
+        if writer is None:
+            self._release_source(source)
+            defer.returnValue(True)
+        self.writers.append(writer)
+        self.scheduler.download_started(source, blob)
+        request = self._write_blob(writer, blob, source.server)
+
+        def cancel_request(err):
+            # another downloader finished the blob first, stop waiting on this mirror
+            if err.check(DownloadCanceledError):
+                self.clock.callLater(0, lambda: None if request.called else request.cancel())
+            return err
+
+        finished_deferred.addErrback(cancel_request)
+        try:
+            downloaded = yield request
+            if downloaded:
+                yield finished_deferred  # yield for verification errors, so we log them
+                if blob.verified:
+                    log.info('Mirror completed download for %s', blob.blob_hash)
+                    self.scheduler.download_finished(source, blob, blob.get_length() or 0)
+                    should_announce = blob.blob_hash in self.sd_hashes or blob.blob_hash in self.head_blob_hashes
+                    yield self.blob_manager.blob_completed(blob, should_announce=should_announce)
+                    self.downloaded_blob_hashes.append(blob.blob_hash)
+            defer.returnValue(True)
+        except (IOError, Exception, defer.CancelledError, ConnectingCancelledError, ResponseNeverReceived) as e:
+            if isinstance(
+                    e, (DownloadCanceledError, defer.CancelledError, ConnectingCancelledError,
+                        ResponseNeverReceived)
+            ) or 'closed file' in str(e):
+                # some other downloader finished first or it was simply cancelled
+                log.info("Mirror download cancelled: %s", blob.blob_hash)
+                defer.returnValue(True)
+            log.exception('Mirror failed downloading')
+            self.scheduler.download_finished(source, blob, failed=True)
+            defer.returnValue(False)
+        finally:
+            finished_deferred.addBoth(lambda _: None)  # suppress echoed errors
+            if writer_name in blob.writers:
+                writer.close()
+            self.writers.remove(writer)
+            self.scheduler.download_finished(source, blob)
+            self._release_source(source)
 
     def download_blob(self, blob):
         if not blob.verified:
-            d = self.semaphore.run(self._download_blob, blob)
+            d = self._download_blob(blob)
             d.addErrback(lambda err: err.trap(defer.TimeoutError, defer.CancelledError))
             return d
         return defer.succeed(None)
 
     @defer.inlineCallbacks
-    def _write_blob(self, writer, blob):
-        response = yield self.client.get(url_for(choice(self.servers), blob.blob_hash))
+    def _write_blob(self, writer, blob, server):
+        response = yield self.client.get(url_for(server, blob.blob_hash))
         if response.code != 200:
             log.debug('Missing a blob: %s', blob.blob_hash)
             if blob.blob_hash in self.blob_hashes:
@@ -171,6 +291,13 @@ class HTTPBlobDownloader:
         yield self.client.collect(response, writer.write)
         defer.returnValue(True)
 
+    def get_stats(self):
+        return {
+            'mirrors': [source.get_stats() for source in self.sources],
+            'hedged': self.hedged,
+            'hedge_delay': self.scheduler.get_hedge_delay()
+        }
+
     @defer.inlineCallbacks
     def download_stream(self, stream_hash, sd_hash):
         stream_crypt_blobs = yield f2d(self.blob_manager.storage.get_blobs_for_stream(stream_hash))
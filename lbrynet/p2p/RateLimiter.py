@@ -35,120 +35,319 @@ class DummyRateLimiter:
     def set_ul_limit(self, limit):
         pass
 
-    def report_dl_bytes(self, num_bytes):
+    def report_dl_bytes(self, num_bytes, protocol=None):
         self.dl_bytes_this_second += num_bytes
         self.total_dl_bytes += num_bytes
 
-    def report_ul_bytes(self, num_bytes):
+    def report_ul_bytes(self, num_bytes, protocol=None):
         self.ul_bytes_this_second += num_bytes
         self.total_ul_bytes += num_bytes
 
+    def register_protocol(self, protocol, weight=1.0):
+        pass
+
+    def unregister_protocol(self, protocol):
+        pass
+
+    def get_stats(self):
+        return {}
+
+
+# upper bounds, in bytes per second, of the throughput histogram bins
+THROUGHPUT_BINS = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, float('inf'))
+
+
+class TokenBucket:
+    """
+    Holds up to `burst` seconds worth of tokens at `rate` bytes per second. Bytes are taken as they are
+    reported, so the bucket can go into debt, which is paid back before more traffic is allowed
+    """
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = rate * burst
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.rate * self.burst)
+        self.updated = now
+
+    def take(self, num_bytes, now):
+        self.refill(now)
+        self.tokens -= num_bytes
+
+    def set_rate(self, rate, now):
+        self.refill(now)
+        self.rate = rate
+        self.tokens = min(self.tokens, rate * self.burst)
+
+    def in_debt(self):
+        return self.tokens < 0
+
+    def time_until_paid(self):
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+
+class ThroughputHistogram:
+    """Counts the seconds a peer spent in each band of THROUGHPUT_BINS"""
+
+    def __init__(self, now):
+        self.counts = [0] * len(THROUGHPUT_BINS)
+        self.window_start = int(now)
+        self.window_bytes = 0
+        self.total_bytes = 0
+        self.last_rate = 0
+
+    def add(self, num_bytes, now):
+        self._roll(now)
+        self.window_bytes += num_bytes
+        self.total_bytes += num_bytes
+
+    def _roll(self, now):
+        second = int(now)
+        if second > self.window_start:
+            self.last_rate = self.window_bytes
+            for i, upper_bound in enumerate(THROUGHPUT_BINS):
+                if self.window_bytes < upper_bound:
+                    self.counts[i] += 1
+                    break
+            self.window_start = second
+            self.window_bytes = 0
+
+    def get_stats(self, now):
+        self._roll(now)
+        return {
+            'total_bytes': self.total_bytes,
+            'bytes_per_second': self.last_rate,
+            'histogram': {
+                ('<%i' % upper_bound if upper_bound != float('inf') else '>=%i' % THROUGHPUT_BINS[-2]): count
+                for upper_bound, count in zip(THROUGHPUT_BINS, self.counts)
+            }
+        }
+
+
+class _Direction:
+    """The buckets and throttled protocols of one direction of traffic"""
+
+    def __init__(self, name):
+        self.name = name
+        self.bucket = None
+        self.protocol_buckets = {}
+        self.histograms = {}
+        self.throttled = set()
+        self.bytes_this_second = 0
+        self.total_bytes = 0
+        self.release_call = None
+
 
 class RateLimiter:
-    """This class ensures that upload and download rates don't exceed specified maximums"""
+    """
+    Keeps upload and download rates under the specified maximums with token buckets
+
+    Every registered protocol gets a share of each limit in proportion to its weight. When a limit is
+    used up only the protocols that went over their share are paused, so slow peers keep going, and
+    while there are spare tokens a protocol may use more than its share so the link isn't left idle.
+    Paused protocols are resumed when the limit's bucket is paid back, or when their own is
+    """
 
     #implements(IRateLimiter)
 
     #called by main application
 
-    def __init__(self, max_dl_bytes=None, max_ul_bytes=None):
+    def __init__(self, max_dl_bytes=None, max_ul_bytes=None, burst=1.0, clock=None):
+        """
+        max_dl_bytes, max_ul_bytes - bytes per second, None for no limit
+        burst - seconds worth of traffic allowed through at once after being idle
+        """
+        self._clock = clock
+        self.burst = burst
         self.max_dl_bytes = max_dl_bytes
         self.max_ul_bytes = max_ul_bytes
-        self.dl_bytes_this_interval = 0
-        self.ul_bytes_this_interval = 0
-        self.total_dl_bytes = 0
-        self.total_ul_bytes = 0
-        self.tick_call = None
-        self.tick_interval = 0.1
-
-        self.dl_throttled = False
-        self.ul_throttled = False
-
-        self.protocols = []
+        self._dl = _Direction('download')
+        self._ul = _Direction('upload')
+        self.protocols = {}  # {protocol: weight}
+        self._second = None
+        self.running = False
+
+    @property
+    def clock(self):
+        if self._clock is None:
+            # imported here so the reactor is not installed by constructing a rate limiter
+            from twisted.internet import reactor
+            self._clock = reactor
+        return self._clock
 
     def start(self):
         log.info("Starting rate limiter.")
-        self.tick_call = task.LoopingCall(self.tick)
-        self.tick_call.start(self.tick_interval)
-
-    def tick(self):
-        self.dl_bytes_this_interval = 0
-        self.ul_bytes_this_interval = 0
-        self.unthrottle_dl()
-        self.unthrottle_ul()
+        self.running = True
+        self._update_buckets()
 
     def stop(self):
         log.info("Stopping rate limiter.")
-        if self.tick_call is not None:
-            self.tick_call.stop()
-            self.tick_call = None
+        self.running = False
+        for direction in (self._dl, self._ul):
+            self._release(direction, everyone=True)
 
     def set_dl_limit(self, limit):
         self.max_dl_bytes = limit
+        self._update_buckets()
 
     def set_ul_limit(self, limit):
         self.max_ul_bytes = limit
-
-    #throttling
-
-    def check_dl(self):
-        need_throttle = (self.max_dl_bytes is not None and
-                         self.dl_bytes_this_interval > self.max_dl_bytes * self.tick_interval)
-        if need_throttle:
-            from twisted.internet import reactor
-            reactor.callLater(0, self.throttle_dl)
-
-    def check_ul(self):
-        need_throttle = (self.max_ul_bytes is not None and
-                         self.ul_bytes_this_interval > self.max_ul_bytes * self.tick_interval)
-        if need_throttle:
-            from twisted.internet import reactor
-            reactor.callLater(0, self.throttle_ul)
-
-    def throttle_dl(self):
-        if self.dl_throttled is False:
+        self._update_buckets()
+
+    @property
+    def total_dl_bytes(self):
+        return self._dl.total_bytes
+
+    @property
+    def total_ul_bytes(self):
+        return self._ul.total_bytes
+
+    @property
+    def dl_bytes_this_second(self):
+        self._roll_second()
+        return self._dl.bytes_this_second
+
+    @property
+    def ul_bytes_this_second(self):
+        self._roll_second()
+        return self._ul.bytes_this_second
+
+    def _get_limit(self, direction):
+        return self.max_dl_bytes if direction is self._dl else self.max_ul_bytes
+
+    def _get_share(self, direction, protocol):
+        return self._get_limit(direction) * self.protocols[protocol] / sum(self.protocols.values())
+
+    def _update_buckets(self):
+        now = self.clock.seconds()
+        for direction in (self._dl, self._ul):
+            limit = self._get_limit(direction)
+            if not limit:
+                direction.bucket = None
+                direction.protocol_buckets.clear()
+                self._release(direction, everyone=True)
+                continue
+            if direction.bucket is None:
+                direction.bucket = TokenBucket(limit, self.burst, now)
+            else:
+                direction.bucket.set_rate(limit, now)
             for protocol in self.protocols:
-                protocol.throttle_download()
-            self.dl_throttled = True
+                share = self._get_share(direction, protocol)
+                if protocol in direction.protocol_buckets:
+                    direction.protocol_buckets[protocol].set_rate(share, now)
+                else:
+                    direction.protocol_buckets[protocol] = TokenBucket(share, self.burst, now)
 
-    def throttle_ul(self):
-        if self.ul_throttled is False:
-            for protocol in self.protocols:
-                protocol.throttle_upload()
-            self.ul_throttled = True
-
-    def unthrottle_dl(self):
-        if self.dl_throttled is True:
-            for protocol in self.protocols:
-                protocol.unthrottle_download()
-            self.dl_throttled = False
+    #throttling
 
-    def unthrottle_ul(self):
-        if self.ul_throttled is True:
-            for protocol in self.protocols:
-                protocol.unthrottle_upload()
-            self.ul_throttled = False
+    def _roll_second(self):
+        second = int(self.clock.seconds())
+        if second != self._second:
+            self._second = second
+            self._dl.bytes_this_second = 0
+            self._ul.bytes_this_second = 0
+
+    def _report(self, direction, num_bytes, protocol):
+        now = self.clock.seconds()
+        self._roll_second()
+        direction.bytes_this_second += num_bytes
+        direction.total_bytes += num_bytes
+        if protocol in self.protocols:
+            peer = getattr(protocol, 'peer', None)
+            if peer is not None:
+                if peer not in direction.histograms:
+                    direction.histograms[peer] = ThroughputHistogram(now)
+                direction.histograms[peer].add(num_bytes, now)
+        if not self.running or direction.bucket is None:
+            return
+        direction.bucket.take(num_bytes, now)
+        protocol_bucket = direction.protocol_buckets.get(protocol)
+        if protocol_bucket is not None:
+            protocol_bucket.take(num_bytes, now)
+        if not direction.bucket.in_debt():
+            return
+        if protocol_bucket is None or protocol_bucket.in_debt():
+            self._throttle(direction, protocol)
+        if direction.bucket.tokens < -direction.bucket.rate * self.burst:
+            # the protocols within their share are using more than the limit between them
+            for p in list(self.protocols):
+                self._throttle(direction, p)
+        if direction.release_call is None:
+            direction.release_call = self.clock.callLater(direction.bucket.time_until_paid(), self._release,
+                                                          direction)
+
+    def _throttle(self, direction, protocol):
+        if protocol not in self.protocols or protocol in direction.throttled:
+            return
+        direction.throttled.add(protocol)
+        if direction is self._dl:
+            protocol.throttle_download()
+        else:
+            protocol.throttle_upload()
+
+    def _unthrottle(self, direction, protocol):
+        direction.throttled.discard(protocol)
+        if direction is self._dl:
+            protocol.unthrottle_download()
+        else:
+            protocol.unthrottle_upload()
+
+    def _release(self, direction, everyone=False):
+        if direction.release_call is not None and direction.release_call.active():
+            direction.release_call.cancel()
+        direction.release_call = None
+        now = self.clock.seconds()
+        if not everyone and direction.bucket is not None:
+            direction.bucket.refill(now)
+            if direction.bucket.in_debt():
+                direction.release_call = self.clock.callLater(direction.bucket.time_until_paid(), self._release,
+                                                              direction)
+                return
+        # once the limit has tokens to spare everyone may use them, whether or not they are over their share
+        for protocol in list(direction.throttled):
+            self._unthrottle(direction, protocol)
 
     #called by protocols
 
-    def report_dl_bytes(self, num_bytes):
-        self.dl_bytes_this_interval += num_bytes
-        self.total_dl_bytes += num_bytes
-        self.check_dl()
+    def report_dl_bytes(self, num_bytes, protocol=None):
+        self._report(self._dl, num_bytes, protocol)
 
-    def report_ul_bytes(self, num_bytes):
-        self.ul_bytes_this_interval += num_bytes
-        self.total_ul_bytes += num_bytes
-        self.check_ul()
+    def report_ul_bytes(self, num_bytes, protocol=None):
+        self._report(self._ul, num_bytes, protocol)
 
-    def register_protocol(self, protocol):
+    def register_protocol(self, protocol, weight=1.0):
         if protocol not in self.protocols:
-            self.protocols.append(protocol)
-            if self.dl_throttled is True:
-                protocol.throttle_download()
-            if self.ul_throttled is True:
-                protocol.throttle_upload()
+            self.protocols[protocol] = weight
+            self._update_buckets()
 
     def unregister_protocol(self, protocol):
         if protocol in self.protocols:
-            self.protocols.remove(protocol)
+            del self.protocols[protocol]
+            peer = getattr(protocol, 'peer', None)
+            peer_connected = any(getattr(p, 'peer', None) == peer for p in self.protocols)
+            for direction in (self._dl, self._ul):
+                direction.protocol_buckets.pop(protocol, None)
+                direction.throttled.discard(protocol)
+                if not peer_connected:
+                    direction.histograms.pop(peer, None)
+            self._update_buckets()
+
+    def get_stats(self):
+        now = self.clock.seconds()
+        stats = {}
+        for direction in (self._dl, self._ul):
+            stats[direction.name] = {
+                'limit': self._get_limit(direction),
+                'total_bytes': direction.total_bytes,
+                'throttled_protocols': len(direction.throttled),
+                'peers': {
+                    '%s:%i' % (peer.host, peer.port): histogram.get_stats(now)
+                    for peer, histogram in direction.histograms.items()
+                }
+            }
+        return stats
@@ -54,6 +54,11 @@ class SingleBlobDownloadManager:
         else:
             return [self.blob]
 
+    blobs_to_download = needed_blobs
+
+    def blob_downloaded(self, blob):
+        pass
+
     def get_head_blob_hash(self):
         return self.blob.blob_hash
 
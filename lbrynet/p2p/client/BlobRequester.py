@@ -10,6 +10,7 @@ from lbrynet.p2p.Error import ConnectionClosedBeforeResponseError
 from lbrynet.p2p.Error import InvalidResponseError, RequestCanceledError, NoResponseError
 from lbrynet.p2p.Error import PriceDisagreementError, DownloadCanceledError, InsufficientFundsError
 from lbrynet.p2p.client.ClientRequest import ClientRequest, ClientBlobRequest
+from lbrynet.p2p.FetchScheduler import FetchScheduler
 from lbrynet.p2p.Offer import Offer
 
 
@@ -40,7 +41,7 @@ def cache(fn):
 class BlobRequester:
     #implements(IRequestCreator)
 
-    def __init__(self, blob_manager, peer_finder, payment_rate_manager, wallet, download_manager):
+    def __init__(self, blob_manager, peer_finder, payment_rate_manager, wallet, download_manager, scheduler=None):
         self.blob_manager = blob_manager
         self.peer_finder = peer_finder
         self.payment_rate_manager = payment_rate_manager
@@ -55,6 +56,8 @@ class BlobRequester:
         self._protocol_tries = {}
         self._maxed_out_peers = []
         self._incompatible_peers = []
+        # shared with the mirror downloader of the stream, if there is one
+        self.scheduler = scheduler or FetchScheduler()
 
     ######## IRequestCreator #########
     def send_next_request(self, peer, protocol):
@@ -91,6 +94,10 @@ class BlobRequester:
 
     def _send_next_request(self, peer, protocol):
         log.debug('Sending a blob request for %s and %s', peer, protocol)
+        negotiated_rate = getattr(protocol, 'negotiated_rate', None)
+        if protocol not in self._protocol_prices and negotiated_rate is not None:
+            # another downloader sharing the connection already agreed on a rate with the peer
+            self._protocol_prices[protocol] = negotiated_rate
         availability = AvailabilityRequest(self, peer, protocol, self.payment_rate_manager)
         head_blob_hash = self._download_manager.get_head_blob_hash()
         download = DownloadRequest(self, peer, protocol, self.payment_rate_manager,
@@ -175,12 +182,14 @@ class BlobRequester:
         return False
 
     def _blobs_to_download(self):
-        needed_blobs = self._download_manager.needed_blobs()
-        return sorted(needed_blobs, key=lambda b: b.is_downloading())
+        # the download manager orders the blobs by urgency, the sort is stable so blobs nobody is
+        # downloading yet are tried first without losing that order
+        blobs_to_download = self._download_manager.blobs_to_download()
+        return sorted(blobs_to_download, key=lambda b: b.is_downloading())
 
     def _blobs_without_sources(self):
         return [
-            b for b in self._download_manager.needed_blobs()
+            b for b in self._download_manager.blobs_to_download()
             if not self._hash_available(b.blob_hash)
         ]
 
@@ -414,6 +423,7 @@ class PriceRequest(RequestHelper):
         if offer.is_accepted:
             log.info("Offered rate %f/mb accepted by %s", offer.rate, self.peer.host)
             self.protocol_prices[self.protocol] = offer.rate
+            self.protocol.negotiated_rate = offer.rate
             return True
         elif offer.is_too_low:
             log.debug("Offered rate %f/mb rejected by %s", offer.rate, self.peer.host)
@@ -465,16 +475,32 @@ class DownloadRequest(RequestHelper):
 
     def find_blob(self, to_download):
         """Return the first blob in `to_download` that is successfully opened for write."""
+        source = self.requestor.scheduler.get_source(self.peer)
         for blob in to_download:
             if blob.get_is_verified():
                 log.debug('Skipping blob %s as its already validated', blob)
                 continue
+            if not self.requestor.scheduler.should_download(source, blob):
+                log.debug('Leaving blob %s to the source that is already downloading it', blob)
+                continue
             writer, d = blob.open_for_writing(self.peer)
             if d is not None:
+                self.requestor.scheduler.download_started(source, blob)
+                d.addCallbacks(self._scheduled_download_succeeded, self._scheduled_download_failed,
+                               callbackArgs=(source, blob), errbackArgs=(source, blob))
                 return BlobDownloadDetails(blob, d, writer.write, writer.close, self.peer)
             log.warning('Skipping blob %s as there was an issue opening it for writing', blob)
         return None
 
+    def _scheduled_download_succeeded(self, arg, source, blob):
+        self.requestor.scheduler.download_finished(source, blob, blob.get_length())
+        return arg
+
+    def _scheduled_download_failed(self, reason, source, blob):
+        failed = not reason.check(DownloadCanceledError, PriceDisagreementError, RequestCanceledError)
+        self.requestor.scheduler.download_finished(source, blob, failed=failed)
+        return reason
+
     def _make_request(self, blob_details):
         blob = blob_details.blob
         request = ClientBlobRequest(
@@ -567,6 +593,7 @@ class DownloadRequest(RequestHelper):
         self.peer.update_score(5.0)
         should_announce = blob.blob_hash == self.head_blob_hash
         d = self.requestor.blob_manager.blob_completed(blob, should_announce=should_announce)
+        d.addCallback(lambda _: self.requestor._download_manager.blob_downloaded(blob))
         d.addCallback(lambda _: arg)
         return d
 
@@ -37,16 +37,20 @@ class ClientProtocol(Protocol, TimeoutMixin):
         self._next_request = {}
         self.connection_closed = False
         self.connection_closing = False
+        # the data rate the peer accepted on this connection, connections are shared by downloaders
+        # so the ones after the first don't have to negotiate it again
+        self.negotiated_rate = None
         # This needs to be set for TimeoutMixin
         self.callLater = utils.call_later
         self.peer.report_up()
+        self._rate_limiter.register_protocol(self)
 
         self._ask_for_request()
 
     def dataReceived(self, data):
         log.debug("Received %d bytes from %s", len(data), self.peer)
         self.setTimeout(None)
-        self._rate_limiter.report_dl_bytes(len(data))
+        self._rate_limiter.report_dl_bytes(len(data), self)
 
         if self._downloading_blob is True:
             self._blob_download_request.write(data)
@@ -71,6 +75,7 @@ class ClientProtocol(Protocol, TimeoutMixin):
     def connectionLost(self, reason=None):
         log.debug("Connection lost to %s: %s", self.peer, reason)
         self.setTimeout(None)
+        self._rate_limiter.unregister_protocol(self)
         self.connection_closed = True
         if reason is None or reason.check(error.ConnectionDone):
             err = failure.Failure(ConnectionClosedBeforeResponseError())
@@ -9,10 +9,156 @@ log = logging.getLogger(__name__)
 
 
 class PeerConnectionHandler:
-    def __init__(self, request_creators, factory):
+    def __init__(self, request_creators, pooled_connection):
         self.request_creators = request_creators
-        self.factory = factory
+        self.pooled_connection = pooled_connection
+
+    @property
+    def factory(self):
+        return self.pooled_connection.factory
+
+    @property
+    def connection(self):
+        return self.pooled_connection.connection
+
+
+class PooledConnection:
+    """
+    A connection to a peer that is shared by every ConnectionManager downloading from that peer
+
+    The protocol asks for its next request here, and the attached connection managers are asked in turn.
+    A connection manager without anything to send is detached. When no attached manager has a request the
+    connection is kept open and idle, so a downloader attaching later skips the handshake and price
+    negotiation, until it is reaped after the pool's idle timeout
+    """
+
+    def __init__(self, pool, peer, rate_limiter):
+        self.pool = pool
+        self.peer = peer
+        self.factory = ClientProtocolFactory(peer, rate_limiter, self)
+        self.factory.connection_was_made_deferred.addCallback(self._connection_lost)
         self.connection = None
+        self.managers = []
+        self.active_manager = None
+        self._idle_deferred = None
+        self._reap_call = None
+
+    def connect(self):
+        self.connection = reactor.connectTCP(self.peer.host, self.peer.port, self.factory,
+                                             timeout=ConnectionManager.TCP_CONNECT_TIMEOUT)
+
+    def attach(self, manager):
+        if manager not in self.managers:
+            self.managers.append(manager)
+        self._wake(True)
+
+    def detach(self, manager):
+        """
+        Stop sending requests from a connection manager. The manager is told the peer disconnected once it
+        is detached. If one of its requests is in flight it is detached when the request finishes, unless
+        no other manager is using the connection, then the connection is closed
+        """
+        if manager not in self.managers:
+            if manager is not self.active_manager:
+                manager._peer_disconnected(True, self.peer)
+            return
+        if manager is self.active_manager:
+            self.managers.remove(manager)
+            if not self.managers:
+                log.debug("Abruptly closing a connection to %s due to downloading being paused", self.peer)
+                self.close()
+            return
+        self.managers.remove(manager)
+        manager._peer_disconnected(True, self.peer)
+        if not self.managers and self.factory.p is None:
+            # nobody wants the connection anymore and it isn't made yet
+            self.connection.disconnect()
+
+    def close(self):
+        if self.factory.p is not None:
+            d = self.factory.p.cancel_requests()
+        else:
+            d = defer.succeed(True)
+        d.addBoth(lambda _: self.connection.disconnect())
+        return d
+
+    @defer.inlineCallbacks
+    def get_next_request(self, peer, protocol):
+        # the previous request is done, whoever sent it can be detached without closing the connection
+        finished, self.active_manager = self.active_manager, None
+        if finished is not None and finished not in self.managers:
+            finished._peer_disconnected(True, peer)
+        while True:
+            for manager in list(self.managers):
+                have_request = yield manager.get_next_request(peer, protocol)
+                if have_request:
+                    # move to the back of the line so the attached managers take turns
+                    if manager in self.managers:
+                        self.managers.remove(manager)
+                        self.managers.append(manager)
+                    self.active_manager = manager
+                    defer.returnValue(True)
+                if manager in self.managers:
+                    self.managers.remove(manager)
+                    manager._peer_disconnected(True, peer)
+            log.debug("Keeping the idle connection to %s open", peer)
+            self._idle_deferred = defer.Deferred()
+            self._reap_call = utils.call_later(self.pool.idle_timeout, self._wake, False)
+            keep_open = yield self._idle_deferred
+            if not keep_open:
+                log.debug("Closing the idle connection to %s", peer)
+                defer.returnValue(False)
+
+    def _wake(self, keep_open):
+        if self._reap_call is not None and self._reap_call.active():
+            self._reap_call.cancel()
+        self._reap_call = None
+        if self._idle_deferred is not None:
+            d, self._idle_deferred = self._idle_deferred, None
+            d.callback(keep_open)
+
+    def _connection_lost(self, connection_was_made):
+        self.pool.remove(self)
+        if self._reap_call is not None and self._reap_call.active():
+            self._reap_call.cancel()
+        self._reap_call = None
+        self._idle_deferred = None
+        managers, self.managers = self.managers, []
+        if self.active_manager is not None and self.active_manager not in managers:
+            # detached while its request was in flight
+            managers.append(self.active_manager)
+        self.active_manager = None
+        for manager in managers:
+            manager._peer_disconnected(connection_was_made, self.peer)
+        return connection_was_made
+
+
+class PeerConnectionPool:
+    """Process wide pool of PooledConnections, keyed by peer"""
+
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self.connections = {}  # {Peer: PooledConnection}
+
+    def get_connection(self, peer, rate_limiter):
+        if peer not in self.connections:
+            self.connections[peer] = PooledConnection(self, peer, rate_limiter)
+            self.connections[peer].connect()
+        return self.connections[peer]
+
+    def remove(self, connection):
+        if self.connections.get(connection.peer) is connection:
+            del self.connections[connection.peer]
+
+
+_connection_pool = None
+
+
+def get_connection_pool():
+    global _connection_pool
+    if _connection_pool is None:
+        _connection_pool = PeerConnectionPool(conf.settings['peer_connection_idle_timeout'])
+    return _connection_pool
 
 
 class ConnectionManager:
@@ -21,13 +167,14 @@ class ConnectionManager:
     TCP_CONNECT_TIMEOUT = 15
 
     def __init__(self, downloader, rate_limiter,
-                 primary_request_creators, secondary_request_creators):
+                 primary_request_creators, secondary_request_creators, connection_pool=None):
 
         self.seek_head_blob_first = conf.settings['seek_head_blob_first']
         self.max_connections_per_stream = conf.settings['max_connections_per_stream']
 
         self.downloader = downloader
         self.rate_limiter = rate_limiter
+        self.connection_pool = connection_pool or get_connection_pool()
         self._primary_request_creators = primary_request_creators
         self._secondary_request_creators = secondary_request_creators
         self._peer_connections = {}  # {Peer: PeerConnectionHandler}
@@ -77,26 +224,13 @@ class ConnectionManager:
         return len(self._peer_connections)
 
     def _close_peers(self):
-        def disconnect_peer(p):
+        def release_peer(p):
             d = defer.Deferred()
             self._connections_closing[p] = d
-            self._peer_connections[p].connection.disconnect()
-            if p in self._peer_connections:
-                del self._peer_connections[p]
-            return d
-
-        def close_connection(p):
-            log.debug("%s Abruptly closing a connection to %s due to downloading being paused",
-                        self._get_log_name(), p)
-            if self._peer_connections[p].factory.p is not None:
-                d = self._peer_connections[p].factory.p.cancel_requests()
-            else:
-                d = defer.succeed(True)
-            d.addBoth(lambda _: disconnect_peer(p))
+            self._peer_connections[p].pooled_connection.detach(self)
             return d
 
-        # fixme: stop modifying dict during iteration
-        closing_deferreds = [close_connection(peer) for peer in list(self._peer_connections)]
+        closing_deferreds = [release_peer(peer) for peer in list(self._peer_connections)]
         return defer.DeferredList(closing_deferreds)
 
     @defer.inlineCallbacks
@@ -205,14 +339,10 @@ class ConnectionManager:
             return
 
         log.debug("%s Trying to connect to %s", self._get_log_name(), peer)
-        factory = ClientProtocolFactory(peer, self.rate_limiter, self)
-        factory.connection_was_made_deferred.addCallback(
-                lambda c_was_made: self._peer_disconnected(c_was_made, peer))
+        pooled_connection = self.connection_pool.get_connection(peer, self.rate_limiter)
         self._peer_connections[peer] = PeerConnectionHandler(self._primary_request_creators[:],
-                                                             factory)
-        connection = reactor.connectTCP(peer.host, peer.port, factory,
-                                        timeout=self.TCP_CONNECT_TIMEOUT)
-        self._peer_connections[peer].connection = connection
+                                                             pooled_connection)
+        pooled_connection.attach(self)
 
     def _peer_disconnected(self, connection_was_made, peer):
         log.debug("%s protocol disconnected for %s",
@@ -54,6 +54,12 @@ class DownloadManager:
     def needed_blobs(self):
         return self.progress_manager.needed_blobs()
 
+    def blobs_to_download(self):
+        return self.progress_manager.blobs_to_download()
+
+    def blob_downloaded(self, blob):
+        self.progress_manager.blob_downloaded(blob)
+
     def final_blob_num(self):
         return self.blob_info_finder.final_blob_num()
 
@@ -72,6 +72,12 @@ class SingleProgressManager:
         assert len(blobs) == 1
         return [b for b in blobs.values() if not b.get_is_verified()]
 
+    blobs_to_download = needed_blobs
+
+    def blob_downloaded(self, blob):
+        if self.checker.running:
+            self._check_if_finished()
+
 
 class DummyBlobHandler:
     def __init__(self):
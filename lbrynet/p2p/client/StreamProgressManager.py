@@ -4,10 +4,14 @@ from twisted.internet import defer, task
 
 log = logging.getLogger(__name__)
 
+# number of blobs past the output position that are requested at once
+DEFAULT_READ_AHEAD_BLOBS = 10
+
 
 class FullStreamProgressManager:
     def __init__(self, finished_callback, blob_manager, download_manager,
-                 delete_blob_after_finished: bool = False, reactor: task.Clock = None):
+                 delete_blob_after_finished: bool = False, reactor: task.Clock = None,
+                 read_ahead: int = DEFAULT_READ_AHEAD_BLOBS):
         if not reactor:
             from twisted.internet import reactor
         self.reactor = reactor
@@ -15,7 +19,8 @@ class FullStreamProgressManager:
         self.blob_manager = blob_manager
         self.delete_blob_after_finished = delete_blob_after_finished
         self.download_manager = download_manager
-        self.provided_blob_nums = []
+        self.read_ahead = read_ahead
+        self.provided_blob_nums = set()
         self.last_blob_outputted = -1
         self.stopped = True
         self._next_try_to_output_call = None
@@ -34,9 +39,13 @@ class FullStreamProgressManager:
         self._next_try_to_output_call = None
         return self._stop_outputting()
 
-    # def blob_downloaded(self, blob, blob_num):
-    #     if self.outputting_d is None:
-    #         self._output_loop()
+    def blob_downloaded(self, blob):
+        """
+        Called when a blob finishes downloading, so it is output right away instead of at the next
+        periodic try
+        """
+        if not self.stopped and self.outputting_d is None:
+            self._output_loop()
 
     def stream_position(self):
         blobs = self.download_manager.blobs
@@ -48,12 +57,34 @@ class FullStreamProgressManager:
                     return i
             return max(blobs.keys()) + 1
 
+    def _priority(self, blob_num):
+        # nothing can be output without the head blob, after it the blob at the output position
+        # is the one holding up the stream
+        return blob_num != 0, blob_num != self.last_blob_outputted + 1, blob_num
+
+    def _needed_blob_nums(self):
+        blobs = self.download_manager.blobs
+        return sorted(
+            (n for n, b in blobs.items() if not b.get_is_verified() and n not in self.provided_blob_nums),
+            key=self._priority
+        )
+
     def needed_blobs(self):
+        """
+        All of the blobs still needed, most urgent first
+        """
+        blobs = self.download_manager.blobs
+        return [blobs[n] for n in self._needed_blob_nums()]
+
+    def blobs_to_download(self):
+        """
+        The needed blobs within `read_ahead` blobs of the output position, most urgent first, so
+        the connected peers work on the blobs that will be output next
+        """
         blobs = self.download_manager.blobs
-        return [
-            b for n, b in blobs.items()
-            if not b.get_is_verified() and not n in self.provided_blob_nums
-        ]
+        # the head blob is always requested, it doesn't take up a place in the window
+        window_end = max(self.last_blob_outputted + 1, 1) + self.read_ahead
+        return [blobs[n] for n in self._needed_blob_nums() if n == 0 or n < window_end]
 
     def _finished_outputting(self):
         self.finished_callback(True)
@@ -94,6 +125,10 @@ class FullStreamProgressManager:
                 )
         )
 
+    def _can_output(self, blob_num: int) -> bool:
+        blobs = self.download_manager.blobs
+        return blob_num in blobs and blobs[blob_num].get_is_verified()
+
     def _output_loop(self):
         if self.stopped:
             if self.outputting_d is not None:
@@ -114,14 +149,18 @@ class FullStreamProgressManager:
                 self._finished_outputting()
                 self.outputting_d.callback(True)
                 self.outputting_d = None
-            else:
+            elif self._can_output(self.last_blob_outputted + 1):
                 self.reactor.callLater(0, self._output_loop)
+            else:
+                # wait for blob_downloaded to be called with the next blob
+                self.outputting_d.callback(True)
+                self.outputting_d = None
 
         current_blob_num = self.last_blob_outputted + 1
 
-        if current_blob_num in blobs and blobs[current_blob_num].get_is_verified():
+        if self._can_output(current_blob_num):
             log.debug("Outputting blob %s", str(self.last_blob_outputted + 1))
-            self.provided_blob_nums.append(self.last_blob_outputted + 1)
+            self.provided_blob_nums.add(self.last_blob_outputted + 1)
             d = self.download_manager.handle_blob(self.last_blob_outputted + 1)
             d.addCallback(lambda _: finished_outputting_blob())
             d.addCallback(lambda _: self._finished_with_blob(current_blob_num))
@@ -0,0 +1,136 @@
+import os
+import mmap
+import logging
+from twisted.internet import defer
+
+
+log = logging.getLogger(__name__)
+
+
+class BlobFileSender:
+    """
+    A pull producer that sends a blob file straight to a transport, bypassing the response
+    buffer of the ServerRequestHandler.
+
+    Where the platform has os.sendfile and the transport exposes its socket, the kernel copies
+    the file to the socket without it passing through python. Otherwise (or if sendfile fails)
+    a memory mapped view of the file is written to the transport one chunk at a time.
+
+    sendfile is only used once the transport has told us its write buffer is drained, so data
+    written through the transport before the transfer can never be reordered with the blob.
+    """
+    #implements(interfaces.IPullProducer)
+
+    CHUNK_SIZE = 2 ** 16
+
+    def __init__(self, read_handle, length, transport, bytes_sent_cb=None):
+        self.read_handle = read_handle
+        self.length = length
+        self.transport = transport
+        self.bytes_sent_cb = bytes_sent_cb
+        self.offset = 0
+        self.deferred = None
+        self.paused = False
+        self._drained = False
+        self._registering = False
+        self._mmap = None
+        self._socket = None
+        if hasattr(os, 'sendfile') and hasattr(transport, 'getHandle'):
+            self._socket = transport.getHandle()
+
+    @property
+    def using_sendfile(self):
+        return self._socket is not None
+
+    def begin_transfer(self):
+        """
+        Start sending the file, returns a deferred that fires when all of it has been sent
+        """
+        self.deferred = defer.Deferred()
+        if not self.length:
+            self._finished()
+            return self.deferred
+        self._mmap = mmap.mmap(self.read_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        # registering a pull producer calls resumeProducing right away, there may still be
+        # buffered data in the transport at that point
+        self._registering = True
+        self.transport.registerProducer(self, False)
+        self._registering = False
+        return self.deferred
+
+    def pause(self):
+        self.paused = True
+
+    def unpause(self):
+        self.paused = False
+        if self._drained and self.deferred is not None:
+            self._send()
+
+    ######### IPullProducer #########
+
+    def resumeProducing(self):
+        self._drained = not self._registering
+        if not self.paused:
+            self._send()
+
+    def stopProducing(self):
+        if self.deferred is not None:
+            d, self.deferred = self.deferred, None
+            self._close()
+            d.errback(Exception("Consumer asked us to stop producing"))
+
+    ######### internal #########
+
+    def _send(self):
+        if self.deferred is None:
+            return
+        if self._drained and self.using_sendfile:
+            self._sendfile()
+        if self.paused or self.deferred is None:
+            return
+        if self.offset < self.length:
+            self._write_chunk()
+        if self.offset == self.length:
+            self._finished()
+
+    def _sendfile(self):
+        while self.offset < self.length and not self.paused:
+            try:
+                sent = os.sendfile(self._socket.fileno(), self.read_handle.fileno(), self.offset,
+                                   self.length - self.offset)
+            except BlockingIOError:
+                return
+            except OSError as err:
+                log.warning("sendfile failed (%s), falling back to writing the blob from a memory map", err)
+                self._socket = None
+                return
+            if not sent:
+                log.warning("sendfile stopped short of the end of the blob, falling back to a memory map")
+                self._socket = None
+                return
+            self._bytes_sent(sent)
+
+    def _write_chunk(self):
+        # this leaves data in the transport write buffer, resumeProducing will be called once
+        # it has been drained
+        chunk = self._mmap[self.offset:self.offset + self.CHUNK_SIZE]
+        self._drained = False
+        self.transport.write(chunk)
+        self._bytes_sent(len(chunk))
+
+    def _bytes_sent(self, count):
+        self.offset += count
+        if self.bytes_sent_cb is not None:
+            self.bytes_sent_cb(count)
+
+    def _finished(self):
+        d, self.deferred = self.deferred, None
+        self._close()
+        if self.length:
+            self.transport.unregisterProducer()
+        d.callback(self.offset)
+
+    def _close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
@@ -97,6 +97,8 @@ class BlobRequestHandler:
     def _reply_to_availability(self, request, blobs):
         available_blobs = self._get_available_blobs(blobs)
         log.debug("available blobs: %s", str(available_blobs))
+        for blob_hash in available_blobs:
+            self.blob_manager.record_blob_request(blob_hash)
         request.update({'available_blobs': available_blobs})
         return request
 
@@ -142,6 +144,7 @@ class BlobRequestHandler:
                 self.currently_uploading = blob
                 self.read_handle = read_handle
                 log.info("Sending %s to %s", str(blob), self.peer)
+                self.blob_manager.record_blob_request(blob.blob_hash)
                 response_fields['blob_hash'] = blob.blob_hash
                 response_fields['length'] = blob.length
                 response['incoming_blob'] = response_fields
@@ -179,20 +182,25 @@ class BlobRequestHandler:
             inner_d.addBoth(set_not_uploading)
             return inner_d
 
-        def count_bytes(data):
-            uploaded = len(data)
+        def count_bytes(uploaded):
             self.blob_bytes_uploaded += uploaded
             self.peer.update_stats('blob_bytes_uploaded', uploaded)
             if self.analytics_manager is not None:
                 self.analytics_manager.add_observation(analytics.BLOB_BYTES_UPLOADED, uploaded)
+
+        def count_data(data):
+            count_bytes(len(data))
             return data
 
         def start_transfer():
-            self.file_sender = FileSender()
             log.debug("Starting the file upload")
             assert self.read_handle is not None, \
                 "self.read_handle was None when trying to start the transfer"
-            d = self.file_sender.beginFileTransfer(self.read_handle, consumer, count_bytes)
+            if hasattr(consumer, 'can_send_blob_file') and consumer.can_send_blob_file():
+                # stream the blob file straight to the socket rather than through the consumer
+                return consumer.send_blob_file(self.read_handle, self.currently_uploading.length, count_bytes)
+            self.file_sender = FileSender()
+            d = self.file_sender.beginFileTransfer(self.read_handle, consumer, count_data)
             return d
 
         def set_expected_payment():
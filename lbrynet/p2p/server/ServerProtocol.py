@@ -47,7 +47,7 @@ class ServerProtocol(Protocol):
 
     def dataReceived(self, data):
         log.debug("Receiving %s bytes of data from the transport", str(len(data)))
-        self.factory.rate_limiter.report_dl_bytes(len(data))
+        self.factory.rate_limiter.report_dl_bytes(len(data), self)
         if self.request_handler is not None:
             self.request_handler.data_received(data)
 
@@ -64,7 +64,10 @@ class ServerProtocol(Protocol):
     def write(self, data):
         log.trace("Writing %s bytes of data to the transport", len(data))
         self.transport.write(data)
-        self.factory.rate_limiter.report_ul_bytes(len(data))
+        self.report_ul_bytes(len(data))
+
+    def report_ul_bytes(self, num_bytes):
+        self.factory.rate_limiter.report_ul_bytes(num_bytes, self)
 
     #Rate limiter stuff
 
@@ -1,6 +1,7 @@
 import json
 import logging
 from twisted.internet import defer
+from lbrynet.p2p.server.BlobFileSender import BlobFileSender
 
 
 log = logging.getLogger(__name__)
@@ -23,17 +24,23 @@ class ServerRequestHandler:
         self.CHUNK_SIZE = 2**14
         self.query_handlers = {}  # {IQueryHandler: [query_identifiers]}
         self.blob_sender = None
+        self.blob_file_sender = None
         self.consumer.registerProducer(self, True)
 
     #IPushProducer stuff
 
     def pauseProducing(self):
         self.production_paused = True
+        if self.blob_file_sender is not None:
+            self.blob_file_sender.pause()
 
     def stopProducing(self):
         if self.producer is not None:
             self.producer.stopProducing()
             self.producer = None
+        if self.blob_file_sender is not None:
+            self.blob_file_sender.stopProducing()
+            self.blob_file_sender = None
         self.production_paused = True
         self.consumer.unregisterProducer()
 
@@ -45,6 +52,8 @@ class ServerRequestHandler:
         self._produce_more()
         if self.producer is not None:
             reactor.callLater(0, self.producer.resumeProducing)
+        if self.blob_file_sender is not None:
+            self.blob_file_sender.unpause()
 
     def _produce_more(self):
 
@@ -84,6 +93,35 @@ class ServerRequestHandler:
 
         reactor.callLater(0, get_more_data)
 
+    def can_send_blob_file(self):
+        return getattr(self.consumer, 'transport', None) is not None
+
+    def send_blob_file(self, read_handle, length, bytes_sent_cb=None):
+        """
+        Send a blob file directly to the transport instead of through write(), returns a
+        deferred that fires when the whole file has been sent
+        """
+
+        def bytes_sent(count):
+            self.consumer.report_ul_bytes(count)
+            if bytes_sent_cb is not None:
+                bytes_sent_cb(count)
+
+        def finished(result):
+            self.blob_file_sender = None
+            return result
+
+        # anything left in the response buffer has to go out before the blob
+        if self.response_buff:
+            self.consumer.write(self.response_buff)
+            self.response_buff = b''
+        self.blob_file_sender = BlobFileSender(read_handle, length, self.consumer.transport, bytes_sent)
+        if self.production_paused:
+            self.blob_file_sender.pause()
+        d = self.blob_file_sender.begin_transfer()
+        d.addBoth(finished)
+        return d
+
     #From Protocol
 
     def data_received(self, data):
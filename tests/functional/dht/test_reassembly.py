@@ -0,0 +1,108 @@
+from twisted.trial import unittest
+from twisted.internet.task import Clock
+from twisted.internet import defer
+from lbrynet.dht import constants
+from lbrynet.dht.node import Node
+from .mock_transport import listenUDP, resolve
+
+
+def fragment(msg_id, seq_number, total_packets, data):
+    return b''.join((b'\x00', total_packets.to_bytes(2, 'big'), seq_number.to_bytes(2, 'big'), msg_id, b'\x00', data))
+
+
+class ReassemblyTest(unittest.TestCase):
+    udpPort = 9182
+    address = ('127.0.0.2', 9182)
+
+    def setUp(self):
+        self._reactor = Clock()
+        self.node = Node(node_id=b'1' * 48, udpPort=self.udpPort, externalIP="127.0.0.1", listenUDP=listenUDP,
+                         resolve=resolve, clock=self._reactor, callLater=self._reactor.callLater)
+        self.remote_node = Node(node_id=b'2' * 48, udpPort=self.udpPort, externalIP="127.0.0.2", listenUDP=listenUDP,
+                                resolve=resolve, clock=self._reactor, callLater=self._reactor.callLater)
+        self.remote_contact = self.node.contact_manager.make_contact(b'2' * 48, '127.0.0.2', 9182, self.node._protocol)
+        self.node.start_listening()
+        self.remote_node.start_listening()
+        self.buffer = self.node._protocol._partialMessages
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self.node.stop()
+        yield self.remote_node.stop()
+        del self._reactor
+
+    @defer.inlineCallbacks
+    def test_multi_packet_request_and_response(self):
+        args = (b'x' * (self.node._protocol.msgSizeLimit * 3),)
+        d = self.node._protocol.sendRPC(self.remote_contact, b'ping', args)
+        self._reactor.pump([0.1 for _ in range(20)])
+        result = yield d
+        self.assertEqual(b'pong', result)
+        self.assertEqual(0, len(self.remote_node._protocol._partialMessages))
+        self.assertEqual(0, self.remote_node._protocol._partialMessages.total_bytes)
+
+    def test_fragments_are_joined_in_order(self):
+        msg_id = b'a' * 20
+        self.assertIsNone(self.buffer.add(self.address, msg_id, 2, 3, b'c'))
+        self.assertIsNone(self.buffer.add(self.address, msg_id, 0, 3, b'a'))
+        self.assertIsNone(self.buffer.add(self.address, msg_id, 0, 3, b'a'))
+        self.assertEqual(2, self.buffer.total_bytes)
+        self.assertEqual(b'abc', self.buffer.add(self.address, msg_id, 1, 3, b'b'))
+        self.assertNotIn(msg_id, self.buffer)
+        self.assertEqual(0, self.buffer.total_bytes)
+
+    def test_incomplete_message_expires(self):
+        msg_id = b'a' * 20
+        self.node._protocol.datagramReceived(fragment(msg_id, 0, 2, b'a'), self.address)
+        self.assertIn(msg_id, self.buffer)
+        self._reactor.advance(constants.reassemblyTimeout)
+        self.assertNotIn(msg_id, self.buffer)
+        self.assertEqual(0, self.buffer.total_bytes)
+        self.assertEqual(1, self.buffer.get_stats()['expired_messages'])
+
+    def test_message_still_arriving_does_not_expire(self):
+        msg_id = b'a' * 20
+        self.node._protocol.datagramReceived(fragment(msg_id, 0, 3, b'a'), self.address)
+        self._reactor.advance(constants.reassemblyTimeout - 1)
+        self.node._protocol.datagramReceived(fragment(msg_id, 1, 3, b'b'), self.address)
+        self._reactor.advance(constants.reassemblyTimeout - 1)
+        self.assertIn(msg_id, self.buffer)
+        # a repeated fragment isn't progress
+        self.node._protocol.datagramReceived(fragment(msg_id, 1, 3, b'b'), self.address)
+        self._reactor.advance(1)
+        self.assertNotIn(msg_id, self.buffer)
+        self.assertEqual(1, self.buffer.get_stats()['expired_messages'])
+
+    def test_invalid_and_mismatched_fragments_are_dropped(self):
+        msg_id = b'a' * 20
+        self.assertIsNone(self.buffer.add(self.address, msg_id, 3, 3, b'a'))
+        self.assertIsNone(self.buffer.add(self.address, msg_id, 0, constants.reassemblyMaxPackets + 1, b'a'))
+        self.assertNotIn(msg_id, self.buffer)
+        self.assertIsNone(self.buffer.add(self.address, msg_id, 0, 2, b'a'))
+        self.assertIsNone(self.buffer.add(('127.0.0.3', 9182), msg_id, 1, 2, b'b'))
+        self.assertIsNone(self.buffer.add(self.address, msg_id, 1, 3, b'b'))
+        self.assertEqual(4, self.buffer.get_stats()['dropped_fragments'])
+        self.assertEqual(b'ab', self.buffer.add(self.address, msg_id, 1, 2, b'b'))
+
+    def test_per_source_limits(self):
+        self.buffer.max_bytes_per_source = 4
+        self.buffer.max_messages_per_source = 2
+        self.assertIsNone(self.buffer.add(self.address, b'a' * 20, 0, 2, b'aaa'))
+        self.assertIsNone(self.buffer.add(self.address, b'b' * 20, 0, 2, b'bb'))
+        self.assertNotIn(b'b' * 20, self.buffer)
+        self.assertIsNone(self.buffer.add(self.address, b'c' * 20, 0, 2, b'c'))
+        self.assertIsNone(self.buffer.add(self.address, b'd' * 20, 0, 2, b''))
+        self.assertNotIn(b'd' * 20, self.buffer)
+        # other sources have their own share
+        self.assertIsNone(self.buffer.add(('127.0.0.3', 9182), b'e' * 20, 0, 2, b'eee'))
+        self.assertIn(b'e' * 20, self.buffer)
+
+    def test_total_limit_drops_oldest_messages(self):
+        self.buffer.max_bytes = 4
+        self.buffer.add(('127.0.0.3', 9182), b'a' * 20, 0, 2, b'aa')
+        self.buffer.add(('127.0.0.4', 9182), b'b' * 20, 0, 2, b'bb')
+        self.buffer.add(('127.0.0.5', 9182), b'c' * 20, 0, 2, b'c')
+        self.assertNotIn(b'a' * 20, self.buffer)
+        self.assertIn(b'b' * 20, self.buffer)
+        self.assertIn(b'c' * 20, self.buffer)
+        self.assertEqual(3, self.buffer.total_bytes)
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from twisted.internet import defer
+from lbrynet.dht import constants
+from lbrynet.dht.node import Node
+from lbrynet.dht.snapshot import RoutingTableSnapshot
+from lbrynet.utils import generate_id
+from .dht_test_environment import TestKademliaBase
+from .mock_transport import resolve, listenUDP
+
+
+class TestRoutingTableSnapshot(TestKademliaBase):
+    network_size = 20
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.snapshot_path = os.path.join(self.snapshot_dir, 'dht_routing_table.json')
+        yield super().setUp()
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield super().tearDown()
+        shutil.rmtree(self.snapshot_dir)
+
+    @defer.inlineCallbacks
+    def _stop_node_with_snapshot(self):
+        node = self.nodes.pop()
+        node._snapshot = RoutingTableSnapshot(self.snapshot_path)
+        yield self.run_reactor(1, [node.stop()])
+        defer.returnValue(node)
+
+    def _make_restarted_node(self, node):
+        restarted = Node(node_id=node.node_id, udpPort=4444, peerPort=3333, externalIP=node.externalIP,
+                         resolve=resolve, listenUDP=listenUDP, callLater=self.clock.callLater, clock=self.clock,
+                         snapshot_path=self.snapshot_path)
+        self.nodes.append(restarted)
+        return restarted
+
+    def _make_offline_contact(self, address):
+        contact = self._seeds[0].contact_manager.make_contact(generate_id(), address, 4444, None)
+        contact.update_last_replied()
+        return contact
+
+    @defer.inlineCallbacks
+    def test_rejoin_from_snapshot_without_seeds(self):
+        node = yield self._stop_node_with_snapshot()
+        saved = RoutingTableSnapshot(self.snapshot_path).load(self.clock.seconds())
+        self.assertEqual(len(node.contacts), len(saved))
+        self.assertGreaterEqual(len(saved), constants.k)
+        restarted = self._make_restarted_node(node)
+        yield self.run_reactor(constants.rpcTimeout, [restarted.start([])])
+        self.assertGreaterEqual(len(restarted.contacts), constants.k)
+        self.pump_clock(constants.checkRefreshInterval * 2)
+        self.assertTrue(restarted._join_deferred.called)
+        self.verify_all_nodes_are_routable()
+        self.verify_all_nodes_are_pingable()
+
+    @defer.inlineCallbacks
+    def test_fall_back_to_seeds(self):
+        node = yield self._stop_node_with_snapshot()
+        offline = [self._make_offline_contact('10.99.0.%i' % i) for i in range(1, constants.k + 1)]
+        RoutingTableSnapshot(self.snapshot_path).save(offline)
+        restarted = self._make_restarted_node(node)
+        yield self.run_reactor(
+            31, [restarted.start([(seed_name, 4444) for seed_name in sorted(self.seed_dns.keys())])]
+        )
+        self.pump_clock(constants.checkRefreshInterval * 2)
+        self.assertNotIn('10.99.0.1', {contact.address for contact in restarted.contacts})
+        self.verify_all_nodes_are_routable()
+        self.verify_all_nodes_are_pingable()
+
+    def test_stale_contacts_are_not_restored(self):
+        snapshot = RoutingTableSnapshot(self.snapshot_path)
+        contacts = [self._make_offline_contact('10.99.0.%i' % i) for i in range(1, 3)]
+        contacts[0].lastReplied -= constants.routingTableSnapshotMaxAge + 1
+        self.assertEqual(2, snapshot.save(contacts))
+        loaded = snapshot.load(self.clock.seconds())
+        self.assertEqual([(contacts[1].id, '10.99.0.2', 4444, contacts[1].lastReplied, 0)], loaded)
@@ -0,0 +1,96 @@
+from twisted.trial.unittest import TestCase
+from twisted.internet import defer, task
+
+from lbrynet import utils
+from lbrynet.p2p.Peer import Peer
+from lbrynet.p2p.client.ConnectionManager import PeerConnectionPool, PooledConnection
+
+
+class FakeConnectionManager:
+    def __init__(self, requests):
+        self.requests = requests
+        self.disconnected = []
+
+    def get_next_request(self, peer, protocol):
+        if self.requests:
+            self.requests -= 1
+            return defer.succeed(True)
+        return defer.succeed(False)
+
+    def _peer_disconnected(self, connection_was_made, peer):
+        self.disconnected.append(peer)
+
+
+class FakeTransportConnection:
+    def __init__(self):
+        self.disconnected = False
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class PooledConnectionTest(TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.patch(utils, 'call_later', self.clock.callLater)
+        self.peer = Peer('127.0.0.1', 3333)
+        self.pool = PeerConnectionPool(idle_timeout=60)
+        self.connection = PooledConnection(self.pool, self.peer, None)
+        self.connection.connection = FakeTransportConnection()
+        self.pool.connections[self.peer] = self.connection
+
+    def _next_request(self):
+        results = []
+        self.connection.get_next_request(self.peer, None).addCallback(results.append)
+        return results
+
+    def test_managers_take_turns(self):
+        first, second = FakeConnectionManager(2), FakeConnectionManager(1)
+        self.connection.attach(first)
+        self.connection.attach(second)
+        self.assertEqual(self._next_request(), [True])
+        self.assertIs(self.connection.active_manager, first)
+        self.assertEqual(self._next_request(), [True])
+        self.assertIs(self.connection.active_manager, second)
+        self.assertEqual(self._next_request(), [True])
+        self.assertIs(self.connection.active_manager, first)
+        self.assertEqual(self._next_request(), [])
+        self.assertIsNone(self.connection.active_manager)
+        self.assertEqual(self.connection.managers, [])
+        self.assertEqual((first.disconnected, second.disconnected), ([self.peer], [self.peer]))
+
+    def test_idle_connection_is_reused_then_reaped(self):
+        results = self._next_request()
+        self.assertEqual(results, [])
+        manager = FakeConnectionManager(1)
+        self.connection.attach(manager)
+        self.assertEqual(results, [True])
+        results = self._next_request()
+        self.assertEqual(manager.disconnected, [self.peer])
+        self.clock.advance(59)
+        self.assertEqual(results, [])
+        self.clock.advance(1)
+        self.assertEqual(results, [False])
+
+    def test_stopping_one_manager_keeps_the_connection_for_the_others(self):
+        first, second = FakeConnectionManager(5), FakeConnectionManager(5)
+        self.connection.attach(first)
+        self.connection.attach(second)
+        self.assertEqual(self._next_request(), [True])
+        self.assertIs(self.connection.active_manager, first)
+        # the first manager is stopped while its request is in flight
+        self.connection.detach(first)
+        self.assertFalse(self.connection.connection.disconnected)
+        self.assertEqual(first.disconnected, [])
+        self.assertEqual(self._next_request(), [True])
+        self.assertEqual(first.disconnected, [self.peer])
+        self.assertIs(self.connection.active_manager, second)
+        self.assertEqual(self.connection.managers, [second])
+        self.assertFalse(self.connection.connection.disconnected)
+
+    def test_stopping_the_last_manager_closes_the_connection(self):
+        manager = FakeConnectionManager(5)
+        self.connection.attach(manager)
+        self.assertEqual(self._next_request(), [True])
+        self.connection.detach(manager)
+        self.assertTrue(self.connection.connection.disconnected)
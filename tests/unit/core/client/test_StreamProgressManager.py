@@ -0,0 +1,63 @@
+from twisted.trial.unittest import TestCase
+from twisted.internet import defer, task
+
+from lbrynet.p2p.client.StreamProgressManager import FullStreamProgressManager
+
+
+class FakeBlob:
+    def __init__(self, blob_num):
+        self.blob_hash = str(blob_num)
+        self.verified = False
+
+    def get_is_verified(self):
+        return self.verified
+
+
+class FakeDownloadManager:
+    def __init__(self, num_blobs):
+        self.blobs = {n: FakeBlob(n) for n in range(num_blobs)}
+        self.handled = []
+
+    def final_blob_num(self):
+        return len(self.blobs) - 1
+
+    def handle_blob(self, blob_num):
+        self.handled.append(blob_num)
+        return defer.succeed(True)
+
+
+class StreamProgressManagerTest(TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.finished = []
+        self.download_manager = FakeDownloadManager(6)
+        self.progress_manager = FullStreamProgressManager(
+            self.finished.append, None, self.download_manager, reactor=self.clock, read_ahead=2
+        )
+
+    def _nums(self, blobs):
+        return [int(b.blob_hash) for b in blobs]
+
+    def test_blobs_to_download_are_prioritized_and_windowed(self):
+        self.assertEqual(self._nums(self.progress_manager.needed_blobs()), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(self._nums(self.progress_manager.blobs_to_download()), [0, 1, 2])
+        self.progress_manager.last_blob_outputted = 2
+        self.progress_manager.provided_blob_nums.update({1, 2})
+        self.assertEqual(self._nums(self.progress_manager.blobs_to_download()), [0, 3, 4])
+
+    def test_output_when_blob_downloaded(self):
+        self.progress_manager.start()
+        self.clock.advance(0)
+        self.assertEqual(self.download_manager.handled, [])
+        for blob_num in (1, 0):
+            self.download_manager.blobs[blob_num].verified = True
+            self.progress_manager.blob_downloaded(self.download_manager.blobs[blob_num])
+            self.clock.advance(0)
+        self.assertEqual(self.download_manager.handled, [0, 1])
+        for blob in list(self.download_manager.blobs.values())[2:]:
+            blob.verified = True
+            self.progress_manager.blob_downloaded(blob)
+            self.clock.advance(0)
+        self.assertEqual(self.download_manager.handled, [0, 1, 2, 3, 4, 5])
+        self.assertEqual(self.finished, [True])
+        self.progress_manager.stop()
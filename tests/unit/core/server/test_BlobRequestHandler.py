@@ -1,3 +1,6 @@
+import os
+import socket
+import tempfile
 from io import BytesIO
 from unittest import mock
 
@@ -122,3 +125,108 @@ class TestBlobRequestHandlerSender(unittest.TestCase):
         while consumer.producer:
             consumer.producer.resumeProducing()
         self.assertEqual(consumer.value(), b'test')
+
+
+class SocketTransport(proto_helpers.StringTransport):
+    """
+    A transport that buffers writes like a real one and exposes a socket for sendfile
+    """
+    def __init__(self, sock):
+        super().__init__()
+        self.sock = sock
+        self.pending = b''
+
+    def getHandle(self):
+        return self.sock
+
+    def write(self, data):
+        self.pending += data
+
+    def registerProducer(self, producer, streaming):
+        super().registerProducer(producer, streaming)
+        producer.resumeProducing()
+
+    def flush(self):
+        while self.pending:
+            try:
+                sent = self.sock.send(self.pending)
+            except BlockingIOError:
+                return False
+            self.pending = self.pending[sent:]
+        return True
+
+
+class TestBlobFileSender(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(2 ** 20 + 1)
+        fd, self.file_path = tempfile.mkstemp()
+        os.write(fd, self.data)
+        os.close(fd)
+        self.addCleanup(os.remove, self.file_path)
+        self.read_handle = open(self.file_path, 'rb')
+        self.addCleanup(self.read_handle.close)
+        self.sent = []
+
+    def _make_sender(self, transport):
+        from lbrynet.p2p.server.BlobFileSender import BlobFileSender
+        return BlobFileSender(self.read_handle, len(self.data), transport, self.sent.append)
+
+    def test_file_is_written_from_memory_map(self):
+        transport = proto_helpers.StringTransport()
+        sender = self._make_sender(transport)
+        self.assertFalse(sender.using_sendfile)
+        d = sender.begin_transfer()
+        while transport.producer:
+            transport.producer.resumeProducing()
+        self.assertEqual(len(self.data), self.successResultOf(d))
+        self.assertEqual(self.data, transport.value())
+        self.assertEqual(len(self.data), sum(self.sent))
+
+    def test_file_is_sent_with_sendfile(self):
+        if not hasattr(os, 'sendfile'):
+            raise unittest.SkipTest("os.sendfile is not available")
+        sock, other = socket.socketpair()
+        self.addCleanup(sock.close)
+        self.addCleanup(other.close)
+        sock.setblocking(False)
+        other.setblocking(False)
+        transport = SocketTransport(sock)
+        transport.write(b'response')
+        sender = self._make_sender(transport)
+        self.assertTrue(sender.using_sendfile)
+        d = sender.begin_transfer()
+        received = b''
+        while transport.producer or transport.pending:
+            if transport.flush() and transport.producer:
+                transport.producer.resumeProducing()
+            try:
+                received += other.recv(2 ** 20)
+            except BlockingIOError:
+                pass
+        while len(received) < len(self.data) + len(b'response'):
+            received += other.recv(2 ** 20)
+        self.assertEqual(b'response' + self.data, received)
+        self.assertEqual(len(self.data), self.successResultOf(d))
+        self.assertEqual(len(self.data), sum(self.sent))
+        self.assertTrue(sender.using_sendfile)
+
+    def test_paused_sender_does_not_send(self):
+        transport = proto_helpers.StringTransport()
+        sender = self._make_sender(transport)
+        sender.pause()
+        d = sender.begin_transfer()
+        transport.producer.resumeProducing()
+        self.assertEqual(b'', transport.value())
+        sender.unpause()
+        while transport.producer:
+            transport.producer.resumeProducing()
+        self.assertEqual(self.data, transport.value())
+        self.successResultOf(d)
+
+    def test_stop_producing_fails_transfer(self):
+        transport = proto_helpers.StringTransport()
+        sender = self._make_sender(transport)
+        d = sender.begin_transfer()
+        transport.producer.resumeProducing()
+        sender.stopProducing()
+        self.failureResultOf(d)
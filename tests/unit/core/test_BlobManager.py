@@ -3,6 +3,7 @@ import shutil
 import os
 import random
 import string
+from binascii import unhexlify
 from twisted.trial import unittest
 from twisted.internet import defer
 
@@ -135,3 +136,85 @@ class BlobManagerTest(unittest.TestCase):
         self.assertFalse(out)
         count = yield self.bm.count_should_announce_blobs()
         self.assertEqual(0, count)
+
+    def test_blob_cache_evicts_least_recently_used(self):
+        self.bm.blobs.max_size = 2
+        blob_hashes = [random_lbry_hash() for _ in range(3)]
+        first = self.bm.get_blob(blob_hashes[0])
+        self.bm.get_blob(blob_hashes[1])
+        self.bm.get_blob(blob_hashes[0])
+        self.bm.get_blob(blob_hashes[2])
+        self.assertEqual(2, len(self.bm.blobs))
+        self.assertIn(blob_hashes[0], self.bm.blobs)
+        self.assertNotIn(blob_hashes[1], self.bm.blobs)
+        self.assertEqual(1, self.bm.blobs.evictions)
+        self.assertIs(first, self.bm.get_blob(blob_hashes[0]))
+
+    @defer.inlineCallbacks
+    def test_blob_cache_reloads_evicted_blob(self):
+        blob_hash = yield self._create_and_add_blob()
+        self.bm.blobs.max_size = 1
+        self.bm.get_blob(random_lbry_hash())
+        self.assertNotIn(blob_hash, self.bm.blobs)
+        blob = self.bm.get_blob(blob_hash)
+        self.assertTrue(blob.verified)
+
+    @defer.inlineCallbacks
+    def test_blob_cache_does_not_evict_pinned_blobs(self):
+        blob_hash = yield self._create_and_add_blob()
+        self.bm.blobs.max_size = 1
+        blob = self.bm.get_blob(blob_hash)
+        reader = blob.open_for_reading()
+        self.bm.get_blob(random_lbry_hash())
+        self.bm.get_blob(random_lbry_hash())
+        self.assertEqual(1, len(self.bm.blobs))
+        self.assertIs(blob, self.bm.get_blob(blob_hash))
+
+        reader.close()
+        self.bm.get_blob(random_lbry_hash())
+        self.assertNotIn(blob_hash, self.bm.blobs)
+
+    @defer.inlineCallbacks
+    def test_setup_removes_temporary_blob_files(self):
+        blob = self.bm.get_blob(random_lbry_hash(), 10)
+        writer, finished_d = blob.open_for_writing(self.peer)
+        writer.write(b'0' * 5)
+        temp_path = writer.temp_path
+        self.assertTrue(os.path.isfile(temp_path))
+        writer.temp_path = None  # leave it behind as if we were shut down mid-download
+        writer.write_handle.close()
+        writer.write_handle = None
+        finished_d.addErrback(lambda _: None)
+        writer.close()
+        yield f2d(self.bm.setup())
+        self.assertFalse(os.path.isfile(temp_path))
+
+    def test_blob_cache_stats(self):
+        blob_hash = random_lbry_hash()
+        self.bm.get_blob(blob_hash)
+        self.bm.get_blob(blob_hash)
+        self.bm.get_blob(blob_hash)
+        stats = self.bm.blobs.get_stats()
+        self.assertEqual(1, stats['size'])
+        self.assertEqual(2, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(0, stats['evictions'])
+
+    @defer.inlineCallbacks
+    def test_verify_blobs_marks_corrupt_blobs_pending(self):
+        good_blob_hash = yield self._create_and_add_blob()
+        bad_blob_hash = yield self._create_and_add_blob()
+        with open(os.path.join(self.blob_dir, bad_blob_hash), 'r+b') as blob_file:
+            blob_file.write(b'corrupted')
+
+        bad_blob_hashes = yield f2d(self.bm.verify_blobs(workers=2))
+        self.assertEqual([bad_blob_hash], bad_blob_hashes)
+        self.assertTrue(os.path.isfile(os.path.join(self.blob_dir, good_blob_hash)))
+        self.assertFalse(os.path.isfile(os.path.join(self.blob_dir, bad_blob_hash)))
+        self.assertNotIn(bad_blob_hash, self.bm.blobs)
+        finished = yield f2d(self.bm.storage.get_all_finished_blobs())
+        self.assertEqual([unhexlify(good_blob_hash)], finished)
+        progress = self.bm.verifier.get_progress()
+        self.assertFalse(progress['running'])
+        self.assertEqual(2, progress['checked_blobs'])
+        self.assertEqual(1, progress['bad_blobs'])
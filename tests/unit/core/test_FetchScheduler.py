@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock
+
+from twisted.trial import unittest
+from twisted.internet import task
+
+from lbrynet.p2p.FetchScheduler import FetchScheduler, HEDGE_MIN_SAMPLES
+
+
+class FetchSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.scheduler = FetchScheduler(self.clock)
+        self.blob = MagicMock(blob_hash='aa')
+        self.blob.get_is_verified.return_value = False
+        self.blob.get_length.return_value = 1000
+        self.mirror = self.scheduler.get_source('server1')
+        self.peer = self.scheduler.get_source('peer1')
+
+    def test_blob_is_left_to_the_source_downloading_it(self):
+        self.assertTrue(self.scheduler.should_download(self.peer, self.blob))
+        self.scheduler.download_started(self.mirror, self.blob)
+        self.assertFalse(self.scheduler.should_download(self.mirror, self.blob))
+        # nothing is known about how fast either source is
+        self.assertFalse(self.scheduler.should_download(self.peer, self.blob))
+        self.scheduler.download_finished(self.mirror, self.blob, failed=True)
+        self.assertTrue(self.scheduler.should_download(self.peer, self.blob))
+        self.assertEqual(self.mirror.failed, 1)
+
+    def test_faster_source_takes_over(self):
+        self.mirror.throughput = 100
+        self.peer.throughput = 1000
+        self.scheduler.download_started(self.mirror, self.blob)
+        self.clock.advance(8)
+        self.assertTrue(self.scheduler.should_download(self.peer, self.blob))
+        self.clock.advance(1)
+        # the mirror is expected to finish in less than a second now
+        self.assertFalse(self.scheduler.should_download(self.peer, self.blob))
+        self.blob.get_is_verified.return_value = True
+        self.assertFalse(self.scheduler.should_download(self.peer, self.blob))
+
+    def test_slow_download_is_hedged(self):
+        hedged = []
+        finished = []
+        self.scheduler.hedger = lambda blob, slow_source: hedged.append((blob, slow_source))
+        self.scheduler.download_listeners.append(lambda: finished.append(True))
+        self.scheduler.latencies.extend([1.0] * HEDGE_MIN_SAMPLES)
+        self.scheduler.download_started(self.peer, self.blob)
+        self.assertFalse(self.scheduler.should_download(self.mirror, self.blob))
+        self.clock.advance(1)
+        self.assertEqual(hedged, [(self.blob, self.peer)])
+        self.assertTrue(self.scheduler.should_download(self.mirror, self.blob))
+        self.scheduler.download_finished(self.peer, self.blob, 1000)
+        self.assertEqual(finished, [True])
+        self.assertEqual(self.peer.throughput, 1000)
+        self.assertEqual(len(self.scheduler.latencies), HEDGE_MIN_SAMPLES + 1)
+        self.assertFalse(self.scheduler.is_downloading(self.blob))
@@ -1,10 +1,11 @@
 from unittest.mock import MagicMock
 
 from twisted.trial import unittest
-from twisted.internet import defer
+from twisted.internet import defer, task
 
 from lbrynet.blob.blob_file import BlobFile
-from lbrynet.p2p.HTTPBlobDownloader import HTTPBlobDownloader
+from lbrynet.p2p.HTTPBlobDownloader import HTTPBlobDownloader, MirrorSource
+from lbrynet.p2p.FetchScheduler import HEDGE_MIN_SAMPLES
 from tests.test_utils import mk_db_and_blob_dir, rm_db_and_blob_dir
 
 
@@ -86,6 +87,77 @@ class HTTPBlobDownloaderTest(unittest.TestCase):
         self.assertFalse(self.blob.get_is_verified())
         self.assertEqual(self.blob.writers, {})
 
+    @defer.inlineCallbacks
+    def test_slow_download_is_hedged_on_another_mirror(self):
+        clock = task.Clock()
+        self.downloader = HTTPBlobDownloader(
+            self.blob_manager, [self.blob_hash], ['server1', 'server2'], self.client, retry=False, clock=clock
+        )
+        self.downloader.scheduler.latencies.extend([1.0] * HEDGE_MIN_SAMPLES)
+        slow = defer.Deferred()
+        self.client.get.side_effect = lambda uri: slow if uri.startswith('http://server1') else \
+            defer.succeed(self.response)
+        self.client.collect.side_effect = collect
+        self.downloader.sources[1].throughput = 1  # try the unmeasured server1 first
+        d = self.downloader.start()
+        self.client.get.assert_called_with('http://{}/{}'.format('server1', self.blob_hash))
+        clock.advance(1.0)
+        yield d
+        self.client.get.assert_called_with('http://{}/{}'.format('server2', self.blob_hash))
+        self.assertEqual(self.downloader.hedged, 1)
+        self.assertTrue(self.blob.get_is_verified())
+        self.assertEqual(self.blob.writers, {})
+
+    @defer.inlineCallbacks
+    def test_blob_a_peer_is_downloading_is_left_to_it(self):
+        clock = task.Clock()
+        self.downloader = HTTPBlobDownloader(
+            self.blob_manager, [self.blob_hash], ['server1'], self.client, retry=False, clock=clock
+        )
+        self.client.collect.side_effect = collect
+        peer_source = self.downloader.scheduler.get_source('peer')
+        self.downloader.scheduler.download_started(peer_source, self.blob)
+        d = self.downloader.start()
+        self.client.get.assert_not_called()
+        self.downloader.scheduler.download_finished(peer_source, self.blob, failed=True)
+        yield d
+        self.client.get.assert_called_with('http://{}/{}'.format('server1', self.blob_hash))
+        self.assertTrue(self.blob.get_is_verified())
+        self.assertEqual(peer_source.failed, 1)
+
+    @defer.inlineCallbacks
+    def test_slow_peer_download_is_hedged_on_a_mirror(self):
+        clock = task.Clock()
+        self.downloader = HTTPBlobDownloader(
+            self.blob_manager, [self.blob_hash], ['server1'], self.client, retry=False, clock=clock
+        )
+        self.downloader.scheduler.latencies.extend([1.0] * HEDGE_MIN_SAMPLES)
+        self.client.collect.side_effect = collect
+        peer_source = self.downloader.scheduler.get_source('peer')
+        self.downloader.scheduler.download_started(peer_source, self.blob)
+        d = self.downloader.start()
+        self.client.get.assert_not_called()
+        clock.advance(1.0)
+        yield d
+        self.client.get.assert_called_with('http://{}/{}'.format('server1', self.blob_hash))
+        self.assertTrue(self.blob.get_is_verified())
+
+
+class MirrorSourceTest(unittest.TestCase):
+    def test_adaptive_concurrency(self):
+        source = MirrorSource('server1', concurrency=2, max_concurrency=3)
+        source.record_success(1000, 1)
+        self.assertEqual((source.concurrency, source.throughput), (2, 1000))
+        source.record_success(1000, 1)
+        source.record_success(1000, 1)
+        self.assertEqual(source.concurrency, 3)
+        source.record_success(100, 1)
+        self.assertEqual(source.concurrency, 3)
+        source.record_failure()
+        self.assertEqual(source.concurrency, 1)
+        source.record_failure()
+        self.assertEqual(source.concurrency, 1)
+
 
 def collect(response, write):
     write(b'f' * response.length)
@@ -1,3 +1,4 @@
+import os
 from lbrynet.blob.blob_file import BlobFile
 from lbrynet.p2p.Error import DownloadCanceledError, InvalidDataError
 
@@ -50,6 +51,9 @@ class BlobFileTest(unittest.TestCase):
         f.close()
         self.assertEqual(0, blob_file.readers)
 
+        # the temporary file the blob was spooled to was renamed into place
+        self.assertEqual([self.fake_content_hash], os.listdir(self.blob_dir))
+
 
     @defer.inlineCallbacks
     def test_delete(self):
@@ -100,6 +104,7 @@ class BlobFileTest(unittest.TestCase):
         writer, finished_d = blob_file.open_for_writing(peer=1)
         writer.write(content)
         yield self.assertFailure(finished_d, InvalidDataError)
+        self.assertEqual([], os.listdir(self.blob_dir))
 
     @defer.inlineCallbacks
     def test_close_on_incomplete_write(self):
@@ -118,6 +123,7 @@ class BlobFileTest(unittest.TestCase):
         writer.close()
 
         # file should not exist, since we did not finish write
+        self.assertEqual([], os.listdir(self.blob_dir))
         blob_file_2 = BlobFile(self.blob_dir, self.fake_content_hash, self.fake_content_len)
         out = blob_file_2.open_for_reading()
         self.assertIsNone(out)
@@ -144,6 +150,9 @@ class BlobFileTest(unittest.TestCase):
         self.assertEqual(self.fake_content_len, len(c))
         self.assertEqual(bytearray(c), self.fake_content)
 
+        # the losing writer's temporary file was removed
+        self.assertEqual([blob_hash], os.listdir(self.blob_dir))
+
     @defer.inlineCallbacks
     def test_multiple_writers_save_at_same_time(self):
         blob_hash = self.fake_content_hash
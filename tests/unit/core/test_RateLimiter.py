@@ -0,0 +1,57 @@
+from twisted.trial import unittest
+from twisted.internet import task
+
+from lbrynet.p2p.Peer import Peer
+from lbrynet.p2p.RateLimiter import RateLimiter
+
+
+class FakeProtocol:
+    def __init__(self, port):
+        self.peer = Peer('127.0.0.1', port)
+        self.upload_throttled = False
+
+    def throttle_upload(self):
+        self.upload_throttled = True
+
+    def unthrottle_upload(self):
+        self.upload_throttled = False
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.rate_limiter = RateLimiter(max_ul_bytes=1000, burst=1.0, clock=self.clock)
+        self.fast, self.slow = FakeProtocol(1), FakeProtocol(2)
+        self.rate_limiter.register_protocol(self.fast)
+        self.rate_limiter.register_protocol(self.slow)
+        self.rate_limiter.start()
+
+    def tearDown(self):
+        self.rate_limiter.stop()
+
+    def test_only_protocol_over_its_share_is_throttled(self):
+        self.rate_limiter.report_ul_bytes(900, self.fast)
+        self.assertFalse(self.fast.upload_throttled)
+        self.rate_limiter.report_ul_bytes(200, self.slow)
+        self.assertFalse(self.fast.upload_throttled)
+        self.assertFalse(self.slow.upload_throttled)
+        self.rate_limiter.report_ul_bytes(100, self.fast)
+        self.assertTrue(self.fast.upload_throttled)
+        self.assertFalse(self.slow.upload_throttled)
+        # resumed once the limit is paid back
+        self.clock.advance(0.3)
+        self.assertFalse(self.fast.upload_throttled)
+
+    def test_spare_bandwidth_is_not_left_idle(self):
+        self.rate_limiter.report_ul_bytes(990, self.fast)
+        self.assertFalse(self.fast.upload_throttled)
+
+    def test_throughput_histogram(self):
+        self.rate_limiter.report_ul_bytes(500, self.fast)
+        self.clock.advance(1)
+        stats = self.rate_limiter.get_stats()['upload']
+        self.assertEqual(stats['total_bytes'], 500)
+        self.assertEqual(stats['peers']['127.0.0.1:1']['bytes_per_second'], 500)
+        self.assertEqual(stats['peers']['127.0.0.1:1']['histogram']['<1000'], 1)
+        self.rate_limiter.unregister_protocol(self.fast)
+        self.assertNotIn('127.0.0.1:1', self.rate_limiter.get_stats()['upload']['peers'])
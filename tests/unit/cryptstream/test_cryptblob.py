@@ -81,3 +81,29 @@ class TestCryptBlob(unittest.TestCase):
         yield self._test_encrypt_decrypt(16*2)
         yield self._test_encrypt_decrypt(2000)
         yield self._test_encrypt_decrypt(2*2**20-1)
+
+    @defer.inlineCallbacks
+    def _test_decrypt_range(self, size_of_data, ranges):
+        blob = MocBlob()
+        key = os.urandom(AES_BLOCK_SIZE_BYTES)
+        iv = os.urandom(AES_BLOCK_SIZE_BYTES)
+        maker = CryptBlob.CryptStreamBlobMaker(key, iv, 0, blob)
+        plaintext = random_string(size_of_data).encode()
+        maker.write(plaintext)
+        yield maker.close()
+
+        read_handle = blob.open_for_reading()
+        self.assertEqual(
+            size_of_data, CryptBlob.get_blob_plaintext_length(read_handle, key, iv, len(blob.data))
+        )
+        for start, end in ranges:
+            decrypted = b''.join(CryptBlob.decrypt_blob_range(
+                read_handle, key, iv, len(blob.data), start, end, chunk_size=AES_BLOCK_SIZE_BYTES * 4
+            ))
+            self.assertEqual(plaintext[start:end], decrypted)
+
+    @defer.inlineCallbacks
+    def test_decrypt_range(self):
+        yield self._test_decrypt_range(1, [(0, 1), (0, 100)])
+        yield self._test_decrypt_range(16, [(0, 16), (15, 16), (3, 9)])
+        yield self._test_decrypt_range(2000, [(0, 2000), (17, 95), (1000, 1999), (1990, 3000), (64, 128)])
@@ -0,0 +1,140 @@
+import asyncio
+from twisted.trial import unittest
+from twisted.internet import defer
+
+from lbrynet.extras.compat import f2d
+from lbrynet.extras.daemon.PeerManager import PeerManager
+from lbrynet.p2p.StreamDescriptor import StreamDescriptorIdentifier
+from lbrynet.p2p.BlobManager import DiskBlobManager
+from lbrynet.p2p.RateLimiter import DummyRateLimiter
+from lbrynet.p2p.PaymentRateManager import OnlyFreePaymentsManager
+from lbrynet.extras.daemon.storage import SQLiteStorage
+from lbrynet.blob import EncryptedFileCreator
+from lbrynet.blob.EncryptedFileManager import EncryptedFileManager
+from lbrynet.blob.stream_reader import EncryptedStreamReader, BLOB_PLAINTEXT_SIZE
+from tests import mocks
+from tests.test_utils import mk_db_and_blob_dir, rm_db_and_blob_dir
+
+PATTERN = bytes(range(251))  # not a divisor of the blob size, so every offset has a different byte
+STREAM_SIZE = 2 * BLOB_PLAINTEXT_SIZE + 1000
+
+
+class PartialBlob:
+    def __init__(self, blob, missing):
+        self.blob = blob
+        self.missing = missing
+
+    def __getattr__(self, item):
+        return getattr(self.blob, item)
+
+    def get_is_verified(self):
+        return self.blob.blob_hash not in self.missing and self.blob.get_is_verified()
+
+
+class PartialBlobManager:
+    """
+    Blob manager of a stream that is still downloading, the blobs in `missing` are not available yet
+    """
+
+    def __init__(self, blob_manager):
+        self.blob_manager = blob_manager
+        self.missing = set()
+
+    def get_blob(self, blob_hash, length=None):
+        return PartialBlob(self.blob_manager.get_blob(blob_hash, length), self.missing)
+
+
+class StreamTestCase(unittest.TestCase):
+    timeout = 20
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        mocks.mock_conf_settings(self)
+        self.tmp_db_dir, self.tmp_blob_dir = mk_db_and_blob_dir()
+        self.storage = SQLiteStorage(':memory:')
+        self.blob_manager = DiskBlobManager(self.tmp_blob_dir, self.storage)
+        self.prm = OnlyFreePaymentsManager()
+        self.lbry_file_manager = EncryptedFileManager(
+            mocks.PeerFinder(5553, PeerManager(), 2), DummyRateLimiter(), self.blob_manager, mocks.Wallet(),
+            self.prm, self.storage, StreamDescriptorIdentifier()
+        )
+        yield f2d(self.storage.open())
+        yield f2d(self.lbry_file_manager.setup())
+        lbry_file = yield EncryptedFileCreator.create_lbry_file(
+            self.blob_manager, self.storage, self.prm, self.lbry_file_manager, 'test.file',
+            mocks.GenFile(STREAM_SIZE, PATTERN)
+        )
+        self.sd_hash = lbry_file.sd_hash
+        self.plaintext = mocks.GenFile(STREAM_SIZE, PATTERN).read()
+        _, self.stream_key, _, _ = yield f2d(self.storage.get_stream_info(lbry_file.stream_hash))
+        self.blob_infos = yield f2d(self.storage.get_blobs_for_stream(lbry_file.stream_hash))
+        self.partial_blob_manager = PartialBlobManager(self.blob_manager)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self.lbry_file_manager.stop()
+        yield f2d(self.blob_manager.stop())
+        yield f2d(self.storage.close())
+        rm_db_and_blob_dir(self.tmp_db_dir, self.tmp_blob_dir)
+
+    def set_last_blob_missing(self):
+        last_blob = [blob_info for blob_info in self.blob_infos if blob_info.blob_hash][-1]
+        self.partial_blob_manager.missing.add(last_blob.blob_hash)
+
+
+class EncryptedStreamReaderTest(StreamTestCase):
+    def get_reader(self):
+        return EncryptedStreamReader(
+            self.partial_blob_manager, self.stream_key, self.blob_infos, poll_interval=0.01, blob_timeout=5
+        )
+
+    async def _read(self, reader, start=0, end=None):
+        return b''.join([data async for data in reader.read(start, end)])
+
+    def read(self, reader, start=0, end=None):
+        return f2d(self._read(reader, start, end))
+
+    @defer.inlineCallbacks
+    def test_offsets_map_to_blobs(self):
+        reader = self.get_reader()
+        self.assertEqual(3, len(reader.blob_infos))
+        ranges = [
+            (0, None), (0, 10), (BLOB_PLAINTEXT_SIZE - 5, BLOB_PLAINTEXT_SIZE + 5),
+            (BLOB_PLAINTEXT_SIZE, 2 * BLOB_PLAINTEXT_SIZE), (2 * BLOB_PLAINTEXT_SIZE - 1, None),
+            (STREAM_SIZE - 1, None), (STREAM_SIZE, None)
+        ]
+        for start, end in ranges:
+            data = yield self.read(reader, start, end)
+            self.assertEqual(self.plaintext[start:end], data, (start, end))
+
+    @defer.inlineCallbacks
+    def test_get_size(self):
+        reader = self.get_reader()
+        self.assertEqual(STREAM_SIZE, reader.get_size())
+        size = yield f2d(reader.wait_for_size())
+        self.assertEqual(STREAM_SIZE, size)
+
+    @defer.inlineCallbacks
+    def test_wait_for_size_of_a_partial_stream(self):
+        self.set_last_blob_missing()
+        reader = self.get_reader()
+        self.assertIsNone(reader.get_size())
+        asyncio.get_event_loop().call_later(0.1, self.partial_blob_manager.missing.clear)
+        size = yield f2d(reader.wait_for_size())
+        self.assertEqual(STREAM_SIZE, size)
+
+    @defer.inlineCallbacks
+    def test_read_before_the_last_blob_is_available(self):
+        self.set_last_blob_missing()
+        reader = self.get_reader()
+        data = yield self.read(reader, 10, 2 * BLOB_PLAINTEXT_SIZE)
+        self.assertEqual(self.plaintext[10:2 * BLOB_PLAINTEXT_SIZE], data)
+        self.assertIsNone(reader.get_size())
+
+    def test_is_before_last_blob(self):
+        reader = self.get_reader()
+        self.assertTrue(reader.is_before_last_blob(0, 2 * BLOB_PLAINTEXT_SIZE))
+        self.assertTrue(reader.is_before_last_blob(BLOB_PLAINTEXT_SIZE, BLOB_PLAINTEXT_SIZE + 1))
+        self.assertFalse(reader.is_before_last_blob(0, 2 * BLOB_PLAINTEXT_SIZE + 1))
+        self.assertFalse(reader.is_before_last_blob(10, None))
+        self.assertFalse(reader.is_before_last_blob(-10, 5))
@@ -2,6 +2,7 @@ import os
 import shutil
 import tempfile
 import logging
+import sqlite3
 from copy import deepcopy
 from twisted.internet import defer
 from twisted.trial import unittest
@@ -160,6 +161,49 @@ class BlobStorageTests(StorageTest):
         blob_hashes = yield f2d(self.storage.get_all_blob_hashes())
         self.assertEqual(blob_hashes, [])
 
+    @defer.inlineCallbacks
+    def test_concurrent_blob_writes_are_committed_together(self):
+        transactions = []
+        run = self.storage.db.run
+
+        def count_transactions(*args, **kwargs):
+            transactions.append(args)
+            return run(*args, **kwargs)
+
+        self.storage.db.run = count_transactions
+        blob_hashes = [random_lbry_hash() for _ in range(100)]
+        yield defer.DeferredList([
+            f2d(self.storage.add_completed_blob(blob_hash, 100, 0, False)) for blob_hash in blob_hashes
+        ] + [f2d(self.storage.set_should_announce(blob_hashes[0], 0, True))])
+        self.assertEqual(1, len(transactions))
+        stored = yield f2d(self.storage.get_all_blob_hashes())
+        self.assertSetEqual(set(blob_hashes), set(stored))
+        should_announce = yield f2d(self.storage.should_announce(blob_hashes[0]))
+        self.assertEqual(1, should_announce)
+
+    @defer.inlineCallbacks
+    def test_failed_write_does_not_fail_the_batch(self):
+        blob_hash = random_lbry_hash()
+        stream_hash = random_lbry_hash()
+        bad_write = f2d(self.storage.write_queue.write(
+            "insert into stream_blob values (?, ?, ?, ?)", (stream_hash, None, 0, 'DEADBEEF')
+        ))
+        good_write = f2d(self.storage.add_completed_blob(blob_hash, 100, 0, False))
+        yield good_write
+        yield self.assertFailure(bad_write, sqlite3.IntegrityError)
+        blob_hashes = yield f2d(self.storage.get_all_blob_hashes())
+        self.assertEqual(blob_hashes, [blob_hash])
+
+
+    @defer.inlineCallbacks
+    def test_delete_after_queued_write(self):
+        blob_hash = random_lbry_hash()
+        queued = f2d(self.storage.add_completed_blob(blob_hash, 100, 0, False))
+        yield f2d(self.storage.delete_blobs_from_db([blob_hash]))
+        yield queued
+        blob_hashes = yield f2d(self.storage.get_all_blob_hashes())
+        self.assertEqual(blob_hashes, [])
+
 
 class SupportsStorageTests(StorageTest):
     @defer.inlineCallbacks
@@ -222,6 +266,20 @@ class StreamStorageTests(StorageTest):
         stream_hashes = yield f2d(self.storage.get_all_streams())
         self.assertListEqual(stream_hashes, [stream_hash])
 
+    @defer.inlineCallbacks
+    def test_add_blobs_to_stream_is_atomic(self):
+        stream_hash, sd_hash, blob_hash = random_lbry_hash(), random_lbry_hash(), random_lbry_hash()
+        yield self.store_fake_blob(sd_hash)
+        yield self.store_fake_stream(stream_hash, sd_hash)
+        self.store_fake_blob(blob_hash)  # still queued, add_blobs_to_stream waits for it to be committed
+        bad_write = f2d(self.storage.add_blobs_to_stream(stream_hash, [
+            {'blob_hash': blob_hash, 'blob_num': 0, 'iv': 'DEADBEEF'},
+            {'blob_hash': random_lbry_hash(), 'blob_num': 1, 'iv': 'DEADBEEF'}  # not in the blob table
+        ]))
+        yield self.assertFailure(bad_write, sqlite3.IntegrityError)
+        stream_blobs = yield f2d(self.storage.get_blobs_for_stream(stream_hash))
+        self.assertListEqual([], [b for b in stream_blobs if b.blob_hash])
+
     @defer.inlineCallbacks
     def test_delete_stream(self):
         stream_hash = random_lbry_hash()
@@ -173,3 +173,48 @@ class TestContactLastRequested(unittest.TestCase):
         self.assertIs(self.contact.contact_is_good, False)
         self.clock.advance(1)
         self.assertIs(self.contact.contact_is_good, False)
+
+
+class TestContactManagerEviction(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.clock.advance(1)
+        self.contact_manager = ContactManager(self.clock.seconds)
+
+    def test_contact_without_id_is_found_by_id_once_set(self):
+        contact = self.contact_manager.make_contact(None, "127.0.0.1", 4444, None)
+        node_id = generate_id()
+        contact.set_id(node_id)
+        self.assertIs(contact, self.contact_manager.get_contact(node_id, "127.0.0.1", 4444))
+        self.assertIsNone(self.contact_manager.get_contact(None, "127.0.0.1", 4444))
+        self.assertEqual(1, len(self.contact_manager))
+
+    def test_evict_idle_contacts(self):
+        idle = self.contact_manager.make_contact(generate_id(), "127.0.0.1", 4444, None)
+        in_use = self.contact_manager.make_contact(generate_id(), "127.0.0.2", 4444, None)
+        active = self.contact_manager.make_contact(generate_id(), "127.0.0.3", 4444, None)
+        self.clock.advance(constants.contactIdleTimeout)
+        active.update_last_replied()
+        self.clock.advance(1)
+
+        self.assertEqual(1, self.contact_manager.evict_idle_contacts([in_use]))
+        self.assertIsNone(self.contact_manager.get_contact(idle.id, idle.address, idle.port))
+        self.assertIs(in_use, self.contact_manager.get_contact(in_use.id, in_use.address, in_use.port))
+        self.assertIs(active, self.contact_manager.get_contact(active.id, active.address, active.port))
+        self.assertEqual(1, self.contact_manager.get_stats()['evictions'])
+
+    def test_failure_history_is_bounded(self):
+        contact = self.contact_manager.make_contact(generate_id(), "127.0.0.1", 4444, None)
+        for _ in range(constants.rpcAttempts * 3):
+            contact.update_last_failed()
+            self.clock.advance(1)
+        self.assertEqual(constants.rpcAttempts + 1, contact.failedRPCs)
+        self.assertTrue(self.contact_manager.is_ignored(("127.0.0.1", 4444)))
+
+        self.assertFalse(self.contact_manager.is_ignored(("127.0.0.2", 4444)))
+        self.assertEqual(1, self.contact_manager.get_stats()['failure_histories'])
+
+        self.clock.advance(constants.contactIdleTimeout)
+        self.contact_manager.evict_idle_contacts()
+        self.assertEqual(0, len(self.contact_manager))
+        self.assertEqual(0, self.contact_manager.get_stats()['failure_histories'])
@@ -0,0 +1,71 @@
+from twisted.trial import unittest
+from twisted.internet import task
+from lbrynet.utils import generate_id
+from lbrynet.dht import constants
+from lbrynet.dht.contact import ContactManager
+from lbrynet.dht.datastore import DictDataStore
+
+
+class DictDataStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.contact_manager = ContactManager(self.clock.seconds)
+        self.datastore = DictDataStore(self.clock.seconds)
+
+    def _make_peer(self, port=3333):
+        node_id = generate_id()
+        contact = self.contact_manager.make_contact(node_id, '1.2.3.4', port, None)
+        compact_address = contact.compact_ip() + port.to_bytes(2, 'big') + node_id
+        return contact, compact_address
+
+    def _add(self, contact, key, compact_address, published=None):
+        now = int(self.clock.seconds()) if published is None else published
+        self.datastore.addPeerToBlob(contact, key, compact_address, now, now, contact.id)
+
+    def test_add_peer_is_idempotent(self):
+        key = generate_id()
+        contact, compact_address = self._make_peer()
+        self._add(contact, key, compact_address)
+        self.clock.advance(10)
+        self._add(contact, key, compact_address)
+        self.assertEqual(self.datastore.getPeersForBlob(key), [compact_address])
+        self.assertEqual(len(self.datastore._expirations), 1)
+        self.assertEqual(self.datastore.getStoringContacts(), [contact])
+
+    def test_expire_peers(self):
+        first_key, second_key = generate_id(), generate_id()
+        first_contact, first_address = self._make_peer(3333)
+        second_contact, second_address = self._make_peer(4444)
+        self._add(first_contact, first_key, first_address)
+        self._add(first_contact, second_key, first_address)
+        self.clock.advance(constants.dataExpireTimeout / 2)
+        self._add(second_contact, first_key, second_address)
+        self.assertSetEqual(set(self.datastore.getKeysForContact(first_contact)), {first_key, second_key})
+
+        self.clock.advance(constants.dataExpireTimeout / 2)
+        # expired peers are filtered out before the refresh removes them
+        self.assertEqual(self.datastore.getPeersForBlob(first_key), [second_address])
+        self.assertFalse(self.datastore.hasPeersForBlob(second_key))
+        self.assertIn(second_key, self.datastore)
+
+        self.datastore.removeExpiredPeers()
+        self.assertNotIn(second_key, self.datastore)
+        self.assertEqual(list(self.datastore[first_key]), [second_address])
+        self.assertEqual(self.datastore.getStoringContacts(), [second_contact])
+        self.assertEqual(self.datastore.getKeysForContact(first_contact), [])
+
+        self.clock.advance(constants.dataExpireTimeout / 2)
+        self.datastore.removeExpiredPeers()
+        self.assertEqual(len(self.datastore), 0)
+        self.assertEqual(self.datastore.getStoringContacts(), [])
+        self.assertEqual(self.datastore._expirations, [])
+
+    def test_bad_contacts_are_filtered(self):
+        key = generate_id()
+        contact, compact_address = self._make_peer()
+        self._add(contact, key, compact_address)
+        contact.update_last_failed()
+        contact.update_last_failed()
+        self.assertFalse(self.datastore.hasPeersForBlob(key))
+        self.assertEqual(self.datastore.getPeersForBlob(key), [])
+        self.assertEqual(self.datastore.getStoringContacts(), [contact])
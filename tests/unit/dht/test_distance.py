@@ -0,0 +1,32 @@
+from twisted.trial import unittest
+from lbrynet.utils import generate_id
+from lbrynet.dht.distance import Distance
+from lbrynet.dht.contact import ContactManager
+
+
+class DistanceTest(unittest.TestCase):
+    def setUp(self):
+        self.contact_manager = ContactManager()
+        self.key = generate_id()
+        self.distance = Distance(self.key)
+        self.contacts = [
+            self.contact_manager.make_contact(generate_id(), '127.0.0.1', 4444 + i, None) for i in range(50)
+        ]
+
+    def test_to_contact(self):
+        for contact in self.contacts:
+            self.assertEqual(self.distance(contact.id), self.distance.to_contact(contact))
+
+    def test_contact_id_set_later(self):
+        contact = self.contact_manager.make_contact(None, '127.0.0.2', 4444, None)
+        self.assertIsNone(contact.id_int)
+        node_id = generate_id()
+        contact.set_id(node_id)
+        self.assertEqual(self.distance(node_id), self.distance.to_contact(contact))
+
+    def test_closest_contacts(self):
+        expected = sorted(self.contacts, key=lambda c: self.distance(c.id))
+        self.assertListEqual(expected[:8], self.distance.closest_contacts(self.contacts, 8))
+        self.assertListEqual(expected, self.distance.closest_contacts(self.contacts, 100))
+        self.distance.sort_contacts(self.contacts)
+        self.assertListEqual(expected, self.contacts)
@@ -1,6 +1,11 @@
+import os
+import time
+import logging
 from twisted.trial import unittest
 from lbrynet.dht.encoding import bencode, bdecode, DecodeError
 
+log = logging.getLogger(__name__)
+
 
 class EncodeDecodeTest(unittest.TestCase):
 
@@ -48,3 +53,102 @@ class EncodeDecodeTest(unittest.TestCase):
     def test_decode_error(self):
         self.assertRaises(DecodeError, bdecode, b'abcdefghijklmnopqrstuvwxyz')
         self.assertRaises(DecodeError, bdecode, b'')
+
+    def test_nested_dict(self):
+        self.assertEqual(bencode([{b'a': 1}, 2]), b'ld1:ai1eei2ee')
+        self.assertEqual(bdecode(b'ld1:ai1eei2ee'), [{b'a': 1}, 2])
+
+    def test_truncated_data(self):
+        self.assertRaises(DecodeError, bdecode, b'l4:spami42e')
+        self.assertRaises(DecodeError, bdecode, b'10:spam')
+        self.assertRaises(DecodeError, bdecode, b'i42')
+
+    def test_bytes_like(self):
+        self.assertEqual(bdecode(memoryview(b'l4:spami42ee')), [b'spam', 42])
+        self.assertEqual(bdecode(bytearray(b'l4:spami42ee')), [b'spam', 42])
+
+
+def _legacy_bencode(data):
+    # the codec as it was before decoding with offsets, kept as a baseline for the benchmark below
+    if isinstance(data, int):
+        return b'i%de' % data
+    elif isinstance(data, (bytes, bytearray)):
+        return b'%d:%s' % (len(data), data)
+    elif isinstance(data, (list, tuple)):
+        encoded_list_items = b''
+        for item in data:
+            encoded_list_items += _legacy_bencode(item)
+        return b'l%se' % encoded_list_items
+    elif isinstance(data, dict):
+        encoded_dict_items = b''
+        for key in sorted(data.keys()):
+            encoded_dict_items += _legacy_bencode(key)
+            encoded_dict_items += _legacy_bencode(data[key])
+        return b'd%se' % encoded_dict_items
+
+
+def _legacy_bdecode(data, start_index=0):
+    if data[start_index] == ord('i'):
+        end_pos = data[start_index:].find(b'e') + start_index
+        return int(data[start_index + 1:end_pos]), end_pos + 1
+    elif data[start_index] == ord('l'):
+        start_index += 1
+        decoded_list = []
+        while data[start_index] != ord('e'):
+            list_data, start_index = _legacy_bdecode(data, start_index)
+            decoded_list.append(list_data)
+        return decoded_list, start_index + 1
+    elif data[start_index] == ord('d'):
+        start_index += 1
+        decoded_dict = {}
+        while data[start_index] != ord('e'):
+            key, start_index = _legacy_bdecode(data, start_index)
+            value, start_index = _legacy_bdecode(data, start_index)
+            decoded_dict[key] = value
+        return decoded_dict, start_index
+    split_pos = data[start_index:].find(b':') + start_index
+    length = int(data[start_index:split_pos])
+    start_index = split_pos + 1
+    end_pos = start_index + length
+    return data[start_index:end_pos], end_pos
+
+
+class EncodingBenchmark(unittest.TestCase):
+    """
+    Compares the codec with the previous implementation on findValue responses
+    carrying many peers, the largest messages the DHT handles
+    """
+
+    iterations = 20
+
+    def _find_value_response(self, peer_count):
+        blob_hash = os.urandom(48)
+        peers = [os.urandom(4) + (3333).to_bytes(2, 'big') + os.urandom(48) for _ in range(peer_count)]
+        return {
+            0: 1,
+            1: os.urandom(20),
+            2: os.urandom(48),
+            3: {blob_hash: peers, b'token': os.urandom(48), b'protocolVersion': 1}
+        }
+
+    def _time(self, fn, *args):
+        start = time.perf_counter()
+        for _ in range(self.iterations):
+            result = fn(*args)
+        return result, (time.perf_counter() - start) / self.iterations
+
+    def test_find_value_response(self):
+        for peer_count in (8, 100, 1000):
+            response = self._find_value_response(peer_count)
+            encoded, encode_time = self._time(bencode, response)
+            legacy_encoded, legacy_encode_time = self._time(_legacy_bencode, response)
+            self.assertEqual(legacy_encoded, encoded)
+            decoded, decode_time = self._time(bdecode, encoded)
+            legacy_decoded, legacy_decode_time = self._time(_legacy_bdecode, encoded)
+            self.assertEqual(response, decoded)
+            self.assertEqual(legacy_decoded[0], decoded)
+            log.info(
+                "findValue response with %i peers (%i bytes): encode %.1fus (was %.1fus), decode %.1fus (was %.1fus)",
+                peer_count, len(encoded), encode_time * 1e6, legacy_encode_time * 1e6,
+                decode_time * 1e6, legacy_decode_time * 1e6
+            )
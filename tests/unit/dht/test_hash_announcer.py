@@ -1,7 +1,9 @@
+from binascii import hexlify
 from twisted.trial import unittest
 from twisted.internet import defer, task
 from lbrynet import utils
-from lbrynet.extras.daemon.HashAnnouncer import DHTHashAnnouncer
+from lbrynet.extras.daemon.HashAnnouncer import DHTHashAnnouncer, AnnounceConcurrency
+from lbrynet.p2p.BlobManager import BlobDemand
 from tests.test_utils import random_lbry_hash
 from tests.mocks import mock_conf_settings
 
@@ -9,11 +11,13 @@ from tests.mocks import mock_conf_settings
 class MocDHTNode:
     def __init__(self):
         self.blobs_announced = 0
+        self.announced = []
         self.clock = task.Clock()
         self.peerPort = 3333
 
     def announceHaveBlob(self, blob):
         self.blobs_announced += 1
+        self.announced.append(hexlify(blob).decode())
         d = defer.Deferred()
         self.clock.callLater(1, d.callback, ['fake'])
         return d
@@ -35,6 +39,14 @@ class MocStorage:
         return defer.succeed(None)
 
 
+class MocBlobManager:
+    def __init__(self, clock):
+        self.demand = BlobDemand(get_time=clock.seconds)
+
+    def get_blob_demand(self, blob_hash):
+        return self.demand.get(blob_hash)
+
+
 class DHTHashAnnouncerTest(unittest.TestCase):
 
     def setUp(self):
@@ -57,3 +69,50 @@ class DHTHashAnnouncerTest(unittest.TestCase):
         yield announce_d
         self.assertEqual(self.dht_node.blobs_announced, self.num_blobs)
         self.assertEqual(self.announcer.hash_queue_size(), 0)
+
+    @defer.inlineCallbacks
+    def test_announce_order(self):
+        self.clock.advance(10 * 3600)
+        now = self.clock.seconds()
+        data_blobs = sorted(self.blobs_to_announce[:6])
+        head_blob, demanded_blob, overdue_blob = self.blobs_to_announce[6:9]
+        blob_manager = MocBlobManager(self.clock)
+        for _ in range(3):
+            blob_manager.demand.record(demanded_blob)
+        blobs = [(blob_hash, False, now) for blob_hash in reversed(data_blobs)]
+        blobs.extend([(head_blob, True, now), (demanded_blob, False, now), (overdue_blob, False, 0)])
+        announcer = DHTHashAnnouncer(self.dht_node, self.storage, blob_manager=blob_manager)
+        d = announcer._announce(blobs)
+        self.assertEqual([head_blob, demanded_blob, overdue_blob] + data_blobs, self.dht_node.announced)
+        self.clock.advance(1)
+        yield d
+        self.assertEqual(0, announcer.hash_queue_size())
+
+    def test_duplicate_announces_are_merged(self):
+        blob_hash = self.blobs_to_announce[0]
+        first = self.announcer.immediate_announce([blob_hash])
+        second = self.announcer.immediate_announce([blob_hash])
+        self.assertEqual(1, self.announcer.hash_queue_size())
+        self.assertEqual(1, self.dht_node.blobs_announced)
+        self.clock.advance(1)
+        return defer.DeferredList([first, second])
+
+
+class AnnounceConcurrencyTest(unittest.TestCase):
+    def test_limit_follows_success_rate(self):
+        concurrency = AnnounceConcurrency(8, window=10)
+        self.assertEqual(32, concurrency.maximum)
+        for _ in range(10):
+            concurrency.record(False)
+        self.assertEqual(4, concurrency.limit)
+        for _ in range(30):
+            concurrency.record(False)
+        self.assertEqual(1, concurrency.limit)
+        for _ in range(9):
+            concurrency.record(True)
+        concurrency.record(False)
+        self.assertEqual(2, concurrency.limit)
+        for _ in range(10):
+            concurrency.record(True)
+        self.assertEqual(3, concurrency.limit)
+        self.assertEqual(19, concurrency.get_stats()['succeeded'])
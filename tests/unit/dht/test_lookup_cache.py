@@ -0,0 +1,86 @@
+from twisted.internet import defer, task
+from twisted.trial import unittest
+from lbrynet.utils import generate_id
+from lbrynet.dht import constants
+from lbrynet.dht.contact import ContactManager
+from lbrynet.dht.distance import Distance
+from lbrynet.dht.lookup_cache import LookupCache
+from lbrynet.dht.routingtable import TreeRoutingTable
+
+
+def nearby_key(key):
+    return key[:-1] + bytes([key[-1] ^ 1])
+
+
+class FakeNode:
+    def __init__(self, network_size=100):
+        self.clock = task.Clock()
+        self.node_id = generate_id()
+        self._routingTable = TreeRoutingTable(self.node_id, self.clock.seconds)
+        contact_manager = ContactManager(self.clock.seconds)
+        self.network = [
+            contact_manager.make_contact(generate_id(), '10.0.%i.%i' % (i // 256, i % 256), 4444, None)
+            for i in range(network_size)
+        ]
+        self.find_node_calls = []
+
+    def iterativeFindNode(self, key):
+        self.find_node_calls.append(key)
+        d = defer.Deferred()
+        self.clock.callLater(1, d.callback, self.closest(key))
+        return d
+
+    def closest(self, key):
+        return Distance(key).closest_contacts(self.network, constants.k)
+
+
+class LookupCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.node = FakeNode()
+        self.cache = LookupCache(self.node)
+
+    def find(self, key):
+        d = self.cache.find_close_contacts(key)
+        self.node.clock.advance(1)
+        return d
+
+    @defer.inlineCallbacks
+    def test_nearby_key_reuses_lookup(self):
+        key = generate_id()
+        contacts = yield self.find(key)
+        self.assertEqual(self.node.closest(key), contacts)
+        contacts = yield self.find(nearby_key(key))
+        self.assertEqual(self.node.closest(nearby_key(key)), contacts)
+        self.assertEqual([key], self.node.find_node_calls)
+        self.assertEqual(1, self.cache.get_stats()['reused_lookups'])
+
+    @defer.inlineCallbacks
+    def test_distant_key_runs_a_lookup(self):
+        key = generate_id()
+        yield self.find(key)
+        distant_key = bytes([key[0] ^ 0x80]) + key[1:]
+        contacts = yield self.find(distant_key)
+        self.assertEqual(self.node.closest(distant_key), contacts)
+        self.assertEqual([key, distant_key], self.node.find_node_calls)
+
+    @defer.inlineCallbacks
+    def test_lookups_expire(self):
+        key = generate_id()
+        yield self.find(key)
+        self.node.clock.advance(constants.lookupReuseTime)
+        yield self.find(nearby_key(key))
+        self.assertEqual([key, nearby_key(key)], self.node.find_node_calls)
+
+    @defer.inlineCallbacks
+    def test_waits_for_pending_lookup_of_nearby_key(self):
+        yield self.find(generate_id())
+        key = generate_id()
+        first = self.cache.find_close_contacts(key)
+        second = self.cache.find_close_contacts(nearby_key(key))
+        self.node.clock.advance(1)
+        yield first
+        contacts = yield second
+        self.assertEqual(self.node.closest(nearby_key(key)), contacts)
+        self.assertEqual(2, len(self.node.find_node_calls))
+        self.assertEqual(2, self.cache.get_stats()['lookups'])
+        self.assertEqual(1, self.cache.get_stats()['reused_lookups'])
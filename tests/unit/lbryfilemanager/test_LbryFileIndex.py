@@ -0,0 +1,81 @@
+from binascii import hexlify
+from twisted.trial import unittest
+
+from lbrynet.blob.EncryptedFileManager import LbryFileIndex, LbryFileRecord
+
+
+class FakeLbryFile:
+    def __init__(self, sd_hash, claim_name=None, channel_name=None):
+        self.sd_hash = sd_hash
+        self.stream_hash = sd_hash[::-1]
+        self.claim_name = claim_name
+        self.channel_name = channel_name
+
+
+class LbryFileIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.files = [
+            FakeLbryFile('aa', 'one', '@first'),
+            FakeLbryFile('bb', 'two', '@first'),
+            FakeLbryFile('cc', 'one', '@second'),
+        ]
+        self.index = LbryFileIndex(self.files)
+
+    def test_search(self):
+        self.assertEqual(self.index.search(), self.files)
+        self.assertEqual(self.index.search(sd_hash='bb'), [self.files[1]])
+        self.assertEqual(self.index.search(stream_hash='cc'), [self.files[2]])
+        self.assertEqual(self.index.search(channel_name='@first'), self.files[:2])
+        self.assertEqual(self.index.search(channel_name='@first', claim_name='one'), [self.files[0]])
+        self.assertEqual(self.index.search(channel_name='@third'), [])
+
+    def test_update_keeps_order(self):
+        self.files[0].channel_name = '@second'
+        self.index.update(self.files[0])
+        self.assertEqual(self.index.search(channel_name='@first'), [self.files[1]])
+        self.assertEqual(self.index.search(channel_name='@second'), [self.files[0], self.files[2]])
+
+    def test_remove(self):
+        self.index.remove(self.files[1])
+        self.assertNotIn(self.files[1], self.index)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.search(sd_hash='bb'), [])
+        self.assertEqual(list(self.index), [self.files[0], self.files[2]])
+        self.assertRaises(ValueError, self.index.remove, self.files[1])
+
+    def test_replace_keeps_position(self):
+        replacement = FakeLbryFile('bb', 'three', '@second')
+        self.index.replace(self.files[1], replacement)
+        self.assertNotIn(self.files[1], self.index)
+        self.assertEqual(list(self.index), [self.files[0], replacement, self.files[2]])
+        self.assertEqual(self.index.search(claim_name='two'), [])
+        self.assertEqual(self.index.search(channel_name='@second'), [replacement, self.files[2]])
+        self.assertRaises(ValueError, self.index.replace, self.files[1], replacement)
+
+
+class LbryFileRecordTest(unittest.TestCase):
+    def setUp(self):
+        self.record = LbryFileRecord({
+            'row_id': 1, 'stream_hash': 'ab' * 48, 'sd_hash': 'cd' * 48, 'key': '00' * 16,
+            'stream_name': hexlify(b'stream').decode(), 'file_name': hexlify(b'file.mp4').decode(),
+            'download_directory': '/downloads', 'suggested_file_name': hexlify(b'suggested.mp4').decode(),
+            'blob_data_rate': 0.0, 'status': 'finished'
+        })
+
+    def test_record_has_the_searchable_fields_of_a_file(self):
+        self.assertEqual('file.mp4', self.record.file_name)
+        self.assertEqual('stream', self.record.stream_name)
+        self.assertEqual('suggested.mp4', self.record.suggested_file_name)
+        self.assertTrue(self.record.completed)
+        self.assertTrue(self.record.stopped)
+        self.assertIsNone(self.record.claim_name)
+
+        index = LbryFileIndex([self.record])
+        self.record.set_claim_info({
+            'claim_id': 'ef' * 20, 'txid': '12' * 32, 'nout': 0, 'channel_claim_id': None,
+            'name': 'one', 'channel_name': None
+        })
+        index.update(self.record)
+        self.assertEqual([self.record], index.search(claim_name='one'))
+        self.assertEqual([self.record], index.search(outpoint='%s:0' % ('12' * 32)))
+        self.assertEqual([self.record], index.search(file_name='file.mp4'))
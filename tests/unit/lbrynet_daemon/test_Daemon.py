@@ -16,6 +16,7 @@ from lbrynet.extras.daemon.Components import PEER_PROTOCOL_SERVER_COMPONENT, EXC
 from lbrynet.extras.daemon.Components import RATE_LIMITER_COMPONENT, HEADERS_COMPONENT, FILE_MANAGER_COMPONENT
 from lbrynet.extras.daemon.Daemon import Daemon as LBRYDaemon
 from lbrynet.blob.EncryptedFileDownloader import ManagedEncryptedFileDownloader
+from lbrynet.blob.EncryptedFileManager import LbryFileIndex
 from lbrynet.blob.EncryptedFileStatusReport import EncryptedFileStatusReport
 from lbrynet.extras.wallet import LbryWalletManager
 from torba.client.wallet import Wallet
@@ -150,7 +151,11 @@ class TestFileListSorting(unittest.TestCase):
         mock_conf_settings(self)
         test_utils.reset_time(self)
         self.test_daemon = get_test_daemon()
-        self.test_daemon.file_manager.lbry_files = self._get_fake_lbry_files()
+        self.test_daemon.file_manager.lbry_files = LbryFileIndex(self._get_fake_lbry_files())
+
+        async def load_lbry_file(lbry_file):
+            return lbry_file
+        self.test_daemon.file_manager.load_lbry_file = load_lbry_file
 
         self.test_points_paid = [
             2.5, 4.8, 5.9, 5.9, 5.9, 6.1, 7.1, 8.2, 8.4, 9.1
@@ -252,6 +257,28 @@ class TestFileListSorting(unittest.TestCase):
         file_list = yield f2d(self.test_daemon.jsonrpc_file_list())
         self.assertNotEqual(self.test_authors, extract_authors(file_list))
 
+    @defer.inlineCallbacks
+    def test_paginated_sort(self):
+        sort_options = ['points_paid']
+        first_page = yield f2d(self.test_daemon.jsonrpc_file_list(sort=sort_options, page=1, page_size=4))
+        self.assertEqual(self.test_points_paid[:4], [f['points_paid'] for f in first_page['items']])
+        self.assertEqual(3, first_page['total_pages'])
+        last_page = yield f2d(self.test_daemon.jsonrpc_file_list(sort=sort_options, page=3, page_size=4))
+        self.assertEqual(self.test_points_paid[8:], [f['points_paid'] for f in last_page['items']])
+
+        sort_options = ['file_name,desc']
+        file_list = yield f2d(self.test_daemon.jsonrpc_file_list(sort=sort_options, page=2, page_size=3))
+        self.assertEqual(
+            list(reversed(self.test_file_names))[3:6], [f['file_name'] for f in file_list['items']]
+        )
+
+    @defer.inlineCallbacks
+    def test_filter(self):
+        file_list = yield f2d(self.test_daemon.jsonrpc_file_list(channel_name='@ashlee27'))
+        self.assertEqual(['any.mov'], [f['file_name'] for f in file_list])
+        file_list = yield f2d(self.test_daemon.jsonrpc_file_list(channel_name='@ashlee27', file_name='add.mp3'))
+        self.assertEqual([], file_list)
+
     @defer.inlineCallbacks
     def test_invalid_sort_produces_meaningful_errors(self):
         sort_options = ['meta.author']
@@ -0,0 +1,54 @@
+from twisted.trial import unittest
+
+from lbrynet.extras.daemon.PeerFinder import PeerCache
+
+
+class PeerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = PeerCache(2, ttl=600, negative_ttl=60, peer_ttl=1800, get_time=lambda: self.now)
+
+    def test_stale_peers_are_served(self):
+        self.assertEqual(self.cache.lookup('aa'), (set(), False))
+        self.cache.add('aa', {('1.2.3.4', 3333)})
+        self.assertEqual(self.cache.lookup('aa'), ({('1.2.3.4', 3333)}, True))
+        self.now += 600
+        self.assertEqual(self.cache.lookup('aa'), ({('1.2.3.4', 3333)}, False))
+        self.cache.add('aa', {('1.2.3.5', 3333)})
+        self.assertEqual(self.cache.lookup('aa'), ({('1.2.3.4', 3333), ('1.2.3.5', 3333)}, True))
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses']), (2, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_peers_no_longer_found_expire(self):
+        self.cache.add('aa', {('1.2.3.4', 3333), ('1.2.3.5', 3333)})
+        self.now += 1200
+        self.cache.add('aa', {('1.2.3.5', 3333)})
+        self.now += 1200
+        self.assertEqual(self.cache.lookup('aa'), ({('1.2.3.5', 3333)}, False))
+        self.assertEqual(self.cache.get_peer_times('aa'), {('1.2.3.5', 3333): 2200.0})
+        self.assertEqual(self.cache.get_stats()['expired_peers'], 1)
+        self.now += 1200
+        self.assertEqual(self.cache.lookup('aa'), (set(), False))
+
+    def test_saved_peer_times_are_kept(self):
+        self.cache.add('aa', {('1.2.3.4', 3333): self.now - 1801, ('1.2.3.5', 3333): self.now - 60}, self.now - 60)
+        self.assertEqual(self.cache.get_peers('aa'), {('1.2.3.5', 3333)})
+        self.assertTrue(self.cache.is_fresh('aa'))
+
+    def test_negative_entry_expires_sooner(self):
+        self.cache.add('aa', set())
+        self.assertEqual(self.cache.lookup('aa'), (set(), True))
+        self.now += 60
+        self.assertEqual(self.cache.lookup('aa'), (set(), False))
+        self.assertEqual(self.cache.get_stats()['negative_hits'], 1)
+        self.assertEqual(self.cache.get_stats()['stale_entries'], 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.add('aa', {('1.2.3.4', 3333)})
+        self.cache.add('bb', {('1.2.3.4', 3333)})
+        self.cache.lookup('aa')
+        self.cache.add('cc', {('1.2.3.4', 3333)})
+        self.assertIn('aa', self.cache)
+        self.assertNotIn('bb', self.cache)
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
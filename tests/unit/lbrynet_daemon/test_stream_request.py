@@ -0,0 +1,100 @@
+import asyncio
+from unittest import mock
+from aiohttp import web
+from aiohttp.test_utils import TestServer, TestClient
+from twisted.internet import defer
+
+from lbrynet.extras.compat import f2d
+from lbrynet.extras.daemon.Daemon import Daemon
+from lbrynet.blob.stream_reader import BLOB_PLAINTEXT_SIZE
+from tests.unit.cryptstream.test_stream_reader import StreamTestCase, STREAM_SIZE
+
+
+class StreamRequestTest(StreamTestCase):
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield super().setUp()
+        daemon = mock.Mock(storage=self.storage, blob_manager=self.partial_blob_manager)
+        app = web.Application()
+        app.router.add_get('/stream/{sd_hash}', lambda request: Daemon.handle_stream_request(daemon, request))
+        self.client = TestClient(TestServer(app))
+        yield f2d(self.client.start_server())
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield f2d(self.client.close())
+        yield super().tearDown()
+
+    async def _get(self, http_range=None):
+        headers = {} if http_range is None else {'Range': http_range}
+        response = await self.client.get('/stream/%s' % self.sd_hash, headers=headers)
+        return response, await response.read()
+
+    def get(self, http_range=None):
+        return f2d(self._get(http_range))
+
+    @defer.inlineCallbacks
+    def test_no_range(self):
+        response, body = yield self.get()
+        self.assertEqual(200, response.status)
+        self.assertEqual(str(STREAM_SIZE), response.headers['Content-Length'])
+        self.assertEqual('bytes', response.headers['Accept-Ranges'])
+        self.assertNotIn('Content-Range', response.headers)
+        self.assertEqual(self.plaintext, body)
+
+    @defer.inlineCallbacks
+    def test_range_from_the_start_is_the_whole_stream(self):
+        response, body = yield self.get('bytes=0-')
+        self.assertEqual(200, response.status)
+        self.assertEqual(self.plaintext, body)
+
+    @defer.inlineCallbacks
+    def test_range_across_blobs(self):
+        start, end = BLOB_PLAINTEXT_SIZE - 10, BLOB_PLAINTEXT_SIZE + 10
+        response, body = yield self.get('bytes=%i-%i' % (start, end - 1))
+        self.assertEqual(206, response.status)
+        self.assertEqual('bytes %i-%i/%i' % (start, end - 1, STREAM_SIZE), response.headers['Content-Range'])
+        self.assertEqual('20', response.headers['Content-Length'])
+        self.assertEqual(self.plaintext[start:end], body)
+
+    @defer.inlineCallbacks
+    def test_suffix_range(self):
+        response, body = yield self.get('bytes=-100')
+        self.assertEqual(206, response.status)
+        self.assertEqual(
+            'bytes %i-%i/%i' % (STREAM_SIZE - 100, STREAM_SIZE - 1, STREAM_SIZE), response.headers['Content-Range']
+        )
+        self.assertEqual(self.plaintext[-100:], body)
+        response, body = yield self.get('bytes=-%i' % (STREAM_SIZE + 100))
+        self.assertEqual(206, response.status)
+        self.assertEqual(self.plaintext, body)
+
+    @defer.inlineCallbacks
+    def test_range_before_the_size_is_known(self):
+        self.set_last_blob_missing()
+        response, body = yield self.get('bytes=10-109')
+        self.assertEqual(206, response.status)
+        self.assertEqual('bytes 10-109/*', response.headers['Content-Range'])
+        self.assertEqual(self.plaintext[10:110], body)
+
+    @defer.inlineCallbacks
+    def test_open_ended_range_waits_for_the_size(self):
+        self.set_last_blob_missing()
+        asyncio.get_event_loop().call_later(0.2, self.partial_blob_manager.missing.clear)
+        response, body = yield self.get('bytes=10-')
+        self.assertEqual(206, response.status)
+        self.assertEqual('bytes 10-%i/%i' % (STREAM_SIZE - 1, STREAM_SIZE), response.headers['Content-Range'])
+        self.assertEqual(self.plaintext[10:], body)
+
+    @defer.inlineCallbacks
+    def test_unsatisfiable_range(self):
+        response, _ = yield self.get('bytes=%i-' % STREAM_SIZE)
+        self.assertEqual(416, response.status)
+        self.assertEqual('bytes */%i' % STREAM_SIZE, response.headers['Content-Range'])
+        response, _ = yield self.get('bytes=10-5')
+        self.assertEqual(416, response.status)
+
+    @defer.inlineCallbacks
+    def test_unknown_stream(self):
+        response = yield f2d(self.client.get('/stream/%s' % ('00' * 48)))
+        self.assertEqual(404, response.status)
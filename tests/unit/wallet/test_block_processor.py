@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+from unittest import mock
+from binascii import unhexlify
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from torba.server.block_processor import BlockProcessor
+from lbrynet.schema.claim import ClaimDict
+from lbrynet.schema.schema import NIST256p
+from lbrynet.schema.signer import get_signer
+from lbrynet.extras.wallet.server.block_processor import LBRYBlockProcessor
+from lbrynet.extras.wallet.server.model import ClaimInfo, NameClaim
+
+from tests.unit.schema.test_data import example_010, nist256p_private_key, claim_id_1, claim_address_2
+
+Output = namedtuple('Output', 'claim pk_script')
+Tx = namedtuple('Tx', 'has_claims inputs outputs')
+Block = namedtuple('Block', 'transactions')
+
+
+class FakeCoin:
+    @staticmethod
+    def address_from_script(pk_script):
+        return pk_script
+
+
+class FakeDB:
+    def __init__(self):
+        self.claims = {}
+
+    def get_claim_info(self, claim_id):
+        return self.claims.get(claim_id)
+
+
+class SignatureValidationTest(unittest.TestCase):
+    def setUp(self):
+        self.bp = LBRYBlockProcessor.__new__(LBRYBlockProcessor)
+        self.bp.coin = FakeCoin()
+        self.bp.db = FakeDB()
+        self.bp.should_validate_signatures = True
+        self.bp.validated_signatures = {}
+        self.bp.signature_workers = 2
+        self.bp.signature_executor = ProcessPoolExecutor(max_workers=2)
+        self.addCleanup(self.bp.shutdown)
+
+        self.cert_id = unhexlify(claim_id_1)[::-1]
+        self.cert = ClaimDict.generate_certificate(nist256p_private_key, curve=NIST256p).serialized
+        other_key = get_signer(NIST256p).generate().private_key.to_pem()
+        self.other_cert = ClaimDict.generate_certificate(other_key, curve=NIST256p).serialized
+        signed = ClaimDict.load_dict(example_010).sign(nist256p_private_key, claim_address_2, claim_id_1,
+                                                       curve=NIST256p).serialized
+        signed_by_other = ClaimDict.load_dict(example_010).sign(other_key, claim_address_2, claim_id_1,
+                                                                curve=NIST256p).serialized
+        self.claims = [
+            (b'\x01' * 32, 0, NameClaim(b'signed', signed), claim_address_2),
+            (b'\x02' * 32, 0, NameClaim(b'signed-by-other', signed_by_other), claim_address_2),
+            (b'\x03' * 32, 0, NameClaim(b'wrong-address', signed), 'bUG7VaMzLEqqyZQAyg9srxQzvf1wwnJ48w'),
+        ]
+        self.blocks = [Block([
+            (Tx(True, [], [Output(claim, address)]), txid) for txid, _, claim, address in self.claims
+        ])]
+
+    def set_cert(self, cert_value):
+        self.bp.db.claims[self.cert_id] = ClaimInfo(
+            b'@channel', cert_value, b'\x04' * 32, 0, 1, claim_address_2, 1, None
+        )
+
+    def check_all(self):
+        return [
+            self.bp._checksig(claim.name, claim.value, address, (txid, nout))
+            for txid, nout, claim, address in self.claims
+        ]
+
+    def check_serially(self):
+        self.bp.validated_signatures = {}
+        return self.check_all()
+
+    def check_pooled(self):
+        self.bp.validated_signatures = self.bp.validate_signatures(self.blocks)
+        try:
+            return self.check_all()
+        finally:
+            self.bp.validated_signatures = {}
+
+    def test_pooled_results_match_serial(self):
+        self.set_cert(self.cert)
+        serial = self.check_serially()
+        self.assertEqual([self.cert_id, None, None], serial)
+        self.assertEqual(serial, self.check_pooled())
+
+    def test_results_are_not_used_if_the_certificate_changed(self):
+        self.set_cert(self.cert)
+        validated = self.bp.validate_signatures(self.blocks)
+        self.assertEqual(3, len(validated))
+        self.set_cert(self.other_cert)
+        self.bp.validated_signatures = validated
+        pooled = self.check_all()
+        self.assertEqual([None, self.cert_id, None], pooled)
+        self.assertEqual(self.check_serially(), pooled)
+
+    def test_executor_is_shut_down_with_block_processing(self):
+        async def cancelled(*_):
+            raise asyncio.CancelledError()
+
+        executor = self.bp.signature_executor
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        with mock.patch.object(BlockProcessor, 'fetch_and_process_blocks', cancelled):
+            with self.assertRaises(asyncio.CancelledError):
+                loop.run_until_complete(self.bp.fetch_and_process_blocks(None))
+        self.assertIsNone(self.bp.signature_executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
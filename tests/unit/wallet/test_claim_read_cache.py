@@ -0,0 +1,91 @@
+import logging
+import unittest
+from contextlib import contextmanager
+
+from lbrynet.extras.wallet.server.db import LBRYDB, ClaimReadCache
+from lbrynet.extras.wallet.server.model import ClaimInfo
+
+
+class FakeBatch:
+    def __init__(self):
+        self.puts = {}
+        self.deletes = set()
+
+    def put(self, key, value):
+        self.puts[key] = value
+
+    def delete(self, key):
+        self.deletes.add(key)
+
+
+class FakeLevelDB:
+    """
+    Commits write batches when they exit, after calling before_commit
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.before_commit = None
+
+    def get(self, key):
+        return self.data.get(key)
+
+    @contextmanager
+    def write_batch(self):
+        batch = FakeBatch()
+        yield batch
+        if self.before_commit is not None:
+            self.before_commit()
+        self.data.update(batch.puts)
+        for key in batch.deletes:
+            self.data.pop(key, None)
+
+
+def claim_info(name, height):
+    return ClaimInfo(name, b'value', b'\x01' * 32, 0, 1, 'address', height, None)
+
+
+class ClaimReadCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.db = LBRYDB.__new__(LBRYDB)
+        self.db.logger = logging.getLogger(__name__)
+        self.db.db_height = 10
+        self.db.claim_cache = {}
+        self.db.claims_for_name_cache = {}
+        self.db.claims_signed_by_cert_cache = {}
+        self.db.outpoint_to_claim_id_cache = {}
+        self.db.pending_abandons = {}
+        self.db.claims_db = FakeLevelDB()
+        self.db.names_db = FakeLevelDB()
+        self.db.signatures_db = FakeLevelDB()
+        self.db.outpoint_to_claim_id_db = FakeLevelDB()
+        self.db.claim_read_cache = ClaimReadCache(10)
+        self.claim_id = b'\x02' * 20
+
+    def test_flushed_claims_replace_cached_reads(self):
+        self.db.put_claim_info(self.claim_id, claim_info(b'first', 1))
+        self.db.batched_flush_claims()
+        self.assertEqual(b'first', self.db.get_claim_info(self.claim_id).name)
+        self.db.put_claim_info(self.claim_id, claim_info(b'second', 2))
+        self.db.batched_flush_claims()
+        self.assertEqual(b'second', self.db.get_claim_info(self.claim_id).name)
+
+    def test_read_during_a_flush_is_not_cached(self):
+        self.db.put_claim_info(self.claim_id, claim_info(b'first', 1))
+        self.db.batched_flush_claims()
+        self.db.put_claim_info(self.claim_id, claim_info(b'second', 2))
+        reads = []
+        # a session reading on the event loop before the flush thread commits the batch
+        self.db.claims_db.before_commit = lambda: reads.append(self.db.get_claim_info(self.claim_id))
+        self.db.batched_flush_claims()
+        self.assertEqual(b'first', reads[0].name)
+        self.assertEqual(b'second', self.db.get_claim_info(self.claim_id).name)
+
+    def test_read_spanning_an_invalidation_is_not_cached(self):
+        cache = ClaimReadCache(10)
+        generation = cache.generation
+        cache.invalidate([('claim', self.claim_id)])
+        cache.set(('claim', self.claim_id), 'old', 10, generation)
+        self.assertEqual((False, None), cache.get(('claim', self.claim_id), 10))
+        cache.set(('claim', self.claim_id), 'new', 10, cache.generation)
+        self.assertEqual((True, 'new'), cache.get(('claim', self.claim_id), 10))